@@ -30,6 +30,8 @@ def test_ai_only():
                 print(f"   {i}. {term}")
         except Exception as e:
             print(f"   ❌ Erro: {e}")
+    
+    agent.shutdown()
 
 
 # Exemplo 2: Buscar produtos sem interface
@@ -73,11 +75,18 @@ def process_batch_auto(start_iteration: int, end_iteration: int, auto_select_top
     from src.file_manager import FileManager
     from src.data_processor import DataProcessor
     from src.ai_agent import AIAgent
+    from src.product_families import detect_families
     
     fm = FileManager("Base_Fazer.csv")
     dp = DataProcessor("Itens_Ativos.csv")
     ai = AIAgent()
     
+    # Uma chamada à IA por família de produtos do lote
+    ai.register_families(detect_families([
+        item for item in fm.get_pending_items()
+        if start_iteration <= item['n_iteracao'] <= end_iteration
+    ]))
+    
     print("\n" + "="*60)
     print(f"PROCESSAMENTO EM LOTE: Iterações {start_iteration} a {end_iteration}")
     print("="*60)
@@ -138,6 +147,10 @@ def process_batch_auto(start_iteration: int, end_iteration: int, auto_select_top
             print(f"   ❌ Erro: {e}")
             continue
     
+    # Consolidar o journal no CSV (e gravar o cache de termos)
+    ai.shutdown()
+    fm.close()
+    
     print("\n" + "="*60)
     print("✅ Processamento em lote concluído!")
     print(f"Progresso total: {fm.get_completed_count()}/{fm.get_total_items()}")
@@ -148,7 +161,6 @@ def process_batch_auto(start_iteration: int, end_iteration: int, auto_select_top
 def export_statistics():
     """Gera estatísticas sobre o progresso"""
     from src.file_manager import FileManager
-    import pandas as pd
     
     fm = FileManager("Base_Fazer.csv")
     
@@ -166,78 +178,187 @@ def export_statistics():
     print(f"   Pendentes: {total - completed}")
     print(f"   Percentual: {percentage:.1f}%")
     
+    counts = fm.get_progress_counts()
+    print(f"   Parciais (1-4 subs): {counts['partial']}")
+    print(f"   Puladas: {counts['skipped']}")
+    
     # Análise de quantos subs por item
-    if fm.df_output is not None:
-        subs_counts = []
-        for _, row in fm.df_output.iterrows():
-            count = sum(1 for i in range(1, 6) if pd.notna(row.get(f'sub{i}_cod_produto')))
-            subs_counts.append(count)
-        
-        print(f"\n📈 Distribuição de Substitutos:")
-        for i in range(6):
-            count = subs_counts.count(i)
-            if count > 0:
-                print(f"   {i} subs: {count} itens ({count/total*100:.1f}%)")
+    distribution = fm.get_sub_count_distribution()
+    
+    print(f"\n📈 Distribuição de Substitutos:")
+    for i, count in distribution.items():
+        if count > 0:
+            print(f"   {i} subs: {count} itens ({count/total*100:.1f}%)")
     
+    # Recortes por Responsável / Comprador / Subcategoria
+    from src.output_stats import STAT_DIMENSIONS, format_breakdown
+    
+    for dimension in STAT_DIMENSIONS:
+        try:
+            breakdown = fm.get_stats_breakdown(dimension)
+        except ValueError:
+            continue
+        print(f"\n👥 Por {dimension}:")
+        print(format_breakdown(breakdown))
+    
+    fm.close()
     print("="*60)
 
 
 # Exemplo 5: Validar arquivo de saída
 def validate_output():
-    """Valida o arquivo de saída"""
+    """Valida o arquivo de saída (somente leitura: não abre o FileManager)"""
     import pandas as pd
+    from src.output_export import wide_to_long
+    from src.output_validation import CHECKS, load_catalog, store_catalog, validate_substitutes, write_report
     
     print("\n" + "="*60)
     print("VALIDAÇÃO DO ARQUIVO DE SAÍDA")
     print("="*60)
     
     try:
+        # Ler só os CSVs: o FileManager criaria saída, journal e backups
+        # (e pegaria leases com REVIEWER definido)
         df = pd.read_csv("data/substituicoes.csv")
+        long_df = wide_to_long(df)
         
-        print(f"\n✅ Arquivo carregado: {len(df)} linhas")
-        
-        # Verificar linhas sem substitutos
-        empty = 0
-        partial = 0
-        full = 0
-        
-        for _, row in df.iterrows():
-            count = sum(1 for i in range(1, 6) if pd.notna(row.get(f'sub{i}_cod_produto')))
-            
-            if count == 0:
-                empty += 1
-            elif count < 5:
-                partial += 1
-            else:
-                full += 1
+        print(f"\n✅ Arquivo carregado: {len(df)} itens")
         
+        counts = long_df.groupby('n_iteracao').size().reindex(df['n_iteracao'], fill_value=0)
         print(f"\n📊 Status:")
-        print(f"   Vazias (0 subs): {empty}")
-        print(f"   Parciais (1-4 subs): {partial}")
-        print(f"   Completas (5 subs): {full}")
+        print(f"   Vazias (0 subs): {int((counts == 0).sum())}")
+        print(f"   Parciais (1-4 subs): {int(counts.between(1, 4).sum())}")
+        print(f"   Completas (5 subs): {int((counts >= 5).sum())}")
+        
+        code_counts = long_df['cod_produto'].value_counts()
+        print(f"\n🔍 Códigos únicos usados: {len(code_counts)}")
         
-        # Verificar duplicatas
-        all_codes = []
-        for _, row in df.iterrows():
-            for i in range(1, 6):
-                code = row.get(f'sub{i}_cod_produto')
-                if pd.notna(code):
-                    all_codes.append(code)
+        repetitions = len(long_df) - len(code_counts)
+        if repetitions:
+            print(f"   ⚠️  Há códigos duplicados: {repetitions} repetições")
+            top = list(code_counts[code_counts > 1].head(10).items())
+            print(f"   Mais usados: {top}")
         
-        unique_codes = len(set(all_codes))
-        print(f"\n🔍 Códigos únicos usados: {unique_codes}")
+        # Verificações contra o catálogo atual (Itens_Ativos)
+        originals = pd.read_csv("Base_Fazer.csv", skiprows=1, usecols=['n_iteracao', 'cod_produto'])
+        report = validate_substitutes(long_df, originals, store_catalog(load_catalog("Itens_Ativos.csv")))
         
-        if len(all_codes) != unique_codes:
-            print(f"   ⚠️  Há códigos duplicados: {len(all_codes) - unique_codes} repetições")
+        print(f"\n🧾 Contra o catálogo ({report['resumo']['substitutos']} substitutos):")
+        for check, description in CHECKS.items():
+            print(f"   {description}: {report['resumo'][check]}")
+        print(f"\n📄 Relatório completo: {write_report(report)}")
         
-    except FileNotFoundError:
-        print("❌ Arquivo data/substituicoes.csv não encontrado")
+    except FileNotFoundError as e:
+        print(f"❌ Arquivo não encontrado: {e.filename}")
     except Exception as e:
         print(f"❌ Erro: {e}")
     
     print("="*60)
 
 
+# Exemplo 6: Juntar os arquivos de saída dos revisores
+def merge_reviewers():
+    """Junta data/substituicoes_<revisor>.csv em data/substituicoes.csv"""
+    from src.leases import find_reviewer_outputs, load_responsible, merge_outputs
+    
+    print("\n" + "="*60)
+    print("MERGE DOS REVISORES")
+    print("="*60)
+    
+    try:
+        report = merge_outputs(
+            find_reviewer_outputs("data"),
+            "data/substituicoes.csv",
+            load_responsible("Base_Fazer.csv")
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    
+    print(f"\n✅ Iterações mescladas: {report['mesclados']}")
+    for reviewer, count in report['por_revisor'].items():
+        print(f"   {reviewer}: {count}")
+    
+    if report['conflitos']:
+        print(f"\n⚠️  {len(report['conflitos'])} conflitos (resolvidos pelo Responsável / arquivo mais recente):")
+        print(f"   {report['conflitos'][:20]}")
+    
+    print("="*60)
+
+
+# Exemplo 7: Exportar formatos longo e colunar
+def export_downstream():
+    """Exporta substituicoes no formato longo (CSV) e colunar (Parquet/.npz)"""
+    from src.file_manager import FileManager
+    
+    fm = FileManager("Base_Fazer.csv")
+    
+    print("\n" + "="*60)
+    print("EXPORTAÇÃO PARA SISTEMAS DOWNSTREAM")
+    print("="*60)
+    
+    print(f"\n✅ Formato longo: {fm.export_long()}")
+    print(f"✅ Formato colunar: {fm.export_columnar()}")
+    fm.close()
+    
+    print("="*60)
+
+
+# Exemplo 8: Atualizar preços dos substitutos salvos
+def refresh_prices():
+    """Atualiza o preço de todos os substitutos salvos com o catálogo atual"""
+    from src.data_processor import DataProcessor
+    from src.file_manager import FileManager
+    
+    print("\n" + "="*60)
+    print("ATUALIZAÇÃO DE PREÇOS")
+    print("="*60)
+    
+    dp = DataProcessor("Itens_Ativos.csv")
+    fm = FileManager("Base_Fazer.csv")
+    
+    changes = fm.refresh_prices(dp.snapshot, store=dp.default_store)
+    fm.close()
+    
+    print(f"\n✅ {len(changes)} preços atualizados em {changes['n_iteracao'].nunique()} iterações")
+    if len(changes):
+        print(changes.head(20).to_string(index=False))
+    
+    print("="*60)
+
+
+# Exemplo 9: Devolver à fila os itens que dependem de códigos removidos
+def requeue_removed_codes(codes_text: str = ""):
+    """Mostra e devolve à fila as iterações que usam códigos fora do catálogo"""
+    from src.file_manager import FileManager
+    from src.output_validation import load_catalog
+    
+    print("\n" + "="*60)
+    print("ITENS AFETADOS POR CÓDIGOS REMOVIDOS")
+    print("="*60)
+    
+    fm = FileManager("Base_Fazer.csv")
+    
+    codes = [code.strip() for code in codes_text.split(",") if code.strip()]
+    if not codes:
+        # Padrão: todos os substitutos salvos que saíram de Itens_Ativos
+        report = fm.validate_against_catalog(load_catalog("Itens_Ativos.csv"))
+        codes = sorted({p['cod_produto'] for p in report['problemas'] if p['check'] == 'fora_do_catalogo'})
+    
+    impact = fm.get_impact(codes)
+    print(f"\n{len(codes)} códigos, {len(impact)} substitutos em {impact['n_iteracao'].nunique()} iterações")
+    if len(impact):
+        print(impact.head(20).to_string(index=False))
+        
+        confirm = input("\nRemover esses substitutos (mantendo os demais)? (sim/não): ")
+        if confirm.lower() == "sim":
+            fm.requeue_affected(codes, keep_others=True)
+            print("✅ Substitutos removidos; iterações sem substitutos voltaram para pendentes")
+    
+    fm.close()
+    print("="*60)
+
+
 # Menu principal
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -248,6 +369,10 @@ if __name__ == "__main__":
     print("3. Processar lote automaticamente (CUIDADO!)")
     print("4. Exportar estatísticas")
     print("5. Validar arquivo de saída")
+    print("6. Juntar arquivos dos revisores")
+    print("7. Exportar formatos longo/colunar")
+    print("8. Atualizar preços dos substitutos salvos")
+    print("9. Itens afetados por códigos removidos do catálogo")
     print("0. Sair")
     
     choice = input("\nEscolha uma opção: ")
@@ -270,5 +395,13 @@ if __name__ == "__main__":
         export_statistics()
     elif choice == "5":
         validate_output()
+    elif choice == "6":
+        merge_reviewers()
+    elif choice == "7":
+        export_downstream()
+    elif choice == "8":
+        refresh_prices()
+    elif choice == "9":
+        requeue_removed_codes(input("Códigos (separados por vírgula, vazio = fora do catálogo): "))
     else:
         print("Até logo!")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do AIAgent contra o servidor stub (llm_stub_server.py)
+Mede vazão, latência (p50/p95/p99) e taxa de acerto do cache nos caminhos
+síncrono, assíncrono, em lote e streaming
+
+Uso:
+    python benchmark_ai.py --products 200 --repeat 2 --latency uniform:0.05,0.3
+    python benchmark_ai.py --base-url http://127.0.0.1:8765/v1 --mode batch
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+import pandas as pd
+
+from ai_agent import AIAgent
+from ai_metrics import AIMetrics
+from product_families import detect_families
+from llm_stub_server import start_server
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil simples (vizinho mais próximo) de uma lista"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def fetch_stub_stats(base_url: str) -> Dict:
+    """Lê os contadores do stub (vazio se o endpoint não existir)"""
+    try:
+        with urllib.request.urlopen(base_url.rstrip('/') + '/stats', timeout=5) as response:
+            return json.loads(response.read())
+    except Exception:
+        return {}
+
+
+def load_products(path: str, limit: int) -> List[Dict]:
+    """Carrega produtos da Base_Fazer"""
+    df = pd.read_csv(path, skiprows=1)
+    df = df[df['nome'].notna()]
+    return df.head(limit).to_dict('records')
+
+
+def run_mode(mode: str, agent: AIAgent, products: List[Tuple[str, str]], concurrency: int) -> Tuple[List[float], int]:
+    """
+    Executa um passe de chamadas no modo indicado
+
+    Returns:
+        (latências por chamada em segundos, acertos de cache)
+    """
+    latencies = []
+    hits = 0
+
+    def timed_call(name: str, price: str):
+        nonlocal hits
+        if agent._get_cached(name.strip().lower()) is not None:
+            hits += 1
+        start = time.perf_counter()
+        if mode == 'stream':
+            list(agent.stream_search_terms(name, price))
+        else:
+            agent.generate_search_terms(name, price)
+        latencies.append(time.perf_counter() - start)
+
+    if mode in ('sync', 'stream'):
+        for name, price in products:
+            timed_call(name, price)
+
+    elif mode == 'batch':
+        # Cada item "espera" o lote inteiro: a latência é a do lote
+        batch_size = concurrency * 4
+        for i in range(0, len(products), batch_size):
+            batch = products[i:i + batch_size]
+            hits += sum(1 for name, _ in batch if agent._get_cached(name.strip().lower()) is not None)
+            start = time.perf_counter()
+            agent.generate_search_terms_batch(batch, max_workers=concurrency)
+            latencies.extend([time.perf_counter() - start] * len(batch))
+
+    elif mode == 'async':
+        async def runner():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(name, price):
+                nonlocal hits
+                async with semaphore:
+                    if agent._get_cached(name.strip().lower()) is not None:
+                        hits += 1
+                    start = time.perf_counter()
+                    await agent.generate_search_terms_async(name, price)
+                    latencies.append(time.perf_counter() - start)
+
+            await asyncio.gather(*(one(n, p) for n, p in products))
+
+        asyncio.run(runner())
+
+    else:
+        raise ValueError(f"Modo desconhecido: {mode}")
+
+    return latencies, hits
+
+
+def benchmark(args, base_url: str, mode: str, products: List[Dict]) -> Dict:
+    """Executa o benchmark de um modo com cache novo"""
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = AIAgent(cache_file=os.path.join(tmp, 'cache.json'), base_url=base_url)
+        agent.metrics = AIMetrics(os.path.join(tmp, 'metrics.jsonl'))
+        if args.families:
+            agent.register_families(detect_families(products))
+
+        calls = [(str(p['nome']), "") for p in products] * args.repeat
+        before = fetch_stub_stats(base_url)
+
+        start = time.perf_counter()
+        latencies, hits = run_mode(mode, agent, calls, args.concurrency)
+        elapsed = time.perf_counter() - start
+
+        after = fetch_stub_stats(base_url)
+        telemetry = agent.metrics.summary()
+        agent.shutdown()
+
+    return {
+        'modo': mode,
+        'chamadas': len(latencies),
+        'tempo_s': round(elapsed, 3),
+        'vazao_por_s': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'acerto_cache': round(hits / len(latencies), 3) if latencies else 0.0,
+        'requisicoes_api': after.get('requests', 0) - before.get('requests', 0),
+        'respostas_429': after.get('rate_limited', 0) - before.get('rate_limited', 0),
+        'fallbacks_pendentes': len(agent.retry_queue),
+        'tokens': telemetry['tokens_prompt'] + telemetry['tokens_resposta'],
+        'custo_usd': telemetry['custo_usd'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do AIAgent")
+    parser.add_argument('--base-url', help="URL de um stub já em execução (padrão: inicia um local)")
+    parser.add_argument('--mode', default='all', choices=['all', 'sync', 'async', 'batch', 'stream'])
+    parser.add_argument('--products', type=int, default=100, help="Quantos produtos da Base_Fazer usar")
+    parser.add_argument('--repeat', type=int, default=2, help="Passes sobre os produtos (>1 exercita o cache)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--families', action='store_true', help="Registrar famílias de produtos antes")
+    parser.add_argument('--base-fazer', default='Base_Fazer.csv')
+    parser.add_argument('--latency', default='uniform:0.05,0.3')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--json', action='store_true', help="Saída em JSON")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = start_server(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate
+        )
+        host, port = server.server_address[:2]
+        base_url = f"http://{host}:{port}/v1"
+
+    products = load_products(args.base_fazer, args.products)
+    modes = ['sync', 'async', 'batch', 'stream'] if args.mode == 'all' else [args.mode]
+
+    reports = [benchmark(args, base_url, mode, products) for mode in modes]
+
+    if server is not None:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return
+
+    print("=" * 100)
+    print(f"BENCHMARK AIAgent - {len(products)} produtos x {args.repeat} passes - {base_url}")
+    print("=" * 100)
+    print(pd.DataFrame(reports).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatível com a API de chat.completions da OpenAI
+Usado para testes de carga e regressão do AIAgent sem custo de API
+
+Uso:
+    python llm_stub_server.py --port 8765 --latency lognormal:-1.5,0.5 --error-rate 0.02 --rate-limit-rate 0.05
+
+E no AIAgent:
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python ...
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+class LatencyModel:
+    """Distribuição de latência configurável"""
+
+    def __init__(self, spec: str = "fixed:0.2"):
+        """
+        Inicializa o modelo
+
+        Args:
+            spec: "fixed:S", "uniform:MIN,MAX" ou "lognormal:MU,SIGMA" (segundos)
+        """
+        kind, _, params = spec.partition(':')
+        self.kind = kind
+        self.params = [float(p) for p in params.split(',') if p]
+
+        if kind not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"Distribuição de latência desconhecida: {kind}")
+
+    def sample(self, rng: random.Random) -> float:
+        """Sorteia uma latência em segundos"""
+        if self.kind == 'fixed':
+            return self.params[0] if self.params else 0.0
+        if self.kind == 'uniform':
+            return rng.uniform(self.params[0], self.params[1])
+        return rng.lognormvariate(self.params[0], self.params[1])
+
+
+def term_ladder(product_name: str) -> List[str]:
+    """
+    Gera uma escada determinística de 5 termos (do específico ao genérico)
+
+    Args:
+        product_name: Nome do produto
+
+    Returns:
+        Lista com 5 termos
+    """
+    text = unicodedata.normalize('NFKD', product_name.lower())
+    text = text.encode('ASCII', 'ignore').decode('ASCII')
+    words = re.sub(r'[^a-z0-9\s]', ' ', text).split()
+    if not words:
+        words = ['produto']
+
+    sizes = [len(words), max(1, math.ceil(len(words) * 0.75)), 3, 2, 1]
+    return [' '.join(words[:min(n, len(words))]) for n in sizes]
+
+
+class StubState:
+    """Configuração e contadores compartilhados entre as requisições"""
+
+    def __init__(self, latency: LatencyModel, error_rate: float, rate_limit_rate: float,
+                 rpm_limit: int, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm_limit = rpm_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0, 'streamed': 0}
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def decide(self) -> str:
+        """Decide o desfecho da requisição: 'ok', 'error' ou 'rate_limited'"""
+        with self.lock:
+            self.stats['requests'] += 1
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+
+            if self.rpm_limit and self.window_count > self.rpm_limit:
+                return 'rate_limited'
+
+            roll = self.rng.random()
+            if roll < self.rate_limit_rate:
+                return 'rate_limited'
+            if roll < self.rate_limit_rate + self.error_rate:
+                return 'error'
+            return 'ok'
+
+    def sample_latency(self) -> float:
+        with self.lock:
+            return self.latency.sample(self.rng)
+
+
+def make_handler(state: StubState):
+    """Cria a classe de handler ligada ao estado do servidor"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict, headers: Dict = None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/stats'):
+                with state.lock:
+                    self._send_json(200, dict(state.stats))
+            else:
+                self._send_json(404, {'error': {'message': 'not found'}})
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': 'not found'}})
+                return
+
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+
+            time.sleep(state.sample_latency())
+
+            outcome = state.decide()
+            if outcome == 'rate_limited':
+                state.count('rate_limited')
+                self._send_json(
+                    429,
+                    {'error': {'message': 'Rate limit reached (stub)', 'type': 'rate_limit_error'}},
+                    {'retry-after': '1'}
+                )
+                return
+            if outcome == 'error':
+                state.count('errors')
+                self._send_json(500, {'error': {'message': 'Internal error (stub)', 'type': 'server_error'}})
+                return
+
+            # Extrair nome do produto do prompt ("Produto: ...")
+            prompt = ' '.join(m.get('content', '') for m in request.get('messages', []) if m.get('role') == 'user')
+            match = re.search(r'Produto:\s*(.+)', prompt)
+            content = '\n'.join(term_ladder(match.group(1) if match else prompt))
+
+            prompt_tokens = max(1, len(prompt) // 4)
+            completion_tokens = max(1, len(content) // 4)
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+            model = request.get('model', 'stub')
+            created = int(time.time())
+
+            state.count('ok')
+
+            if request.get('stream'):
+                state.count('streamed')
+                self._stream(content, model, created, usage)
+                return
+
+            self._send_json(200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': usage
+            })
+
+        def _stream(self, content: str, model: str, created: int, usage: Dict):
+            """Envia a resposta como Server-Sent Events, uma linha por chunk"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+
+            def send(payload):
+                data = payload if isinstance(payload, str) else json.dumps(payload)
+                self.wfile.write(f"data: {data}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            base = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': created, 'model': model}
+            for line in content.split('\n'):
+                send({**base, 'choices': [{'index': 0, 'delta': {'content': line + '\n'}, 'finish_reason': None}]})
+                time.sleep(state.sample_latency() / 10)
+
+            send({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+            send({**base, 'choices': [], 'usage': usage})
+            send('[DONE]')
+            self.close_connection = True
+
+    return StubHandler
+
+
+def start_server(
+    host: str = '127.0.0.1',
+    port: int = 0,
+    latency: str = 'fixed:0.2',
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    rpm_limit: int = 0,
+    seed: int = 42
+) -> ThreadingHTTPServer:
+    """
+    Inicia o servidor em uma thread de fundo
+
+    Args:
+        host: Endereço de escuta
+        port: Porta (0 = porta livre qualquer)
+        latency: Especificação da latência (ver LatencyModel)
+        error_rate: Fração de respostas 500
+        rate_limit_rate: Fração de respostas 429 injetadas
+        rpm_limit: Limite de requisições por minuto (0 = sem limite)
+        seed: Semente do gerador aleatório
+
+    Returns:
+        Servidor em execução (server.server_address tem a porta)
+    """
+    state = StubState(LatencyModel(latency), error_rate, rate_limit_rate, rpm_limit, seed)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor stub compatível com OpenAI chat.completions")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed:0.2', help="fixed:S | uniform:MIN,MAX | lognormal:MU,SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fração de respostas 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fração de respostas 429")
+    parser.add_argument('--rpm-limit', type=int, default=0, help="Limite de requisições/minuto (0 = sem limite)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    server = start_server(
+        args.host, args.port, args.latency, args.error_rate,
+        args.rate_limit_rate, args.rpm_limit, args.seed
+    )
+    host, port = server.server_address[:2]
+    print(f"Stub OpenAI em http://{host}:{port}/v1 (Ctrl+C para sair)")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\nEstatísticas: {server.state.stats}")
+
+
+if __name__ == "__main__":
+    main()
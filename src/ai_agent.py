@@ -4,13 +4,29 @@ Gera termos de pesquisa inteligentes para encontrar substitutos de produtos
 """
 
 import os
-import json
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from openai import OpenAI
 from dotenv import load_dotenv
 from pathlib import Path
 
+try:
+    from .llm_client import ResilientChatClient
+    from .product_families import ProductFamily, derive_terms
+    from .term_cache import TermCache
+    from .ai_metrics import AIMetrics
+except ImportError:
+    from llm_client import ResilientChatClient
+    from product_families import ProductFamily, derive_terms
+    from term_cache import TermCache
+    from ai_metrics import AIMetrics
+
 # Configurar logging - caminho relativo ao diretório raiz do projeto
 log_dir = Path(__file__).parent.parent / 'logs'
 log_dir.mkdir(exist_ok=True)
@@ -23,44 +39,144 @@ logging.basicConfig(
 load_dotenv()
 
 
+class _InFlightCall:
+    """Chamada em andamento compartilhada entre threads"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplica chamadas concorrentes: threads que pedem a mesma chave enquanto
+    uma chamada está em andamento aguardam o resultado dela
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+    
+    def begin(self, key: str) -> Tuple[_InFlightCall, bool]:
+        """
+        Registra interesse em uma chave
+        
+        Returns:
+            (chamada, é_líder) - só o líder deve executar o trabalho
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = _InFlightCall()
+            self._calls[key] = call
+            return call, True
+    
+    def finish(self, key: str, call: _InFlightCall, result=None, error: Exception = None):
+        """Publica o resultado do líder e libera as threads em espera"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.error = error
+        call.done.set()
+    
+    @staticmethod
+    def wait(call: _InFlightCall):
+        """Aguarda o resultado de uma chamada liderada por outra thread"""
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
 class AIAgent:
     """Agente de IA para gerar termos de busca de substitutos"""
     
-    def __init__(self, cache_file: str = "data/cache.json"):
+    def __init__(self, cache_file: str = "data/cache.json", base_url: str = None):
         """
         Inicializa o agente de IA
         
         Args:
             cache_file: Caminho para arquivo de cache
+            base_url: URL da API (padrão: OPENAI_BASE_URL ou api.openai.com)
         """
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Retries ficam a cargo do ResilientChatClient
+        self.client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=base_url or os.getenv("OPENAI_BASE_URL") or None,
+            max_retries=0,
+            timeout=30.0
+        )
+        self.chat = ResilientChatClient(
+            self.client,
+            requests_per_minute=int(os.getenv("OPENAI_RPM", "500")),
+            tokens_per_minute=int(os.getenv("OPENAI_TPM", "30000")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5")),
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        )
+        
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        
+        # Uma linha de métricas por chamada (logs/ai_metrics.jsonl)
+        self.metrics = AIMetrics()
+        
+        # Fila de retry é acessada por várias threads (o cache tem lock próprio)
+        self._cache_lock = threading.RLock()
+        self._inflight = SingleFlight()
+        
+        # Entradas geradas por outro modelo/prompt são invalidadas
+        ttl_days = os.getenv("TERM_CACHE_TTL_DAYS")
         self.cache_file = cache_file
-        self.cache = self._load_cache()
+        self.cache = TermCache(
+            cache_file,
+            model=self.model,
+            prompt_hash=self._prompt_hash(),
+            max_entries=int(os.getenv("TERM_CACHE_MAX_ENTRIES", "20000")),
+            ttl_seconds=float(ttl_days) * 86400 if ttl_days else None,
+            policy=os.getenv("TERM_CACHE_POLICY", "lru"),
+            save_delay=float(os.getenv("TERM_CACHE_SAVE_SECONDS", "5"))
+        )
         
-    def _load_cache(self) -> Dict:
-        """Carrega cache de termos já processados"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logging.error(f"Erro ao carregar cache: {e}")
-                return {}
-        return {}
+        # Produtos atendidos pelo fallback, aguardando nova tentativa na IA
+        self.retry_queue: "OrderedDict[str, tuple]" = OrderedDict()
+        self.retry_queue_max = int(os.getenv("RETRY_QUEUE_MAX", "1000"))
+        self._retry_thread = None
+        self._retry_stop = threading.Event()
+        
+        # Membro de família -> família (termos derivados do representante)
+        self._families: Dict[str, ProductFamily] = {}
+        
+    def _prompt_hash(self) -> str:
+        """Hash das mensagens enviadas à IA (muda quando o prompt muda)"""
+        template = self._build_messages("{produto}", "{preco}")
+        raw = "\n".join(m["content"] for m in template)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
     
-    def _save_cache(self):
-        """Salva cache em arquivo"""
-        try:
-            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logging.error(f"Erro ao salvar cache: {e}")
+    def _get_cached(self, cache_key: str) -> Optional[List[str]]:
+        """Lê o cache de forma thread-safe"""
+        return self.cache.get(cache_key)
+    
+    def _queue_retry(self, cache_key: str, product_name: str, price: str):
+        """Coloca produto atendido pelo fallback na fila de retry (descarta os mais antigos além do limite)"""
+        with self._cache_lock:
+            self.retry_queue.pop(cache_key, None)
+            self.retry_queue[cache_key] = (product_name, price)
+            dropped = 0
+            while len(self.retry_queue) > self.retry_queue_max:
+                self.retry_queue.popitem(last=False)
+                dropped += 1
+        if dropped:
+            logging.warning(f"Fila de retry cheia ({self.retry_queue_max}): {dropped} produtos mais antigos descartados")
     
     def generate_search_terms(self, product_name: str, price: str = "") -> List[str]:
         """
         Gera 5 termos de busca para encontrar substitutos do produto
         
+        Chamadas concorrentes para o mesmo produto compartilham uma única
+        chamada à API.
+        
         Args:
             product_name: Nome do produto original
             price: Preço do produto (opcional, para contexto)
@@ -70,30 +186,104 @@ class AIAgent:
         """
         # Verificar cache primeiro
         cache_key = product_name.strip().lower()
-        if cache_key in self.cache:
-            logging.info(f"Usando cache para: {product_name}")
-            return self.cache[cache_key]
+        started = time.perf_counter()
+        
+        while True:
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                logging.info(f"Usando cache para: {product_name}")
+                self._record(product_name, 'hit', started)
+                return cached
+            
+            call, leader = self._inflight.begin(cache_key)
+            if not leader:
+                terms = SingleFlight.wait(call)
+                # None: o líder era um streaming abandonado; tentar de novo
+                if terms is not None:
+                    self._record(product_name, 'shared', started)
+                    return terms
+                continue
+            
+            try:
+                terms = self._generate_uncached(cache_key, product_name, price, started)
+            except Exception as e:
+                self._inflight.finish(cache_key, call, error=e)
+                raise
+            
+            self._inflight.finish(cache_key, call, terms)
+            return terms
+    
+    def _record(self, product_name: str, outcome: str, started: float, **details):
+        """Registra a linha de métricas de uma chamada"""
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.metrics.record(product_name, outcome, latency_ms, **details)
+    
+    def register_families(self, families: List[ProductFamily]):
+        """
+        Registra famílias de produtos: membros passam a ter os termos
+        derivados dos termos do representante, sem chamada própria à API
+        
+        Args:
+            families: Famílias detectadas por product_families.detect_families
+        """
+        registered = 0
+        with self._cache_lock:
+            for family in families:
+                if len(family) < 2:
+                    continue
+                for member in family.members[1:]:
+                    self._families[member.strip().lower()] = family
+                    registered += 1
+        
+        logging.info(f"Registrados {registered} produtos em famílias")
+    
+    def _derive_from_family(self, cache_key: str, product_name: str) -> Optional[List[str]]:
+        """
+        Deriva os termos de um membro de família a partir do representante
+        
+        Returns:
+            Termos derivados ou None se o produto não pertence a uma família
+            ou se o representante só tem termos de fallback
+        """
+        family = self._families.get(cache_key)
+        if family is None:
+            return None
+        
+        rep_terms = self.generate_search_terms(family.representative, family.representative_price)
+        if self._get_cached(family.representative.strip().lower()) is None:
+            return None
+        
+        derived = derive_terms(family.representative, rep_terms, product_name)
+        if not derived:
+            return None
+        
+        logging.info(f"Termos derivados da família de '{family.representative}'")
+        self._store_terms(cache_key, product_name, derived)
+        return derived
+    
+    def _generate_uncached(self, cache_key: str, product_name: str, price: str, started: float) -> List[str]:
+        """Chama a API para um produto fora do cache (executado pelo líder)"""
+        # Outro líder pode ter terminado logo antes
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            self._record(product_name, 'hit', started)
+            return cached
+        
+        # Membros de família reaproveitam os termos do representante
+        derived = self._derive_from_family(cache_key, product_name)
+        if derived is not None:
+            self._record(product_name, 'derived', started)
+            return derived
+        
+        stats = {'retries': 0}
+        api_started = time.perf_counter()
         
         try:
-            # Criar prompt para GPT-4o
-            prompt = self._create_prompt(product_name, price)
-            
-            # Chamar API da OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Você é um especialista em categorização de produtos de supermercado.
-Sua tarefa é gerar termos de busca para encontrar substitutos de produtos.
-Os substitutos devem ser da mesma categoria, podendo variar em marca, gramatura ou características específicas.
-Retorne EXATAMENTE 5 termos, do mais específico ao mais genérico."""
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            # Chamar API da OpenAI (com limite de taxa e retry)
+            response = self.chat.create(
+                stats=stats,
+                model=self.model,
+                messages=self._build_messages(product_name, price),
                 temperature=0.3,
                 max_tokens=500
             )
@@ -102,18 +292,294 @@ Retorne EXATAMENTE 5 termos, do mais específico ao mais genérico."""
             content = response.choices[0].message.content
             search_terms = self._parse_response(content)
             
-            # Salvar no cache
-            self.cache[cache_key] = search_terms
-            self._save_cache()
-            
-            logging.info(f"Termos gerados para '{product_name}': {search_terms}")
+            self._store_terms(cache_key, product_name, search_terms)
+            self._record(
+                product_name, 'miss', started,
+                api_latency_ms=(time.perf_counter() - api_started) * 1000,
+                usage=getattr(response, 'usage', None),
+                retries=stats['retries']
+            )
             return search_terms
             
         except Exception as e:
             logging.error(f"Erro ao gerar termos para '{product_name}': {e}")
-            # Fallback: gerar termos básicos
+            # Fallback: gerar termos básicos (não vão para o cache, e o
+            # produto entra na fila para nova tentativa)
+            self._queue_retry(cache_key, product_name, price)
+            self._record(
+                product_name, 'fallback', started,
+                api_latency_ms=(time.perf_counter() - api_started) * 1000,
+                retries=stats['retries']
+            )
             return self._fallback_search_terms(product_name)
     
+    async def generate_search_terms_async(self, product_name: str, price: str = "") -> List[str]:
+        """
+        Versão assíncrona de generate_search_terms (executa em thread do pool)
+        
+        Args:
+            product_name: Nome do produto original
+            price: Preço do produto (opcional, para contexto)
+            
+        Returns:
+            Lista com 5 termos de busca em ordem de generalidade
+        """
+        return await asyncio.to_thread(self.generate_search_terms, product_name, price)
+    
+    def generate_search_terms_batch(
+        self,
+        products: List[Tuple[str, str]],
+        max_workers: int = 8
+    ) -> List[List[str]]:
+        """
+        Gera termos para um lote de produtos em paralelo
+        
+        O limite de taxa e a concorrência adaptativa do ResilientChatClient
+        continuam valendo para o lote inteiro.
+        
+        Args:
+            products: Lista de (nome, preço)
+            max_workers: Threads simultâneas
+            
+        Returns:
+            Lista de termos na mesma ordem dos produtos
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda p: self.generate_search_terms(*p), products))
+    
+    def stream_search_terms(self, product_name: str, price: str = "") -> Iterator[str]:
+        """
+        Gera os termos de busca em streaming, entregando cada termo assim que
+        sua linha termina de chegar da API
+        
+        O consumidor deve esgotar o iterador para que os termos sejam
+        salvos no cache; se fechar antes, as threads que aguardavam o mesmo
+        produto recebem os termos já entregues e a linha de métricas sai
+        marcada como interrompida. Se outra thread já estiver gerando termos
+        para o mesmo produto, aguarda o resultado dela.
+        As latências registradas não incluem o tempo do consumidor entre os
+        termos.
+        
+        Args:
+            product_name: Nome do produto original
+            price: Preço do produto (opcional, para contexto)
+            
+        Yields:
+            Termos de busca, do mais específico ao mais genérico
+        """
+        cache_key = product_name.strip().lower()
+        started = time.perf_counter()
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            logging.info(f"Usando cache para: {product_name}")
+            self._record(product_name, 'hit', started, path='stream')
+            yield from cached
+            return
+        
+        # Membros de família não precisam de chamada própria
+        if cache_key in self._families:
+            yield from self.generate_search_terms(product_name, price)
+            return
+        
+        call, leader = self._inflight.begin(cache_key)
+        if not leader:
+            terms = SingleFlight.wait(call)
+            if terms is None:
+                terms = self.generate_search_terms(product_name, price)
+            else:
+                self._record(product_name, 'shared', started, path='stream')
+            yield from terms
+            return
+        
+        content = ""
+        buffer = ""
+        emitted = []
+        result = None
+        stats = {'retries': 0, 'usage': None}
+        # Tempo parado nos yields (trabalho do consumidor), descontado das latências
+        paused = 0.0
+        api_started = None
+        api_latency_ms = None
+        # Desfecho registrado no finally (None = nada a registrar)
+        outcome = None
+        interrupted = False
+        
+        try:
+            api_started = time.perf_counter()
+            stream = self.chat.stream(
+                stats=stats,
+                model=self.model,
+                messages=self._build_messages(product_name, price),
+                temperature=0.3,
+                max_tokens=500
+            )
+            
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                content += delta
+                buffer += delta
+                
+                # Entregar cada linha completa como termo
+                while "\n" in buffer and len(emitted) < 5:
+                    line, buffer = buffer.split("\n", 1)
+                    term = self._clean_line(line)
+                    if term:
+                        emitted.append(term)
+                        yielded_at = time.perf_counter()
+                        yield term
+                        paused += time.perf_counter() - yielded_at
+            
+            # Último chunk recebido: fim da chamada à API
+            api_latency_ms = (time.perf_counter() - api_started - paused) * 1000
+            
+            # Última linha pode chegar sem quebra de linha
+            term = self._clean_line(buffer)
+            if term and len(emitted) < 5:
+                emitted.append(term)
+                yielded_at = time.perf_counter()
+                yield term
+                paused += time.perf_counter() - yielded_at
+            
+            result = self._parse_response(content)
+            self._store_terms(cache_key, product_name, result)
+            outcome = 'miss'
+            
+        except GeneratorExit:
+            # Consumidor fechou o iterador: quem aguardava recebe o que já foi
+            # entregue (sem ir para o cache, que só guarda respostas completas)
+            logging.info(f"Streaming de termos interrompido para '{product_name}' ({len(emitted)} termos)")
+            result = list(emitted) or None
+            outcome = 'miss'
+            interrupted = True
+            # Fechado durante um yield: o tempo parado nele é do consumidor
+            paused += time.perf_counter() - yielded_at
+            raise
+            
+        except Exception as e:
+            logging.error(f"Erro no streaming de termos para '{product_name}': {e}")
+            self._queue_retry(cache_key, product_name, price)
+            outcome = 'fallback'
+            
+            # Sem nenhum termo da IA: completar com o fallback
+            result = self._fallback_search_terms(product_name)
+            if not emitted:
+                yielded_at = time.perf_counter()
+                try:
+                    yield from result
+                except GeneratorExit:
+                    interrupted = True
+                    raise
+                finally:
+                    paused += time.perf_counter() - yielded_at
+            
+        finally:
+            # Registrado aqui para que um fechamento antecipado também gere a linha
+            if outcome is not None:
+                if api_latency_ms is None and api_started is not None:
+                    api_latency_ms = (time.perf_counter() - api_started - paused) * 1000
+                self._record(
+                    product_name, outcome, started + paused, path='stream',
+                    api_latency_ms=api_latency_ms,
+                    usage=stats['usage'],
+                    retries=stats['retries'],
+                    interrupted=interrupted
+                )
+            self._inflight.finish(cache_key, call, result)
+    
+    def _store_terms(self, cache_key: str, product_name: str, search_terms: List[str]):
+        """Salva no cache os termos gerados pela IA"""
+        self.cache.put(cache_key, search_terms)
+        with self._cache_lock:
+            self.retry_queue.pop(cache_key, None)
+        self.cache.schedule_save()
+        
+        logging.info(f"Termos gerados para '{product_name}': {search_terms}")
+    
+    def retry_fallbacks(self, max_items: int = None) -> int:
+        """
+        Tenta novamente na IA os produtos que foram atendidos pelo fallback
+        
+        Args:
+            max_items: Máximo de produtos a reprocessar (None = todos)
+            
+        Returns:
+            Quantidade de produtos que passaram a ter termos da IA
+        """
+        with self._cache_lock:
+            pending = list(self.retry_queue.items())
+        if max_items is not None:
+            pending = pending[:max_items]
+        
+        recovered = 0
+        for cache_key, (product_name, price) in pending:
+            if self._retry_stop.is_set():
+                break
+            self.generate_search_terms(product_name, price)
+            if self._get_cached(cache_key) is not None:
+                recovered += 1
+            else:
+                # Ainda falhando: provável indisponibilidade, tentar mais tarde
+                break
+        
+        if recovered:
+            logging.info(f"Fila de retry: {recovered} produtos recuperados, {len(self.retry_queue)} pendentes")
+        return recovered
+    
+    def shutdown(self, timeout: float = 5.0):
+        """
+        Encerra o agente: para a thread de retry e grava o cache pendente
+        
+        Args:
+            timeout: Espera máxima (segundos) pela thread de retry
+        """
+        self._retry_stop.set()
+        if self._retry_thread is not None:
+            self._retry_thread.join(timeout)
+            if self._retry_thread.is_alive():
+                logging.warning("Thread de retry ainda em uma chamada à API; encerrando sem aguardar")
+            self._retry_thread = None
+        self.cache.close()
+    
+    def start_retry_worker(self, interval: float = 60.0):
+        """
+        Inicia thread que reprocessa a fila de fallback periodicamente
+        
+        Args:
+            interval: Intervalo entre tentativas (segundos)
+        """
+        if self._retry_thread is not None:
+            return
+        
+        def worker():
+            # wait() retorna True assim que shutdown() é chamado
+            while not self._retry_stop.wait(interval):
+                if self.retry_queue:
+                    try:
+                        self.retry_fallbacks()
+                    except Exception as e:
+                        logging.error(f"Erro ao reprocessar fila de retry: {e}")
+        
+        self._retry_thread = threading.Thread(target=worker, daemon=True)
+        self._retry_thread.start()
+    
+    def _build_messages(self, product_name: str, price: str) -> List[Dict]:
+        """Monta as mensagens (sistema + usuário) enviadas ao GPT-4o"""
+        return [
+            {
+                "role": "system",
+                "content": """Você é um especialista em categorização de produtos de supermercado.
+Sua tarefa é gerar termos de busca para encontrar substitutos de produtos.
+Os substitutos devem ser da mesma categoria, podendo variar em marca, gramatura ou características específicas.
+Retorne EXATAMENTE 5 termos, do mais específico ao mais genérico."""
+            },
+            {
+                "role": "user",
+                "content": self._create_prompt(product_name, price)
+            }
+        ]
+    
     def _create_prompt(self, product_name: str, price: str) -> str:
         """Cria o prompt para o GPT-4o"""
         prompt = f"""Produto: {product_name}"""
@@ -157,12 +623,9 @@ Agora gere os 5 termos para o produto acima:"""
         terms = []
         
         for line in lines:
-            # Remover numeração, pontos, traços, etc
-            cleaned = line.strip()
-            cleaned = cleaned.lstrip('0123456789.-) ')
-            
-            if cleaned and len(cleaned) > 2:
-                terms.append(cleaned.lower())
+            cleaned = self._clean_line(line)
+            if cleaned:
+                terms.append(cleaned)
         
         # Garantir exatamente 5 termos
         if len(terms) < 5:
@@ -175,6 +638,17 @@ Agora gere os 5 termos para o produto acima:"""
         
         return terms
     
+    @staticmethod
+    def _clean_line(line: str) -> str:
+        """Limpa uma linha da resposta; retorna "" se não for um termo válido"""
+        # Remover numeração, pontos, traços, etc
+        cleaned = line.strip()
+        cleaned = cleaned.lstrip('0123456789.-) ')
+        
+        if len(cleaned) > 2:
+            return cleaned.lower()
+        return ""
+    
     def _fallback_search_terms(self, product_name: str) -> List[str]:
         """
         Gera termos básicos quando a IA falha
@@ -0,0 +1,246 @@
+"""
+Módulo de telemetria do AIAgent
+Registra uma linha estruturada por chamada (cache, latência, tokens, custo,
+retries, fallback) e calcula agregados
+
+Uso (resumo pela linha de comando):
+    python src/ai_metrics.py
+    python src/ai_metrics.py --last 500 --json
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+from pathlib import Path
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'ai_agent.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+DEFAULT_METRICS_FILE = log_dir / 'ai_metrics.jsonl'
+
+# Desfechos possíveis de uma chamada
+OUTCOMES = ('hit', 'shared', 'derived', 'miss', 'fallback')
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Percentil (vizinho mais próximo) de uma lista"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(rows: Iterable[Dict]) -> Dict:
+    """
+    Calcula agregados de uma coleção de linhas de métricas
+
+    Args:
+        rows: Linhas registradas por AIMetrics.record
+
+    Returns:
+        Dicionário com contagens, taxas, latências, tokens e custo
+    """
+    rows = list(rows)
+    total = len(rows)
+    counts = {outcome: 0 for outcome in OUTCOMES}
+    for row in rows:
+        counts[row.get('outcome', 'miss')] = counts.get(row.get('outcome', 'miss'), 0) + 1
+
+    api_rows = [r for r in rows if r.get('api_latency_ms') is not None]
+    api_latencies = [r['api_latency_ms'] for r in api_rows]
+    latencies = [r.get('latency_ms', 0.0) for r in rows]
+
+    served_without_api = counts['hit'] + counts['shared'] + counts['derived']
+
+    return {
+        'chamadas': total,
+        'desfechos': counts,
+        'taxa_cache': round(served_without_api / total, 3) if total else 0.0,
+        'taxa_fallback': round(counts['fallback'] / total, 3) if total else 0.0,
+        'chamadas_api': len(api_rows),
+        'retries': sum(r.get('retries', 0) for r in rows),
+        'interrompidas': sum(1 for r in rows if r.get('interrupted')),
+        'latencia_ms': {
+            'p50': round(_percentile(latencies, 50), 1),
+            'p95': round(_percentile(latencies, 95), 1),
+            'p99': round(_percentile(latencies, 99), 1),
+        },
+        'latencia_api_ms': {
+            'media': round(sum(api_latencies) / len(api_latencies), 1) if api_latencies else 0.0,
+            'p50': round(_percentile(api_latencies, 50), 1),
+            'p95': round(_percentile(api_latencies, 95), 1),
+            'p99': round(_percentile(api_latencies, 99), 1),
+        },
+        'tokens_prompt': sum(r.get('prompt_tokens', 0) for r in rows),
+        'tokens_resposta': sum(r.get('completion_tokens', 0) for r in rows),
+        'custo_usd': round(sum(r.get('cost_usd', 0.0) for r in rows), 4),
+    }
+
+
+class AIMetrics:
+    """Coletor de métricas por chamada, com janela em memória e arquivo JSONL"""
+
+    def __init__(self, metrics_file: str = None, window: int = 5000):
+        """
+        Inicializa o coletor
+
+        Args:
+            metrics_file: Arquivo JSONL (None = logs/ai_metrics.jsonl)
+            window: Quantas linhas recentes manter em memória para agregados
+        """
+        self.metrics_file = str(metrics_file or DEFAULT_METRICS_FILE)
+        self.rows = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        # Preço por 1 milhão de tokens (padrão: gpt-4o)
+        self.price_input = float(os.getenv("OPENAI_PRICE_INPUT_PER_1M", "2.50"))
+        self.price_output = float(os.getenv("OPENAI_PRICE_OUTPUT_PER_1M", "10.00"))
+
+    def record(
+        self,
+        product_name: str,
+        outcome: str,
+        latency_ms: float,
+        path: str = "sync",
+        api_latency_ms: float = None,
+        usage=None,
+        retries: int = 0,
+        interrupted: bool = False
+    ) -> Dict:
+        """
+        Registra uma chamada a generate_search_terms/stream_search_terms
+
+        Args:
+            product_name: Nome do produto
+            outcome: 'hit', 'shared', 'derived', 'miss' ou 'fallback'
+            latency_ms: Latência total percebida pelo chamador
+            path: 'sync' ou 'stream'
+            api_latency_ms: Latência da chamada à API (None se não houve)
+            usage: response.usage da API (opcional)
+            retries: Retentativas feitas pelo ResilientChatClient
+            interrupted: Streaming fechado pelo consumidor antes do fim
+
+        Returns:
+            Linha registrada
+        """
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+
+        row = {
+            'ts': time.time(),
+            'product': product_name,
+            'outcome': outcome,
+            'path': path,
+            'latency_ms': round(latency_ms, 2),
+            'api_latency_ms': round(api_latency_ms, 2) if api_latency_ms is not None else None,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cost_usd': (prompt_tokens * self.price_input + completion_tokens * self.price_output) / 1_000_000,
+            'retries': retries,
+            'fallback': outcome == 'fallback',
+            'interrupted': interrupted,
+        }
+
+        with self._lock:
+            self.rows.append(row)
+            try:
+                with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            except Exception as e:
+                logging.error(f"Erro ao gravar métricas: {e}")
+
+        return row
+
+    def summary(self, last: int = None) -> Dict:
+        """
+        Agregados da janela em memória
+
+        Args:
+            last: Considerar apenas as últimas N chamadas (None = janela inteira)
+
+        Returns:
+            Dicionário de agregados (ver summarize)
+        """
+        with self._lock:
+            rows = list(self.rows)
+        if last is not None:
+            rows = rows[-last:]
+        return summarize(rows)
+
+
+def load_rows(metrics_file: str = None, last: int = None, since: float = None) -> List[Dict]:
+    """
+    Lê linhas de métricas do arquivo JSONL
+
+    Args:
+        metrics_file: Arquivo JSONL (None = logs/ai_metrics.jsonl)
+        last: Manter apenas as últimas N linhas
+        since: Manter apenas linhas com ts >= since (epoch)
+
+    Returns:
+        Lista de linhas
+    """
+    path = str(metrics_file or DEFAULT_METRICS_FILE)
+    if not os.path.exists(path):
+        return []
+
+    rows = deque(maxlen=last) if last else []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since is not None and row.get('ts', 0) < since:
+                continue
+            rows.append(row)
+    return list(rows)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Resumo das métricas do AIAgent")
+    parser.add_argument('--file', default=None, help="Arquivo JSONL (padrão: logs/ai_metrics.jsonl)")
+    parser.add_argument('--last', type=int, default=None, help="Apenas as últimas N chamadas")
+    parser.add_argument('--hours', type=float, default=None, help="Apenas as últimas H horas")
+    parser.add_argument('--json', action='store_true', help="Saída em JSON")
+    args = parser.parse_args(argv)
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    report = summarize(load_rows(args.file, args.last, since))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print("=" * 60)
+    print("MÉTRICAS DO AGENTE DE IA")
+    print("=" * 60)
+    print(f"\n📞 Chamadas: {report['chamadas']} (API: {report['chamadas_api']}, retries: {report['retries']}, "
+          f"interrompidas: {report['interrompidas']})")
+    for outcome, count in report['desfechos'].items():
+        print(f"   {outcome:<9} {count}")
+    print(f"\n💾 Servidas sem API: {report['taxa_cache'] * 100:.1f}%")
+    print(f"⚠️  Fallback: {report['taxa_fallback'] * 100:.1f}%")
+    lat = report['latencia_ms']
+    api = report['latencia_api_ms']
+    print(f"\n⏱️  Latência total  p50 {lat['p50']} ms | p95 {lat['p95']} ms | p99 {lat['p99']} ms")
+    print(f"   Latência da API p50 {api['p50']} ms | p95 {api['p95']} ms | p99 {api['p99']} ms (média {api['media']} ms)")
+    print(f"\n🔤 Tokens: {report['tokens_prompt']} prompt + {report['tokens_resposta']} resposta")
+    print(f"💰 Custo estimado: US$ {report['custo_usd']:.4f}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Módulo de backups incrementais do arquivo de saída
+Snapshots completos periódicos + deltas (segmentos do journal), todos
+comprimidos com gzip, indexados em um manifest.json e com retenção por tamanho
+"""
+
+import os
+import io
+import gzip
+import json
+import shutil
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+
+import pandas as pd
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MANIFEST_FORMAT_VERSION = 1
+
+
+class BackupStore:
+    """Cadeias de backup: um snapshot completo seguido de deltas"""
+
+    def __init__(self, backup_dir: str, full_every: int = 20, max_bytes: int = 50 * 1024 * 1024):
+        """
+        Inicializa o repositório de backups
+
+        Args:
+            backup_dir: Diretório dos backups
+            full_every: Deltas entre dois snapshots completos
+            max_bytes: Espaço máximo ocupado pelos backups (cadeias inteiras
+                       mais antigas são removidas; a cadeia atual é sempre mantida)
+        """
+        self.backup_dir = backup_dir
+        self.manifest_path = os.path.join(backup_dir, 'manifest.json')
+        self.full_every = max(1, full_every)
+        self.max_bytes = max_bytes
+
+        os.makedirs(backup_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        """Carrega o manifest (ou cria um vazio)"""
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('format') == MANIFEST_FORMAT_VERSION:
+                    return manifest
+                logging.warning("Manifest de backups em formato desconhecido; recriando")
+            except Exception as e:
+                logging.error(f"Erro ao carregar manifest de backups: {e}")
+
+        return {'format': MANIFEST_FORMAT_VERSION, 'next_id': 1, 'entries': []}
+
+    def _save_manifest(self):
+        """Salva o manifest (escrita atômica via arquivo temporário)"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def list_backups(self) -> List[Dict]:
+        """Retorna as entradas do manifest (mais antiga primeiro)"""
+        return list(self.manifest['entries'])
+
+    def total_bytes(self) -> int:
+        """Espaço ocupado pelos backups indexados"""
+        return sum(entry['size'] for entry in self.manifest['entries'])
+
+    def _needs_full(self) -> bool:
+        """Verifica se o próximo backup deve ser um snapshot completo"""
+        entries = self.manifest['entries']
+        if not entries:
+            return True
+        last_full = entries[-1]['base']
+        deltas = sum(1 for e in entries if e['base'] == last_full and e['type'] == 'delta')
+        return deltas >= self.full_every
+
+    def add(self, output_path: str, journal_segment: str, skipped: Optional[Iterable[int]] = None) -> Optional[Dict]:
+        """
+        Registra um ponto de restauração após um checkpoint
+
+        Args:
+            output_path: CSV de saída recém-consolidado
+            journal_segment: Registros do journal consolidados neste checkpoint
+                             (None = sem journal; força um snapshot completo)
+            skipped: Iterações puladas no estado do CSV (guardadas com os
+                     snapshots completos; nos deltas vêm dos registros)
+
+        Returns:
+            Entrada criada no manifest (None em caso de erro)
+        """
+        try:
+            backup_id = self.manifest['next_id']
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            records = journal_segment.count('\n') if journal_segment else 0
+
+            full_skipped = None
+            if journal_segment is None or self._needs_full():
+                kind = 'full'
+                full_skipped = sorted(int(n) for n in skipped) if skipped is not None else None
+                file_name = f"full_{backup_id:06d}_{timestamp}.csv.gz"
+                with open(output_path, 'rb') as src, \
+                        gzip.open(os.path.join(self.backup_dir, file_name), 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                base = backup_id
+            else:
+                kind = 'delta'
+                file_name = f"delta_{backup_id:06d}_{timestamp}.jsonl.gz"
+                with gzip.open(os.path.join(self.backup_dir, file_name), 'wt', encoding='utf-8') as dst:
+                    dst.write(journal_segment)
+                base = self.manifest['entries'][-1]['base']
+
+            entry = {
+                'id': backup_id,
+                'type': kind,
+                'file': file_name,
+                'base': base,
+                'records': records,
+                'size': os.path.getsize(os.path.join(self.backup_dir, file_name)),
+                'created': datetime.now().isoformat(timespec='seconds')
+            }
+            if full_skipped is not None:
+                entry['skipped'] = full_skipped
+
+            self.manifest['entries'].append(entry)
+            self.manifest['next_id'] = backup_id + 1
+            self._enforce_retention()
+            self._save_manifest()
+
+            logging.info(f"Backup {kind} criado: {file_name} ({entry['size']} bytes)")
+            return entry
+
+        except Exception as e:
+            logging.error(f"Erro ao criar backup: {e}")
+            return None
+
+    def _enforce_retention(self):
+        """Remove as cadeias mais antigas enquanto o limite de espaço for excedido"""
+        entries = self.manifest['entries']
+        current_base = entries[-1]['base'] if entries else None
+
+        while self.total_bytes() > self.max_bytes:
+            oldest_base = entries[0]['base']
+            if oldest_base == current_base:
+                break
+
+            chain = [e for e in entries if e['base'] == oldest_base]
+            for entry in chain:
+                try:
+                    os.remove(os.path.join(self.backup_dir, entry['file']))
+                except FileNotFoundError:
+                    pass
+            entries[:] = [e for e in entries if e['base'] != oldest_base]
+            logging.info(f"Cadeia de backup {oldest_base} removida ({len(chain)} arquivos)")
+
+    def restore(self, backup_id: int = None) -> Tuple[pd.DataFrame, List[Dict], Optional[List[int]]]:
+        """
+        Reconstrói um ponto de restauração
+
+        Args:
+            backup_id: Id do backup (None = mais recente)
+
+        Returns:
+            (DataFrame do snapshot completo da cadeia, registros dos deltas a
+            reaplicar em ordem, iterações puladas no snapshot - None em
+            backups antigos, gravados sem essa informação)
+        """
+        entries = self.manifest['entries']
+        if not entries:
+            raise ValueError("Nenhum backup disponível")
+
+        if backup_id is None:
+            target = entries[-1]
+        else:
+            target = next((e for e in entries if e['id'] == backup_id), None)
+            if target is None:
+                raise ValueError(f"Backup não encontrado: {backup_id}")
+
+        chain = [e for e in entries if e['base'] == target['base'] and e['id'] <= target['id']]
+        full = chain[0]
+
+        with gzip.open(os.path.join(self.backup_dir, full['file']), 'rb') as f:
+            df = pd.read_csv(io.BytesIO(f.read()))
+
+        records = []
+        for entry in chain[1:]:
+            with gzip.open(os.path.join(self.backup_dir, entry['file']), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+
+        return df, records, full.get('skipped')
@@ -0,0 +1,318 @@
+"""
+Módulo do catálogo colunar em disco
+Grava Itens_Ativos (já normalizado) em um arquivo binário por colunas -
+offsets + heap de texto UTF-8 para os nomes, arrays numéricos para preços e
+gramaturas - que cada processo abre com mmap somente leitura. Várias
+instâncias do app e workers em lote compartilham a mesma cópia no cache de
+páginas do sistema, sem recarregar nem normalizar o CSV
+"""
+
+import os
+import re
+import json
+import mmap
+import logging
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .output_export import parse_price_cents
+except ImportError:
+    from output_export import parse_price_cents
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'data_processor.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MAGIC = b'SHOPCAT1'
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+
+# Separador entre textos no heap (buscas de substring não atravessam linhas)
+SEPARATOR = b'\n'
+
+# Preço ausente ou inválido nos arrays de centavos
+MISSING_CENTS = -1
+
+# Gramatura no nome normalizado: "200g", "1 5l" (1,5 l), "c 12un"
+SIZE_EXTRACT = re.compile(r'(\d+)(?: (\d{1,3}))?\s?(kg|mg|g|ml|l|unidades|unid|un)\b')
+SIZE_UNITS = {'g': 1, 'ml': 2, 'un': 3}
+UNIT_FACTORS = {
+    'kg': ('g', 1000.0), 'g': ('g', 1.0), 'mg': ('g', 0.001),
+    'l': ('ml', 1000.0), 'ml': ('ml', 1.0),
+    'un': ('un', 1.0), 'unid': ('un', 1.0), 'unidades': ('un', 1.0),
+}
+
+
+def parse_sizes(normalized_names: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extrai a primeira gramatura de cada nome normalizado (vetorizado)
+
+    Args:
+        normalized_names: Coluna nome_normalizado
+
+    Returns:
+        (tamanho em g/ml/un como float64 - NaN sem gramatura,
+         unidade como int8 - 0 sem gramatura, ver SIZE_UNITS)
+    """
+    parts = normalized_names.astype(object).fillna('').astype(str).str.extract(SIZE_EXTRACT)
+    whole = pd.to_numeric(parts[0], errors='coerce')
+    fraction = pd.to_numeric(parts[1], errors='coerce') / (10.0 ** parts[1].str.len())
+    value = whole + fraction.fillna(0)
+
+    unit = parts[2].map(lambda u: UNIT_FACTORS[u][0] if isinstance(u, str) else None)
+    factor = parts[2].map(lambda u: UNIT_FACTORS[u][1] if isinstance(u, str) else np.nan)
+
+    sizes = (value * factor.astype(float)).to_numpy(dtype=np.float64)
+    units = unit.map(SIZE_UNITS).fillna(0).to_numpy(dtype=np.int8)
+    return sizes, units
+
+
+def price_columns(columns) -> List[str]:
+    """Colunas de preço do catálogo (preco_loja_programada, preco_loja_fresh, ...)"""
+    return [c for c in columns if str(c).startswith('preco_')]
+
+
+def _encode_strings(values: pd.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Offsets (n+1), heap UTF-8 e máscara de nulos de uma coluna de texto"""
+    nulls = values.isna().to_numpy()
+    encoded = [b'' if null else str(v).encode('utf-8') for v, null in zip(values.tolist(), nulls)]
+    lengths = np.fromiter((len(e) + len(SEPARATOR) for e in encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    heap = np.frombuffer(SEPARATOR.join(encoded) + (SEPARATOR if encoded else b''), dtype=np.uint8)
+    return offsets, heap, nulls
+
+
+def write_catalog_file(
+    df: pd.DataFrame,
+    path: str,
+    source_signature: Tuple[int, int],
+    row_hashes: np.ndarray
+) -> str:
+    """
+    Grava o catálogo no formato colunar (escrita atômica)
+
+    Args:
+        df: Catálogo carregado (com nome_normalizado)
+        path: Arquivo de destino
+        source_signature: (tamanho, mtime_ns) do CSV de origem
+        row_hashes: Hash do conteúdo de cada linha (mesma ordem de df)
+
+    Returns:
+        Caminho gravado
+    """
+    sections: Dict[str, np.ndarray] = {'row_index': df.index.to_numpy(dtype=np.int64)}
+    columns = []
+
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            sections[f'{column}:values'] = series.to_numpy(dtype=np.float64) if series.isna().any() else series.to_numpy()
+            columns.append({'name': column, 'kind': 'num'})
+        else:
+            offsets, heap, nulls = _encode_strings(series)
+            sections[f'{column}:offsets'] = offsets
+            sections[f'{column}:heap'] = heap
+            sections[f'{column}:nulls'] = nulls
+            columns.append({'name': column, 'kind': 'str'})
+
+    # Arrays derivados para filtros e ordenação
+    for column in price_columns(df.columns):
+        cents = parse_price_cents(df[column])
+        sections[f'{column}:cents'] = cents.fillna(MISSING_CENTS).to_numpy(dtype=np.int64)
+    sizes, units = parse_sizes(df['nome_normalizado'])
+    sections['tamanho'] = sizes
+    sections['unidade'] = units
+    sections['row_hashes'] = np.asarray(row_hashes, dtype=np.uint64)
+
+    layout = {}
+    position = 0
+    for name, array in sections.items():
+        layout[name] = [position, array.dtype.str, len(array)]
+        position += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({
+        'format': FORMAT_VERSION,
+        'source': list(source_signature),
+        'rows': len(df),
+        'columns': columns,
+        'sections': layout,
+    }, ensure_ascii=False).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, array in sections.items():
+            f.seek(data_start + layout[name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + position)
+    os.replace(tmp_path, path)
+
+    logging.info(f"Catálogo colunar gravado: {path} ({len(df)} itens, {data_start + position} bytes)")
+    return path
+
+
+def read_source_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Assinatura do CSV de origem gravada no arquivo (None se ilegível ou de outro formato)"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            header = json.loads(f.read(int(np.frombuffer(f.read(8), dtype=np.uint64)[0])))
+    except (OSError, ValueError, IndexError):
+        return None
+    if header.get('format') != FORMAT_VERSION:
+        return None
+    return tuple(header['source'])
+
+
+class ColumnarCatalog:
+    """Catálogo colunar aberto com mmap (somente leitura, sem cópia)"""
+
+    def __init__(self, path: str):
+        """
+        Abre o arquivo
+
+        Args:
+            path: Arquivo gravado por write_catalog_file
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Arquivo de catálogo inválido: {path}")
+        header_size = int(np.frombuffer(self._mm, dtype=np.uint64, count=1, offset=len(MAGIC))[0])
+        header = json.loads(self._mm[len(MAGIC) + 8:len(MAGIC) + 8 + header_size])
+        if header['format'] != FORMAT_VERSION:
+            raise ValueError(f"Versão de catálogo não suportada: {header['format']}")
+
+        self.source_signature = tuple(header['source'])
+        self.columns = [c['name'] for c in header['columns']]
+        self._kinds = {c['name']: c['kind'] for c in header['columns']}
+        self._rows = header['rows']
+
+        data_start = -(-(len(MAGIC) + 8 + header_size) // ALIGNMENT) * ALIGNMENT
+        self._sections = {
+            name: (data_start + offset, np.dtype(dtype), count)
+            for name, (offset, dtype, count) in header['sections'].items()
+        }
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __repr__(self):
+        return f"ColumnarCatalog({self.path!r}, {self._rows} itens)"
+
+    def array(self, name: str) -> np.ndarray:
+        """Seção do arquivo como array numpy (view sobre o mmap)"""
+        offset, dtype, count = self._sections[name]
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+
+    def has_array(self, name: str) -> bool:
+        return name in self._sections
+
+    def _strings(self, column: str, positions: np.ndarray) -> List[Optional[str]]:
+        """Decodifica os textos de uma coluna nas posições pedidas"""
+        offsets = self.array(f'{column}:offsets')
+        nulls = self.array(f'{column}:nulls')
+        heap_start = self._sections[f'{column}:heap'][0]
+        mm = self._mm
+        return [
+            None if nulls[p] else mm[heap_start + offsets[p]:heap_start + offsets[p + 1] - len(SEPARATOR)].decode('utf-8')
+            for p in positions.tolist()
+        ]
+
+    def column(self, column: str, positions: np.ndarray = None) -> pd.Series:
+        """
+        Lê uma coluna (inteira ou só algumas linhas)
+
+        Args:
+            column: Nome da coluna original
+            positions: Posições das linhas (padrão: todas)
+        """
+        if positions is None:
+            positions = np.arange(self._rows)
+        if self._kinds[column] == 'num':
+            return pd.Series(self.array(f'{column}:values')[positions], name=column)
+        return pd.Series(self._strings(column, positions), name=column, dtype='str')
+
+    def rows(self, positions: np.ndarray) -> pd.DataFrame:
+        """
+        Monta um DataFrame só com as linhas pedidas (mesmo índice da carga do CSV)
+
+        Args:
+            positions: Posições das linhas
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        df = pd.DataFrame({column: self.column(column, positions) for column in self.columns})
+        df.index = self.array('row_index')[positions]
+        return df
+
+    def to_frame(self) -> pd.DataFrame:
+        """Catálogo inteiro como DataFrame (decodifica todos os textos)"""
+        return self.rows(np.arange(self._rows))
+
+    def contains(self, column: str, needle: str) -> np.ndarray:
+        """
+        Posições das linhas cujo texto contém a substring (busca direto no heap)
+
+        Args:
+            column: Coluna de texto (ex.: nome_normalizado)
+            needle: Substring (sem quebra de linha)
+
+        Returns:
+            Posições em ordem crescente
+        """
+        offsets = self.array(f'{column}:offsets')
+        nulls = self.array(f'{column}:nulls')
+        if not needle:
+            return np.flatnonzero(~nulls)
+
+        pattern = needle.encode('utf-8')
+        heap_start, _, heap_size = self._sections[f'{column}:heap']
+        heap_end = heap_start + heap_size
+        mm = self._mm
+
+        found = []
+        position = mm.find(pattern, heap_start, heap_end)
+        while position >= 0:
+            row = int(np.searchsorted(offsets, position - heap_start, side='right')) - 1
+            found.append(row)
+            # Uma ocorrência por linha: continuar no início da próxima
+            position = mm.find(pattern, heap_start + int(offsets[row + 1]), heap_end)
+        result = np.array(found, dtype=np.int64)
+        return result[~nulls[result]] if len(result) else result
+
+
+# Uso pela linha de comando: python src/catalog_file.py [Itens_Ativos.csv] [destino]
+if __name__ == "__main__":
+    import sys
+    import time
+
+    try:
+        from .data_processor import DataProcessor
+    except ImportError:
+        from data_processor import DataProcessor
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "Itens_Ativos.csv"
+    target = sys.argv[2] if len(sys.argv) > 2 else "data/itens_ativos.cat"
+
+    DataProcessor(source, catalog_file=target)
+    start = time.perf_counter()
+    catalog = ColumnarCatalog(target)
+    print(f"{catalog} aberto em {(time.perf_counter() - start) * 1000:.1f} ms")
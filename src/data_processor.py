@@ -3,66 +3,464 @@ Módulo para processamento e busca de dados nos CSVs
 Realiza buscas inteligentes nos Itens_Ativos usando os termos gerados pela IA
 """
 
+import os
+import numpy as np
 import pandas as pd
 import re
+import threading
 import unicodedata
 import logging
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Iterator
 from fuzzywuzzy import fuzz
 
+try:
+    from .catalog_file import (
+        MISSING_CENTS, ColumnarCatalog, parse_sizes, price_columns, read_source_signature, write_catalog_file
+    )
+    from .output_export import parse_price_cents
+    from .search_filters import FilterIndex
+except ImportError:
+    from catalog_file import (
+        MISSING_CENTS, ColumnarCatalog, parse_sizes, price_columns, read_source_signature, write_catalog_file
+    )
+    from output_export import parse_price_cents
+    from search_filters import FilterIndex
+
 logging.basicConfig(
     filename='logs/data_processor.log',
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Colunas calculadas na carga (fora do hash de conteúdo)
+DERIVED_COLUMNS = ('nome_normalizado',)
+
+# Cada coluna preco_<loja> do catálogo é uma loja; a padrão é a do layout de saída
+PRICE_PREFIX = 'preco_'
+DEFAULT_STORE = 'loja_programada'
+
+
+class CatalogSnapshot:
+    """
+    Versão imutável do catálogo e dos seus índices
+    
+    Nunca é alterada depois de publicada: a recarga monta um snapshot novo e
+    troca a referência de uma vez. Quem lê guarda o snapshot durante toda a
+    consulta e enxerga um catálogo consistente, sem locks.
+    """
+    
+    def __init__(
+        self,
+        version: int,
+        signature: Tuple[int, int],
+        df: pd.DataFrame = None,
+        row_hashes: pd.Series = None,
+        columnar: ColumnarCatalog = None,
+        stores: Dict[str, pd.Series] = None
+    ):
+        """
+        Args:
+            version: Versão (incrementada a cada recarga com mudanças)
+            signature: (tamanho, mtime_ns) do CSV carregado
+            df: Catálogo em memória (ou None com columnar)
+            row_hashes: Hash do conteúdo por cod_produto
+            columnar: Catálogo colunar em mmap (buscas sem montar o DataFrame)
+            stores: Preços de lojas carregados de arquivos ({loja: preço por cod_produto})
+        """
+        self.version = version
+        self.signature = signature
+        self.columnar = columnar
+        self.stores = stores or {}
+        # Derivados montados na primeira consulta (determinísticos)
+        self._df = df
+        self._row_hashes = row_hashes
+        self._codes = None
+        self._cents: Dict[str, np.ndarray] = {}
+        self._filters = None
+    
+    @property
+    def df(self) -> pd.DataFrame:
+        """Catálogo como DataFrame (no modo colunar, decodificado só se pedido)"""
+        if self._df is None:
+            self._df = self.columnar.to_frame()
+        return self._df
+    
+    @property
+    def codes(self) -> pd.Index:
+        """Posição de cada cod_produto (códigos já sem duplicatas)"""
+        if self._codes is None:
+            if self._df is None:
+                self._codes = pd.Index(self.columnar.column('cod_produto').to_numpy())
+            else:
+                self._codes = pd.Index(self._df['cod_produto'].to_numpy())
+        return self._codes
+    
+    @property
+    def row_hashes(self) -> pd.Series:
+        """Hash do conteúdo de cada linha, indexado por cod_produto"""
+        if self._row_hashes is None:
+            self._row_hashes = pd.Series(self.columnar.array('row_hashes'), index=self.codes.rename('cod_produto'))
+        return self._row_hashes
+    
+    @property
+    def columns(self) -> List[str]:
+        return list(self.columnar.columns) if self._df is None else list(self._df.columns)
+    
+    @property
+    def store_names(self) -> List[str]:
+        """Lojas disponíveis: colunas preco_<loja> do catálogo e arquivos de preço"""
+        names = [c[len(PRICE_PREFIX):] for c in price_columns(self.columns)]
+        return names + [store for store in self.stores if store not in names]
+    
+    def store_prices(self, store: str, positions) -> np.ndarray:
+        """
+        Preço (texto) de uma loja nas posições pedidas, pelo mesmo índice de códigos
+        
+        Args:
+            store: Loja (ex.: 'loja_programada', 'loja_fresh' ou a de um arquivo)
+            positions: Posições das linhas (-1 = sem preço)
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        valid = positions >= 0
+        prices = np.full(len(positions), np.nan, dtype=object)
+        
+        if store in self.stores:
+            codes = self.codes[positions[valid]]
+            prices[valid] = self.stores[store].reindex(codes).to_numpy()
+            return prices
+        
+        column = PRICE_PREFIX + store
+        if column not in self.columns:
+            raise ValueError(f"Loja desconhecida: {store} (disponíveis: {', '.join(self.store_names)})")
+        if self._df is None:
+            prices[valid] = self.columnar.column(column, positions[valid]).to_numpy()
+        else:
+            prices[valid] = self._df[column].to_numpy()[positions[valid]]
+        return prices
+    
+    def store_cents(self, store: str) -> np.ndarray:
+        """Preço em centavos de uma loja para todas as linhas (MISSING_CENTS sem preço)"""
+        cents = self._cents.get(store)
+        if cents is None:
+            column = PRICE_PREFIX + store
+            if store not in self.stores and self._df is None and self.columnar.has_array(f'{column}:cents'):
+                cents = self.columnar.array(f'{column}:cents')
+            else:
+                prices = pd.Series(self.store_prices(store, np.arange(len(self))))
+                cents = parse_price_cents(prices).fillna(MISSING_CENTS).to_numpy(dtype=np.int64)
+            self._cents[store] = cents
+        return cents
+    
+    def names(self) -> pd.Series:
+        """Coluna nome_normalizado inteira"""
+        if self._df is None:
+            return self.columnar.column('nome_normalizado')
+        return self._df['nome_normalizado']
+    
+    def size_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Gramatura (g/ml/un) e unidade de cada linha"""
+        if self._df is None:
+            return self.columnar.array('tamanho'), self.columnar.array('unidade')
+        return parse_sizes(self._df['nome_normalizado'])
+    
+    @property
+    def filters(self) -> FilterIndex:
+        """Arrays de pré-filtro deste snapshot"""
+        if self._filters is None:
+            self._filters = FilterIndex(self)
+        return self._filters
+    
+    def rows(self, positions) -> pd.DataFrame:
+        """Linhas do catálogo nas posições pedidas"""
+        if self._df is None:
+            return self.columnar.rows(positions)
+        return self._df.iloc[positions]
+    
+    def name_matches(self, term_normalized: str, candidates: np.ndarray = None) -> pd.DataFrame:
+        """
+        Linhas cujo nome normalizado contém o termo (no modo colunar, busca direto no heap)
+        
+        Args:
+            term_normalized: Termo já normalizado
+            candidates: Máscara dos pré-filtros (só essas linhas são comparadas)
+        """
+        if self._df is None:
+            positions = self.columnar.contains('nome_normalizado', term_normalized)
+            if candidates is not None:
+                positions = positions[candidates[positions]]
+            return self.rows(positions)
+        scope = self._df if candidates is None else self._df[candidates]
+        return scope[
+            scope['nome_normalizado'].str.contains(
+                term_normalized, 
+                case=False, 
+                na=False, 
+                regex=False
+            )
+        ]
+    
+    def sample(self, size: int, candidates: np.ndarray = None) -> pd.DataFrame:
+        """Amostra fixa (random_state=42) do catálogo, igual nos dois modos"""
+        if candidates is not None:
+            positions = np.flatnonzero(candidates)
+            if len(positions) > size:
+                positions = pd.Series(positions).sample(n=size, random_state=42).to_numpy()
+            return self.rows(positions)
+        if self._df is None:
+            positions = pd.Series(np.arange(len(self))).sample(n=size, random_state=42).to_numpy()
+            return self.rows(positions)
+        return self._df.sample(n=size, random_state=42)
+    
+    def __len__(self) -> int:
+        return len(self.columnar) if self._df is None else len(self._df)
+    
+    def __repr__(self):
+        mode = ", mmap" if self.columnar is not None else ""
+        return f"CatalogSnapshot(v{self.version}, {len(self)} itens{mode})"
+
 
 class DataProcessor:
     """Processa e busca dados nos CSVs"""
     
-    def __init__(self, itens_ativos_path: str):
+    # Colunas retornadas pelas buscas
+    RESULT_COLUMNS = [
+        'cod_produto', 
+        'nome', 
+        'preco_loja_programada',
+        'score',
+        'termo_usado',
+        'tipo_match'
+    ]
+    
+    def __init__(self, itens_ativos_path: str, catalog_file: str = None, store: str = None):
         """
         Inicializa o processador de dados
         
         Args:
             itens_ativos_path: Caminho para o CSV com itens disponíveis
+            catalog_file: Catálogo colunar compartilhado via mmap (padrão:
+                          CATALOG_FILE; vazio = catálogo em memória)
+            store: Loja padrão das buscas (padrão: PRICE_STORE ou loja_programada)
         """
         self.itens_ativos_path = itens_ativos_path
-        self.df_ativos = None
+        self.catalog_file = catalog_file if catalog_file is not None else os.getenv("CATALOG_FILE", "")
+        self.default_store = store or os.getenv("PRICE_STORE", DEFAULT_STORE)
+        self._snapshot: CatalogSnapshot = None
+        # Preços por loja vindos de arquivos (substituído por inteiro, nunca alterado)
+        self._store_prices: Dict[str, pd.Series] = {}
+        # Só serializa as recargas; leituras não usam lock
+        self._reload_lock = threading.Lock()
         self.load_itens_ativos()
         
+        # Arquivos de preço por loja: "loja_centro=precos_centro.csv;loja_sul=precos_sul.csv"
+        for entry in os.getenv("STORE_PRICE_FILES", "").split(';'):
+            if '=' in entry:
+                store_name, path = entry.split('=', 1)
+                self.load_store_prices(store_name.strip(), path.strip())
+    
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Snapshot atual do catálogo (guarde-o para várias consultas consistentes)"""
+        return self._snapshot
+    
+    @property
+    def df_ativos(self) -> pd.DataFrame:
+        """Catálogo do snapshot atual (somente leitura)"""
+        return self._snapshot.df
+        
     def load_itens_ativos(self):
         """Carrega o CSV de itens ativos e faz pré-processamento"""
         try:
-            # Ler CSV
-            self.df_ativos = pd.read_csv(self.itens_ativos_path)
-            
-            # Limpar colunas vazias no final
-            self.df_ativos = self.df_ativos.dropna(how='all', axis=1)
+            signature = self._current_signature()
+            version = self._snapshot.version + 1 if self._snapshot is not None else 1
             
-            # Remover linhas completamente vazias
-            self.df_ativos = self.df_ativos.dropna(how='all')
+            # Catálogo colunar já gravado para este CSV: só abrir (mmap)
+            if self.catalog_file and read_source_signature(self.catalog_file) == signature:
+                columnar = ColumnarCatalog(self.catalog_file)
+                self._snapshot = CatalogSnapshot(version, signature, columnar=columnar, stores=self._store_prices)
+                logging.info(f"Catálogo colunar aberto: {columnar}")
+                return
             
-            # Garantir que as colunas necessárias existem
-            required_cols = ['cod_produto', 'nome', 'preco_loja_programada']
-            for col in required_cols:
-                if col not in self.df_ativos.columns:
-                    raise ValueError(f"Coluna '{col}' não encontrada no CSV")
+            df = self._read_catalog()
             
             # Criar coluna normalizada para busca mais eficiente
-            self.df_ativos['nome_normalizado'] = self.df_ativos['nome'].apply(
-                lambda x: self.normalize_text(str(x)) if pd.notna(x) else ""
-            )
+            df['nome_normalizado'] = self._normalize_names(df['nome'])
             
-            # Remover duplicatas por cod_produto (manter primeira ocorrência)
-            self.df_ativos = self.df_ativos.drop_duplicates(subset=['cod_produto'], keep='first')
+            self._snapshot = self._publish(version, signature, df, self._content_hashes(df))
             
-            logging.info(f"Carregados {len(self.df_ativos)} itens ativos")
+            logging.info(f"Carregados {len(df)} itens ativos (versão {version})")
             
         except Exception as e:
             logging.error(f"Erro ao carregar itens ativos: {e}")
             raise
     
+    def _publish(self, version: int, signature: Tuple[int, int], df: pd.DataFrame, hashes: pd.Series) -> CatalogSnapshot:
+        """Monta o snapshot; com catalog_file, grava o arquivo colunar e passa a usá-lo"""
+        if self.catalog_file:
+            try:
+                write_catalog_file(df, self.catalog_file, signature, hashes.to_numpy())
+                return CatalogSnapshot(version, signature, columnar=ColumnarCatalog(self.catalog_file), stores=self._store_prices)
+            except OSError as e:
+                # Ex.: no Windows, arquivo aberto por outro processo não pode ser substituído
+                logging.warning(f"Catálogo colunar não gravado ({e}); usando catálogo em memória")
+        return CatalogSnapshot(version, signature, df=df, row_hashes=hashes, stores=self._store_prices)
+    
+    def _read_catalog(self) -> pd.DataFrame:
+        """Lê e limpa o CSV de itens ativos (sem as colunas derivadas)"""
+        # Ler CSV
+        df = pd.read_csv(self.itens_ativos_path)
+        
+        # Limpar colunas vazias no final
+        df = df.dropna(how='all', axis=1)
+        
+        # Remover linhas completamente vazias
+        df = df.dropna(how='all')
+        
+        # Garantir que as colunas necessárias existem
+        required_cols = ['cod_produto', 'nome', 'preco_loja_programada']
+        for col in required_cols:
+            if col not in df.columns:
+                raise ValueError(f"Coluna '{col}' não encontrada no CSV")
+        
+        # Remover duplicatas por cod_produto (manter primeira ocorrência)
+        return df.drop_duplicates(subset=['cod_produto'], keep='first').copy()
+    
+    def _normalize_names(self, names: pd.Series) -> pd.Series:
+        """Aplica normalize_text a uma coluna de nomes"""
+        return names.apply(lambda x: self.normalize_text(str(x)) if pd.notna(x) else "")
+    
+    def _current_signature(self) -> Tuple[int, int]:
+        """Tamanho e mtime do arquivo de itens ativos"""
+        stat = os.stat(self.itens_ativos_path)
+        return stat.st_size, stat.st_mtime_ns
+    
+    @staticmethod
+    def _content_hashes(df: pd.DataFrame) -> pd.Series:
+        """Hash do conteúdo de cada linha (colunas do CSV), indexado por cod_produto"""
+        columns = [c for c in df.columns if c not in DERIVED_COLUMNS]
+        hashes = pd.util.hash_pandas_object(df[columns], index=False)
+        return pd.Series(hashes.to_numpy(), index=pd.Index(df['cod_produto'].to_numpy(), name='cod_produto'))
+    
+    def has_file_changed(self) -> bool:
+        """Indica se o CSV de itens ativos mudou desde a última carga (para o poller)"""
+        try:
+            return self._current_signature() != self._snapshot.signature
+        except OSError:
+            return False
+    
+    def reload(self) -> Dict[str, List]:
+        """
+        Recarrega o CSV aplicando só as diferenças em relação ao catálogo carregado
+        
+        As linhas são comparadas por cod_produto e hash do conteúdo; apenas as
+        inseridas e alteradas são normalizadas de novo. O resultado é idêntico
+        a uma carga completa (mesma ordem do arquivo novo) e é publicado como
+        um snapshot novo; buscas em andamento continuam no anterior.
+        
+        Returns:
+            Dicionário com as listas de códigos 'inserted', 'updated' e 'deleted'
+        """
+        with self._reload_lock:
+            base = self._snapshot
+            signature = self._current_signature()
+            
+            # Outro processo já gravou o catálogo colunar deste CSV: só abrir
+            shared = None
+            if self.catalog_file and read_source_signature(self.catalog_file) == signature:
+                shared = CatalogSnapshot(base.version + 1, signature, columnar=ColumnarCatalog(self.catalog_file), stores=self._store_prices)
+                hashes = shared.row_hashes
+            else:
+                df = self._read_catalog()
+                hashes = self._content_hashes(df)
+            old_hashes = base.row_hashes
+            
+            inserted = hashes.index.difference(old_hashes.index, sort=False)
+            deleted = old_hashes.index.difference(hashes.index, sort=False)
+            common = hashes.index.intersection(old_hashes.index, sort=False)
+            updated = common[hashes[common].to_numpy() != old_hashes[common].to_numpy()]
+            
+            changes = {
+                'inserted': inserted.tolist(),
+                'updated': updated.tolist(),
+                'deleted': deleted.tolist()
+            }
+            
+            if not (len(inserted) or len(updated) or len(deleted)):
+                # Mesmo conteúdo: manter a versão, só registrar o arquivo visto
+                if shared is not None:
+                    # Ainda não publicado: pode receber a versão atual
+                    shared.version = base.version
+                    self._snapshot = shared
+                elif self.catalog_file:
+                    self._snapshot = self._publish(base.version, signature, base.df, hashes)
+                else:
+                    self._snapshot = CatalogSnapshot(base.version, signature, df=base.df, row_hashes=hashes, stores=self._store_prices)
+                return changes
+            
+            if shared is not None:
+                self._snapshot = shared
+            else:
+                # Reaproveitar o nome normalizado das linhas que não mudaram
+                if base.columnar is not None:
+                    names = base.columnar.column('nome_normalizado').to_numpy()
+                else:
+                    names = base.df['nome_normalizado'].to_numpy()
+                reused = pd.Series(names, index=base.codes)
+                changed = df['cod_produto'].isin(inserted.append(updated)).to_numpy()
+                normalized = df['cod_produto'].map(reused).astype(object)
+                normalized[changed] = self._normalize_names(df.loc[changed, 'nome']).to_numpy()
+                df['nome_normalizado'] = normalized.to_numpy()
+                
+                # Troca atômica da referência
+                self._snapshot = self._publish(base.version + 1, signature, df, hashes)
+        
+        logging.info(
+            f"Itens ativos recarregados (versão {base.version + 1}): {len(changes['inserted'])} novos, "
+            f"{len(changes['updated'])} alterados, {len(changes['deleted'])} removidos"
+        )
+        return changes
+    
+    @property
+    def stores(self) -> List[str]:
+        """Lojas com preço disponível (colunas preco_<loja> e arquivos carregados)"""
+        return self._snapshot.store_names
+    
+    def load_store_prices(self, store: str, source) -> int:
+        """
+        Carrega a lista de preços de uma loja sobre o mesmo catálogo
+        
+        Só a série de preços (por cod_produto) é guardada; nomes, índices e
+        buscas continuam compartilhados entre as lojas.
+        
+        Args:
+            store: Nome da loja (chave usada nas buscas)
+            source: CSV ou DataFrame com cod_produto e uma coluna de preço
+                    (preco_<store>, preco_loja_programada ou a primeira preco_*)
+        
+        Returns:
+            Quantidade de códigos do catálogo com preço nessa loja
+        """
+        df = pd.read_csv(source) if isinstance(source, str) else source
+        candidates = [PRICE_PREFIX + store, 'preco_loja_programada'] + price_columns(df.columns) + ['preco']
+        column = next((c for c in candidates if c in df.columns), None)
+        if 'cod_produto' not in df.columns or column is None:
+            raise ValueError(f"Arquivo de preços da loja {store} precisa de cod_produto e uma coluna de preço")
+        
+        prices = df.drop_duplicates('cod_produto', keep='first').set_index('cod_produto')[column].astype(object)
+        
+        with self._reload_lock:
+            base = self._snapshot
+            self._store_prices = {**self._store_prices, store: prices}
+            self._snapshot = CatalogSnapshot(
+                base.version + 1, base.signature,
+                df=base._df, row_hashes=base._row_hashes, columnar=base.columnar,
+                stores=self._store_prices
+            )
+        
+        matched = int(base.codes.isin(prices.index).sum())
+        logging.info(f"Preços da loja {store}: {matched} de {len(base)} itens ({column})")
+        return matched
+    
     @staticmethod
     def normalize_text(text: str) -> str:
         """
@@ -98,7 +496,10 @@ class DataProcessor:
         search_terms: List[str], 
         original_product_code: str = None,
         max_results: int = 50,
-        min_similarity: int = 60
+        min_similarity: int = 60,
+        snapshot: CatalogSnapshot = None,
+        store: str = None,
+        filters: Dict = None
     ) -> pd.DataFrame:
         """
         Busca produtos usando os termos de pesquisa
@@ -108,12 +509,78 @@ class DataProcessor:
             original_product_code: Código do produto original (para excluir da busca)
             max_results: Número máximo de resultados
             min_similarity: Similaridade mínima (0-100) para busca fuzzy
+            snapshot: Versão do catálogo a usar (padrão: a atual)
+            store: Loja cujo preço vai em preco_loja_programada (padrão: default_store)
+            filters: Pré-filtros aplicados antes da busca por termos, ex.:
+                     {'prefix': ['SHOP'], 'price': (5, 20), 'size': (100, 500, 'g'),
+                      'exclude': ['nestle']} (ver search_filters.parse_filter_expression)
             
         Returns:
             DataFrame com resultados encontrados
         """
+        df_results = None
+        for df_results in self.iter_search_products(
+            search_terms,
+            original_product_code,
+            max_results,
+            min_similarity,
+            partial=False,
+            snapshot=snapshot,
+            store=store,
+            filters=filters
+        ):
+            pass
+        
+        if df_results is not None and len(df_results) > 0:
+            logging.info(f"Encontrados {len(df_results)} produtos para termos: {search_terms[:3]}")
+            return df_results
+        
+        logging.warning(f"Nenhum produto encontrado para: {search_terms}")
+        return pd.DataFrame(columns=self.RESULT_COLUMNS)
+    
+    def iter_search_products(
+        self,
+        search_terms: Iterable[str],
+        original_product_code: str = None,
+        max_results: int = 50,
+        min_similarity: int = 60,
+        partial: bool = True,
+        snapshot: CatalogSnapshot = None,
+        store: str = None,
+        filters: Dict = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Busca incremental: consome os termos conforme chegam (ex: streaming
+        da IA) e entrega os resultados acumulados após cada termo
+        
+        Depois de atingir max_results os termos restantes continuam sendo
+        consumidos (sem buscar), para que o gerador de termos termine. Todos
+        os termos são buscados no mesmo snapshot do catálogo, mesmo que ele
+        seja recarregado durante o streaming.
+        
+        Args:
+            search_terms: Iterável de termos, do mais específico ao mais genérico
+            original_product_code: Código do produto original (para excluir da busca)
+            max_results: Número máximo de resultados
+            min_similarity: Similaridade mínima (0-100) para busca fuzzy
+            partial: Se False, entrega apenas o resultado final
+            snapshot: Versão do catálogo a usar (padrão: a atual)
+            store: Loja cujo preço vai em preco_loja_programada (padrão: default_store)
+            filters: Pré-filtros (ver search_products); só as linhas que passam
+                     neles são comparadas com os termos
+            
+        Yields:
+            DataFrame com os resultados encontrados até o momento
+        """
+        snapshot = snapshot or self._snapshot
+        store = store or self.default_store
+        if store not in snapshot.store_names:
+            raise ValueError(f"Loja desconhecida: {store} (disponíveis: {', '.join(snapshot.store_names)})")
+        # Máscara dos pré-filtros, calculada uma vez por busca (None = sem filtro)
+        candidates = snapshot.filters.mask(filters, store, self.normalize_text)
         all_results = []
         seen_codes = set()
+        first_term = None
         
         # Se tiver código original, adicionar ao set de códigos vistos
         if original_product_code:
@@ -123,18 +590,18 @@ class DataProcessor:
         for i, term in enumerate(search_terms):
             if not term:
                 continue
+            
+            if first_term is None:
+                first_term = term
+            
+            # Já temos resultados suficientes: apenas esgotar os termos
+            if len(all_results) >= max_results:
+                continue
                 
             term_normalized = self.normalize_text(term)
             
             # Busca exata primeiro
-            exact_matches = self.df_ativos[
-                self.df_ativos['nome_normalizado'].str.contains(
-                    term_normalized, 
-                    case=False, 
-                    na=False, 
-                    regex=False
-                )
-            ].copy()
+            exact_matches = snapshot.name_matches(term_normalized, candidates).copy()
             
             # Adicionar score e termo usado
             exact_matches['score'] = 100 - (i * 5)  # Penalizar termos mais genéricos
@@ -145,62 +612,89 @@ class DataProcessor:
             for _, row in exact_matches.iterrows():
                 if row['cod_produto'] not in seen_codes:
                     seen_codes.add(row['cod_produto'])
-                    all_results.append(row)
+                    all_results.append(row.to_dict())
             
-            # Se já temos resultados suficientes, parar
-            if len(all_results) >= max_results:
-                break
+            if partial:
+                yield self._results_frame(all_results, max_results, snapshot, store)
         
         # Se não encontrou resultados suficientes, fazer busca fuzzy
-        if len(all_results) < max_results and search_terms:
+        if len(all_results) < max_results and first_term is not None:
             fuzzy_results = self._fuzzy_search(
-                search_terms[0],  # Usar termo mais específico
+                first_term,  # Usar termo mais específico
                 seen_codes,
                 max_results - len(all_results),
-                min_similarity
+                min_similarity,
+                snapshot,
+                candidates
             )
             all_results.extend(fuzzy_results)
         
-        # Converter para DataFrame
-        if all_results:
-            df_results = pd.DataFrame(all_results)
-            
-            # Ordenar por score (maior primeiro)
-            df_results = df_results.sort_values('score', ascending=False)
-            
-            # Limitar resultados
-            df_results = df_results.head(max_results)
-            
-            # Selecionar apenas colunas relevantes
-            columns_to_show = [
-                'cod_produto', 
-                'nome', 
-                'preco_loja_programada',
-                'score',
-                'termo_usado',
-                'tipo_match'
-            ]
-            df_results = df_results[columns_to_show]
+        # Só filtros, sem termo: os resultados são as próprias linhas candidatas
+        if first_term is None and candidates is not None:
+            all_results.extend(self._filter_only_results(seen_codes, max_results, snapshot, candidates))
+        
+        yield self._results_frame(all_results, max_results, snapshot, store)
+    
+    def _filter_only_results(
+        self,
+        exclude_codes: set,
+        max_results: int,
+        snapshot: CatalogSnapshot,
+        candidates: np.ndarray
+    ) -> List:
+        """
+        Resultados de uma busca só com filtros (amostra fixa das linhas candidatas)
+        
+        Args:
+            exclude_codes: Códigos a não incluir (produto original)
+            max_results: Número máximo de resultados
+            snapshot: Snapshot da busca
+            candidates: Máscara dos pré-filtros
             
-            logging.info(f"Encontrados {len(df_results)} produtos para termos: {search_terms[:3]}")
-            return df_results
-        else:
-            logging.warning(f"Nenhum produto encontrado para: {search_terms}")
-            return pd.DataFrame(columns=[
-                'cod_produto', 
-                'nome', 
-                'preco_loja_programada',
-                'score',
-                'termo_usado',
-                'tipo_match'
-            ])
+        Returns:
+            Lista de resultados
+        """
+        df_sample = snapshot.sample(max_results + len(exclude_codes), candidates)
+        df_sample = df_sample[~df_sample['cod_produto'].isin(exclude_codes)].head(max_results).copy()
+        df_sample['score'] = 50
+        df_sample['termo_usado'] = ''
+        df_sample['tipo_match'] = 'filtro'
+        return df_sample.to_dict('records')
+    
+    def _results_frame(
+        self,
+        all_results: List,
+        max_results: int,
+        snapshot: CatalogSnapshot = None,
+        store: str = DEFAULT_STORE
+    ) -> pd.DataFrame:
+        """Converte os resultados acumulados em DataFrame ordenado por score"""
+        if not all_results:
+            return pd.DataFrame(columns=self.RESULT_COLUMNS)
+        
+        df_results = pd.DataFrame(all_results)
+        
+        # Ordenar por score (maior primeiro)
+        df_results = df_results.sort_values('score', ascending=False)
+        
+        # Limitar resultados e selecionar apenas colunas relevantes
+        df_results = df_results.head(max_results)[self.RESULT_COLUMNS]
+        
+        # Outra loja: só o preço muda, buscado pelo mesmo índice de códigos
+        if store != DEFAULT_STORE:
+            snapshot = snapshot or self._snapshot
+            positions = snapshot.codes.get_indexer(df_results['cod_produto'])
+            df_results['preco_loja_programada'] = snapshot.store_prices(store, positions)
+        return df_results
     
     def _fuzzy_search(
         self,
         term: str,
         exclude_codes: set,
         max_results: int,
-        min_similarity: int
+        min_similarity: int,
+        snapshot: CatalogSnapshot = None,
+        candidates: np.ndarray = None
     ) -> List:
         """
         Busca fuzzy (aproximada) quando busca exata não encontra resultados
@@ -210,6 +704,8 @@ class DataProcessor:
             exclude_codes: Códigos de produtos já encontrados
             max_results: Número máximo de resultados
             min_similarity: Similaridade mínima (0-100)
+            snapshot: Snapshot da busca (padrão: o atual)
+            candidates: Máscara dos pré-filtros (a amostra sai só dessas linhas)
             
         Returns:
             Lista de resultados encontrados
@@ -218,8 +714,9 @@ class DataProcessor:
         results = []
         
         # Amostrar subset para não processar tudo (performance)
-        sample_size = min(1000, len(self.df_ativos))
-        df_sample = self.df_ativos.sample(n=sample_size, random_state=42)
+        snapshot = snapshot or self._snapshot
+        sample_size = min(1000, len(snapshot))
+        df_sample = snapshot.sample(sample_size, candidates)
         
         for _, row in df_sample.iterrows():
             if row['cod_produto'] in exclude_codes:
@@ -240,20 +737,27 @@ class DataProcessor:
         
         return results[:max_results]
     
-    def get_product_by_code(self, cod_produto: str) -> Dict:
+    def get_product_by_code(self, cod_produto: str, snapshot: CatalogSnapshot = None, store: str = None) -> Dict:
         """
         Busca um produto específico pelo código
         
         Args:
             cod_produto: Código do produto
+            snapshot: Versão do catálogo a usar (padrão: a atual)
+            store: Loja cujo preço vai em preco_loja_programada (padrão: default_store)
             
         Returns:
             Dicionário com dados do produto ou None se não encontrado
         """
-        result = self.df_ativos[self.df_ativos['cod_produto'] == cod_produto]
+        snapshot = snapshot or self._snapshot
+        store = store or self.default_store
+        position = snapshot.codes.get_indexer([cod_produto])[0]
         
-        if len(result) > 0:
-            return result.iloc[0].to_dict()
+        if position >= 0:
+            product = snapshot.rows([position]).iloc[0].to_dict()
+            if store != DEFAULT_STORE:
+                product['preco_loja_programada'] = snapshot.store_prices(store, [position])[0]
+            return product
         
         return None
     
@@ -261,7 +765,8 @@ class DataProcessor:
         self,
         df: pd.DataFrame,
         reference_price: str,
-        margin_percent: float = 30.0
+        margin_percent: float = 30.0,
+        store: str = None
     ) -> pd.DataFrame:
         """
         Filtra produtos por faixa de preço
@@ -270,6 +775,8 @@ class DataProcessor:
             df: DataFrame com produtos
             reference_price: Preço de referência (formato "10,99")
             margin_percent: Margem percentual aceitável (padrão 30%)
+            store: Loja cujo preço é comparado (padrão: a coluna
+                   preco_loja_programada de df)
             
         Returns:
             DataFrame filtrado
@@ -291,18 +798,18 @@ class DataProcessor:
                 except:
                     return 0.0
             
-            df['preco_numerico'] = df['preco_loja_programada'].apply(parse_price)
-            
-            # Filtrar
-            df_filtered = df[
-                (df['preco_numerico'] >= min_price) & 
-                (df['preco_numerico'] <= max_price)
-            ].copy()
+            if store is None:
+                prices = df['preco_loja_programada']
+            else:
+                # Preço da loja pelo índice de códigos do catálogo
+                snapshot = self._snapshot
+                positions = snapshot.codes.get_indexer(df['cod_produto'])
+                prices = pd.Series(snapshot.store_prices(store, positions), index=df.index)
             
-            # Remover coluna temporária
-            df_filtered = df_filtered.drop(columns=['preco_numerico'])
+            numeric = prices.apply(parse_price)
             
-            return df_filtered
+            # Filtrar
+            return df[(numeric >= min_price) & (numeric <= max_price)].copy()
             
         except Exception as e:
             logging.error(f"Erro ao filtrar por preço: {e}")
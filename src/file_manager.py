@@ -5,12 +5,34 @@ Carrega Base_Fazer, salva seleções, gerencia backups
 
 import pandas as pd
 import os
-import shutil
+import json
+import time
 import logging
-from datetime import datetime
-from typing import Dict, List, Tuple
+import threading
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+try:
+    from .backup_store import BackupStore
+    from .sqlite_store import SQLiteStore, read_long
+    from .save_writer import SaveWriter, DURABILITY_MODES
+    from .leases import Lease, LeaseManager, load_output, reviewer_slug
+    from .output_export import normalize_long, wide_to_long, write_columnar, write_long_csv
+    from .worklist import WorklistIndex, clean_worklist_frame, iter_worklist_chunks
+    from .output_stats import STAT_DIMENSIONS, OutputStats, code_key, group_columns_from_chunks
+    from .output_validation import price_changes, store_catalog, validate_substitutes
+    from .substitute_index import SubstituteIndex
+except ImportError:
+    from backup_store import BackupStore
+    from sqlite_store import SQLiteStore, read_long
+    from save_writer import SaveWriter, DURABILITY_MODES
+    from leases import Lease, LeaseManager, load_output, reviewer_slug
+    from output_export import normalize_long, wide_to_long, write_columnar, write_long_csv
+    from worklist import WorklistIndex, clean_worklist_frame, iter_worklist_chunks
+    from output_stats import STAT_DIMENSIONS, OutputStats, code_key, group_columns_from_chunks
+    from output_validation import price_changes, store_catalog, validate_substitutes
+    from substitute_index import SubstituteIndex
+
 # Configurar logging - caminho relativo ao diretório raiz do projeto
 log_dir = Path(__file__).parent.parent / 'logs'
 log_dir.mkdir(exist_ok=True)
@@ -20,6 +42,15 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Com BASE_FAZER_LAZY=auto, Base_Fazer acima deste tamanho é carregada sob demanda
+LAZY_AUTO_BYTES = 20 * 1024 * 1024
+
+# Linhas por bloco ao percorrer Base_Fazer/saída no modo sob demanda
+CHUNK_ROWS = 50000
+
+# Subpasta (ao lado da saída) das exportações longa/colunar
+EXPORT_DIR = 'exports'
+
 
 class FileManager:
     """Gerencia operações com arquivos CSV"""
@@ -27,47 +58,212 @@ class FileManager:
     def __init__(
         self,
         base_fazer_path: str,
-        output_path: str = "data/substituicoes.csv",
-        backup_dir: str = "data/backups"
+        output_path: str = None,
+        backup_dir: str = "data/backups",
+        checkpoint_every: int = 50,
+        storage: str = None,
+        db_path: str = None,
+        durability: str = None,
+        debounce: float = None,
+        reviewer: str = None,
+        lazy: bool = None
     ):
         """
         Inicializa o gerenciador de arquivos
         
+        Com storage="csv", cada salvamento é gravado (com fsync) em um journal
+        append-only ao lado do arquivo de saída; o CSV completo só é regravado
+        a cada checkpoint_every salvamentos e em close().
+        Com storage="sqlite", Base_Fazer e substitutos ficam em um banco SQLite
+        indexado; o CSV de saída é exportado nos checkpoints e em close().
+        
+        A gravação em disco segue o modo de durabilidade:
+        - "sync" (padrão): save_substitutes retorna após o fsync (nada se perde em uma queda)
+        - "journal": retorna na hora; uma thread grava em milissegundos
+          (uma queda perde no máximo os salvamentos ainda na fila)
+        - "debounced": retorna na hora; salvamentos dentro de `debounce` segundos
+          são agrupados em uma gravação (uma queda perde no máximo essa janela)
+        Em todos os modos close() grava tudo o que estiver pendente.
+        
+        Com um revisor definido, cada instância grava o próprio arquivo
+        (substituicoes_<revisor>.csv) e só salva iterações de faixas que
+        reservou (LeaseManager); leases.merge_outputs junta os arquivos.
+        
+        No modo sob demanda (lazy), Base_Fazer não é carregada inteira: um
+        índice de offsets (WorklistIndex) materializa só a janela em torno da
+        iteração pedida, e df_output guarda apenas as iterações já salvas
+        (o CSV de saída continua com uma linha por iteração).
+        
         Args:
             base_fazer_path: Caminho para Base_Fazer.csv
-            output_path: Caminho para arquivo de saída
+            output_path: Caminho para arquivo de saída (padrão: data/substituicoes.csv,
+                         ou data/substituicoes_<revisor>.csv com revisor)
             backup_dir: Diretório para backups
+            checkpoint_every: Salvamentos entre checkpoints do CSV
+            storage: "csv" ou "sqlite" (padrão: variável STORAGE_BACKEND ou "csv")
+            db_path: Caminho do banco SQLite (padrão: SQLITE_PATH ou output_path com .db)
+            durability: "sync", "journal" ou "debounced" (padrão: SAVE_DURABILITY ou "sync")
+            debounce: Janela do modo debounced em segundos (padrão: SAVE_DEBOUNCE_MS ou 300 ms)
+            reviewer: Nome do revisor (padrão: variável REVIEWER; None = instância única)
+            lazy: Carregamento sob demanda (padrão: BASE_FAZER_LAZY; "auto" = só
+                  para arquivos acima de LAZY_AUTO_BYTES)
         """
+        self.reviewer = reviewer or os.getenv("REVIEWER") or None
+        self.leases = None
+        self._leases: Dict[int, Lease] = {}
+        # Protege _leases; separado de _lock para não segurar o estado durante o I/O das reservas
+        self._lease_lock = threading.Lock()
+        
+        if self.reviewer:
+            slug = reviewer_slug(self.reviewer)
+            if output_path is None:
+                output_path = f"data/substituicoes_{slug}.csv"
+            backup_dir = os.path.join(backup_dir, slug)
+            self.leases = LeaseManager(
+                os.path.join(os.path.dirname(output_path) or '.', 'leases'),
+                ttl=float(os.getenv("LEASE_TTL_MIN", "30")) * 60,
+                chunk_size=int(os.getenv("LEASE_CHUNK_SIZE", "50"))
+            )
+        elif output_path is None:
+            output_path = "data/substituicoes.csv"
+        
         self.base_fazer_path = base_fazer_path
         self.output_path = output_path
         self.backup_dir = backup_dir
+        self.journal_path = f"{output_path}.journal"
+        self.state_path = f"{output_path}.state.json"
+        self.checkpoint_every = max(1, checkpoint_every)
         
         self.df_base_fazer = None
         self.df_output = None
+        self.worklist = None
+        self.lazy = self._resolve_lazy(lazy)
+        self._journal = None
+        self._pending_saves = 0
+        
+        # _lock protege o estado em memória; _io_lock serializa as gravações em disco
+        self._lock = threading.RLock()
+        self._io_lock = threading.RLock()
+        self.writer = None
+        
+        # Salvamentos ainda não gravados no SQLite (leituras os enxergam na hora)
+        self._unflushed: Dict[int, List[Dict]] = {}
+        
+        # Contadores de progresso (atualizados a cada salvamento)
+        self._sub_counts: Dict[int, int] = {}
+        self._skipped = set()
+        self._partial = 0
+        self._total = 0
+        self._max_iteration = 0
+        
+        # Estatísticas com recortes (montadas na primeira consulta, depois incrementais)
+        self._stats = None
+        # Colunas de grupo da Base_Fazer (não mudam; lidas uma vez, fora do _lock)
+        self._base_groups = None
+        self._stats_build_lock = threading.Lock()
+        # Índice reverso código substituto -> (n_iteracao, rank), idem
+        self._sub_index = None
+        
+        self.backups = BackupStore(
+            backup_dir,
+            full_every=int(os.getenv("BACKUP_FULL_EVERY", "20")),
+            max_bytes=int(float(os.getenv("BACKUP_MAX_MB", "50")) * 1024 * 1024)
+        )
+        
+        storage = storage or os.getenv("STORAGE_BACKEND", "csv")
+        if storage not in ("csv", "sqlite"):
+            raise ValueError(f"Backend de armazenamento desconhecido: {storage}")
+        
+        durability = durability or os.getenv("SAVE_DURABILITY", "sync")
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Modo de durabilidade desconhecido: {durability}")
+        self.durability = durability
+        
+        self.store = None
+        if storage == "sqlite":
+            # "sync" promete que nada se perde após o retorno: fsync a cada transação
+            self.store = SQLiteStore(
+                db_path or os.getenv("SQLITE_PATH") or f"{os.path.splitext(output_path)[0]}.db",
+                synchronous="FULL" if durability == "sync" else "NORMAL"
+            )
+            self._open_sqlite()
+        else:
+            self.load_base_fazer()
+            self.load_or_create_output()
+        
+        self._init_progress()
         
-        os.makedirs(backup_dir, exist_ok=True)
+        if durability != "sync":
+            if debounce is None:
+                debounce = float(os.getenv("SAVE_DEBOUNCE_MS", "300")) / 1000
+            self.writer = SaveWriter(self._persist, mode=durability, debounce=debounce)
+    
+    def _resolve_lazy(self, lazy: Optional[bool]) -> bool:
+        """Decide se Base_Fazer é carregada sob demanda"""
+        if lazy is not None:
+            return bool(lazy)
         
-        self.load_base_fazer()
-        self.load_or_create_output()
+        setting = os.getenv("BASE_FAZER_LAZY", "auto").strip().lower()
+        if setting == "auto":
+            try:
+                return os.path.getsize(self.base_fazer_path) > LAZY_AUTO_BYTES
+            except OSError:
+                return False
+        return setting in ("1", "true", "sim", "yes")
+    
+    def _base_signature(self) -> str:
+        """Assinatura da Base_Fazer (tamanho + mtime) para detectar alterações"""
+        stat = os.stat(self.base_fazer_path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    
+    def _open_sqlite(self):
+        """Importa Base_Fazer e o CSV de saída existente no SQLite, se necessário"""
+        signature = self._base_signature()
+        if not self.store.has_base_fazer() or self.store.get_meta('base_fazer_signature') != signature:
+            if self.lazy:
+                # Importar em blocos, sem ter a Base_Fazer inteira em memória
+                self.store.import_base_fazer(
+                    iter_worklist_chunks(self.base_fazer_path, chunksize=CHUNK_ROWS), signature
+                )
+            else:
+                self.load_base_fazer()
+                self.store.import_base_fazer(self.df_base_fazer, signature)
+        
+        if self.store.get_meta('output_imported') is None:
+            # Primeira abertura: trazer o trabalho já feito no modo CSV (inclusive o journal)
+            if os.path.exists(self.output_path) or os.path.exists(self.journal_path):
+                if os.path.exists(self.output_path):
+                    self.df_output = self._read_output()
+                else:
+                    if self.df_base_fazer is None and self.worklist is None:
+                        self.load_base_fazer()
+                    self._create_new_output()
+                self._load_state()
+                self._replay_journal()
+                self.store.import_output(self.df_output, self._skipped)
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+            self.store.set_meta('output_imported', self.output_path)
+        
+        # Consultas passam a ser feitas no banco
+        self.df_base_fazer = None
+        self.df_output = None
+        self.worklist = None
     
     def load_base_fazer(self):
-        """Carrega o CSV Base_Fazer"""
+        """Carrega o CSV Base_Fazer (ou só o índice de offsets, no modo sob demanda)"""
         try:
-            # Tentar ler pulando a primeira linha (metadados)
-            self.df_base_fazer = pd.read_csv(self.base_fazer_path, skiprows=1)
-            
-            # Garantir que n_iteracao existe e está preenchido
-            if 'n_iteracao' not in self.df_base_fazer.columns:
-                raise ValueError("Coluna 'n_iteracao' não encontrada em Base_Fazer")
-            
-            # Converter n_iteracao para int
-            self.df_base_fazer['n_iteracao'] = pd.to_numeric(
-                self.df_base_fazer['n_iteracao'], 
-                errors='coerce'
-            ).fillna(0).astype(int)
+            if self.lazy:
+                self.worklist = WorklistIndex(
+                    self.base_fazer_path,
+                    window=int(os.getenv("BASE_FAZER_WINDOW", "200"))
+                )
+                logging.info(f"Base_Fazer indexada (sob demanda): {len(self.worklist)} itens")
+                return
             
-            # Remover linhas sem n_iteracao válido
-            self.df_base_fazer = self.df_base_fazer[self.df_base_fazer['n_iteracao'] > 0]
+            # Ler pulando a primeira linha (metadados); n_iteracao vira int e
+            # linhas sem n_iteracao válido são removidas
+            self.df_base_fazer = clean_worklist_frame(pd.read_csv(self.base_fazer_path, skiprows=1))
             
             logging.info(f"Base_Fazer carregado: {len(self.df_base_fazer)} itens")
             
@@ -76,30 +272,170 @@ class FileManager:
             raise
     
     def load_or_create_output(self):
-        """Carrega arquivo de saída ou cria um novo"""
+        """Carrega arquivo de saída ou cria um novo, e reaplica o journal"""
         if os.path.exists(self.output_path):
             try:
-                self.df_output = pd.read_csv(self.output_path)
+                self.df_output = self._read_output()
                 logging.info(f"Arquivo de saída carregado: {len(self.df_output)} linhas")
             except Exception as e:
                 logging.error(f"Erro ao carregar arquivo de saída: {e}")
                 self._create_new_output()
         else:
             self._create_new_output()
+        
+        self._load_state()
+        
+        # Restaurar salvamentos ainda não consolidados no CSV
+        if self._replay_journal() > 0:
+            self.checkpoint()
+    
+    def _read_output(self) -> pd.DataFrame:
+        """Lê o CSV de saída (no modo sob demanda, em blocos e só as linhas preenchidas)"""
+        if not self.lazy:
+            return self._normalize_output(pd.read_csv(self.output_path))
+        
+        chunks = [self._sparsify(chunk) for chunk in pd.read_csv(self.output_path, chunksize=CHUNK_ROWS)]
+        return self._normalize_output(pd.concat(chunks, ignore_index=True))
+    
+    @staticmethod
+    def _sparsify(df: pd.DataFrame) -> pd.DataFrame:
+        """Mantém só as linhas com pelo menos um substituto"""
+        cod_columns = [f'sub{i}_cod_produto' for i in range(1, 6)]
+        return df[df[cod_columns].notna().any(axis=1)]
+    
+    @staticmethod
+    def _normalize_output(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ajusta tipos do DataFrame de saída lido de CSV
+        
+        Colunas de substitutos totalmente vazias são lidas como float64 e não
+        aceitariam códigos/nomes; todas passam a object.
+        """
+        sub_columns = [c for c in df.columns if c.startswith('sub')]
+        df[sub_columns] = df[sub_columns].astype(object)
+        df['n_iteracao'] = pd.to_numeric(df['n_iteracao'], errors='coerce').fillna(0).astype(int)
+        return df
+    
+    def _replay_journal(self) -> int:
+        """
+        Reaplica no DataFrame os registros do journal
+        
+        Returns:
+            Quantidade de registros reaplicados
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+        
+        replayed = 0
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha incompleta (queda durante a escrita)
+                    logging.warning("Registro incompleto no journal ignorado")
+                    break
+                
+                row_index = self._row_index(record['n'], create=True)
+                if row_index is not None:
+                    self._apply_substitutes(row_index, record['subs'])
+                    # subs None = iteração devolvida à fila (nem salva nem pulada)
+                    if record['subs'] or record['subs'] is None:
+                        self._skipped.discard(record['n'])
+                    else:
+                        self._skipped.add(record['n'])
+                    replayed += 1
+        
+        if replayed:
+            logging.info(f"Journal reaplicado: {replayed} salvamentos")
+        return replayed
+    
+    def _load_state(self):
+        """Carrega o arquivo auxiliar de estado (iterações puladas)"""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self._skipped = set(json.load(f).get('skipped', []))
+        except Exception as e:
+            logging.error(f"Erro ao carregar estado: {e}")
+    
+    def _save_state(self, skipped: List[int]):
+        """Salva o arquivo auxiliar de estado (escrita atômica)"""
+        try:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'skipped': skipped}, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logging.error(f"Erro ao salvar estado: {e}")
+    
+    def _init_progress(self):
+        """Calcula os contadores de progresso uma única vez (vetorizado)"""
+        if self.store is not None:
+            self._sub_counts = self.store.sub_counts()
+            self._skipped = set(self.store.skipped_iterations())
+            self._total = self.store.total_items()
+            self._max_iteration = self.store.max_iteration()
+        else:
+            cod_columns = [f'sub{i}_cod_produto' for i in range(1, 6)]
+            counts = self.df_output[cod_columns].notna().sum(axis=1)
+            filled = counts > 0
+            self._sub_counts = dict(zip(
+                self.df_output.loc[filled, 'n_iteracao'].astype(int).tolist(),
+                counts[filled].astype(int).tolist()
+            ))
+            self._total = len(self.worklist) if self.lazy else len(self.df_base_fazer)
+            self._max_iteration = self._base_max_iteration()
+        
+        self._partial = sum(1 for count in self._sub_counts.values() if count < 5)
+        self._stats = None
+        self._sub_index = None
+    
+    def _track_save(self, n_iteracao: int, count: int, skipped: bool = True):
+        """Atualiza os contadores de progresso após um salvamento (O(1))"""
+        previous = self._sub_counts.pop(n_iteracao, 0)
+        if 0 < previous < 5:
+            self._partial -= 1
+        
+        if count > 0:
+            self._sub_counts[n_iteracao] = count
+            if count < 5:
+                self._partial += 1
+            self._skipped.discard(n_iteracao)
+        elif skipped:
+            self._skipped.add(n_iteracao)
+        else:
+            self._skipped.discard(n_iteracao)
+    
+    def _apply_aggregates(self, n_iteracao: int, subs: Optional[List[Dict]]):
+        """Atualiza as estatísticas e o índice reverso já montados (chamar com _lock)"""
+        codes = None if subs is None else [sub['cod_produto'] for sub in subs]
+        if self._stats is not None:
+            self._stats.apply(n_iteracao, codes)
+        if self._sub_index is not None:
+            self._sub_index.apply(n_iteracao, codes)
+    
+    def _base_max_iteration(self) -> int:
+        """Maior n_iteracao da Base_Fazer (modo CSV)"""
+        if self.lazy:
+            return self.worklist.max_iteration()
+        return int(self.df_base_fazer['n_iteracao'].max()) if len(self.df_base_fazer) else 0
     
     def _create_new_output(self):
         """Cria novo arquivo de saída vazio com estrutura correta"""
         # Criar DataFrame com todas as linhas de Base_Fazer
-        max_iteracao = self.df_base_fazer['n_iteracao'].max()
+        # (no modo sob demanda, vazio: as linhas são criadas ao salvar)
+        max_iteracao = 0 if self.lazy else self._base_max_iteration()
         
         # Inicializar com n_iteracao
-        data = {'n_iteracao': range(1, max_iteracao + 1)}
+        data = {'n_iteracao': pd.Series(range(1, max_iteracao + 1), dtype=int)}
         
         # Adicionar 5 colunas para cada substituto (cod, nome, preco)
         for i in range(1, 6):
-            data[f'sub{i}_cod_produto'] = [None] * max_iteracao
-            data[f'sub{i}_nome'] = [None] * max_iteracao
-            data[f'sub{i}_preco_loja_programada'] = [None] * max_iteracao
+            data[f'sub{i}_cod_produto'] = pd.Series([None] * max_iteracao, dtype=object)
+            data[f'sub{i}_nome'] = pd.Series([None] * max_iteracao, dtype=object)
+            data[f'sub{i}_preco_loja_programada'] = pd.Series([None] * max_iteracao, dtype=object)
         
         self.df_output = pd.DataFrame(data)
         
@@ -118,6 +454,12 @@ class FileManager:
         Returns:
             Dicionário com dados do item ou None
         """
+        if self.store is not None:
+            return self.store.get_item(n_iteracao)
+        
+        if self.lazy:
+            return self.worklist.get_item(n_iteracao)
+        
         result = self.df_base_fazer[self.df_base_fazer['n_iteracao'] == n_iteracao]
         
         if len(result) > 0:
@@ -125,6 +467,28 @@ class FileManager:
         
         return None
     
+    def get_pending_items(self) -> List[Dict]:
+        """
+        Retorna itens da Base_Fazer que ainda não têm substitutos salvos
+        
+        Returns:
+            Lista de dicionários (em ordem de n_iteracao)
+        """
+        if self.store is not None:
+            pending = self.store.get_pending_items()
+            with self._lock:
+                return [item for item in pending if not self._unflushed.get(item['n_iteracao'])]
+        
+        with self._lock:
+            done = self.df_output.loc[self.df_output['sub1_cod_produto'].notna(), 'n_iteracao'].to_numpy()
+        
+        if self.lazy:
+            chunks = [chunk[~chunk['n_iteracao'].isin(done)] for chunk in self.worklist.iter_chunks(CHUNK_ROWS)]
+            pending = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=self.worklist.columns)
+        else:
+            pending = self.df_base_fazer[~self.df_base_fazer['n_iteracao'].isin(done)]
+        return pending.sort_values('n_iteracao').to_dict('records')
+    
     def get_saved_substitutes(self, n_iteracao: int) -> List[Dict]:
         """
         Retorna substitutos já salvos para uma iteração
@@ -135,19 +499,38 @@ class FileManager:
         Returns:
             Lista de dicionários com substitutos salvos
         """
+        if self.store is not None:
+            with self._lock:
+                if n_iteracao in self._unflushed:
+                    return [
+                        {
+                            'cod_produto': sub['cod_produto'],
+                            'nome': sub['nome'] if pd.notna(sub['nome']) else '',
+                            'preco_loja_programada': sub['preco_loja_programada'] if pd.notna(sub['preco_loja_programada']) else ''
+                        }
+                        for sub in self._unflushed[n_iteracao] or []
+                    ]
+            return self.store.get_substitutes(n_iteracao)
+        
         if self.df_output is None or n_iteracao < 1:
             return []
         
-        # Buscar linha correspondente (n_iteracao -1 porque index começa em 0)
-        if n_iteracao > len(self.df_output):
+        if n_iteracao > self._max_iteration:
             return []
         
-        row = self.df_output[self.df_output['n_iteracao'] == n_iteracao]
-        
-        if len(row) == 0:
-            return []
+        with self._lock:
+            row = self.df_output[self.df_output['n_iteracao'] == n_iteracao]
+            
+            if len(row) == 0:
+                return []
+            
+            row = row.iloc[0].copy()
         
-        row = row.iloc[0]
+        return self._row_substitutes(row)
+    
+    @staticmethod
+    def _row_substitutes(row: pd.Series) -> List[Dict]:
+        """Extrai os substitutos (até 5) de uma linha do layout largo"""
         substitutes = []
         
         # Extrair até 5 substitutos
@@ -169,26 +552,197 @@ class FileManager:
         """
         Salva substitutos selecionados para uma iteração
         
+        O estado em memória (e os contadores) é atualizado na hora; a gravação
+        em disco segue o modo de durabilidade (ver __init__). No modo CSV a
+        alteração vai para o journal com fsync; o CSV é regravado apenas nos
+        checkpoints.
+        
         Args:
             n_iteracao: Número da iteração
             substitutes: Lista com até 5 substitutos (dicts com cod_produto, nome, preco)
         """
-        if n_iteracao < 1 or n_iteracao > len(self.df_output):
+        n_iteracao = int(n_iteracao)
+        
+        subs = [
+            {
+                'cod_produto': sub.get('cod_produto', ''),
+                'nome': sub.get('nome', ''),
+                'preco_loja_programada': sub.get('preco_loja_programada', '')
+            }
+            for sub in substitutes[:5]
+        ]
+        
+        if n_iteracao < 1 or n_iteracao > self._max_iteration:
             logging.error(f"Iteração inválida: {n_iteracao}")
             return
         
-        # Criar backup antes de salvar
-        self.create_backup()
+        # Com vários revisores: reserva a faixa (LeaseError se for de outro
+        # revisor); o I/O da reserva fica fora de _lock
+        self._ensure_lease(n_iteracao)
         
-        # Encontrar índice da linha (n_iteracao é 1-indexed, mas pode não corresponder ao index)
-        row_index = self.df_output[self.df_output['n_iteracao'] == n_iteracao].index
+        with self._lock:
+            if self.store is not None:
+                self._unflushed[n_iteracao] = subs
+            else:
+                row_index = self._row_index(n_iteracao, create=True)
+                
+                if row_index is None:
+                    logging.error(f"Linha não encontrada para iteração {n_iteracao}")
+                    return
+                
+                self._apply_substitutes(row_index, subs)
+            
+            self._track_save(n_iteracao, len(subs))
+            self._apply_aggregates(n_iteracao, subs)
+        
+        if self.writer is not None:
+            self.writer.submit(n_iteracao, subs)
+        else:
+            self._persist([(n_iteracao, subs)])
+        
+        logging.info(f"Salvos {len(substitutes)} substitutos para iteração {n_iteracao}")
+    
+    def _persist(self, batch: List[Tuple[int, List[Dict]]]):
+        """
+        Grava em disco um lote de salvamentos (na thread de gravação ou, no modo sync, na hora)
+        
+        Args:
+            batch: Lista de (n_iteracao, substitutos), no máximo um por iteração
+        """
+        with self._io_lock:
+            if self.store is not None:
+                self.store.save_many(batch)
+                with self._lock:
+                    for n_iteracao, subs in batch:
+                        # Só descartar se não houve salvamento mais novo enquanto gravava
+                        if self._unflushed.get(n_iteracao) is subs:
+                            del self._unflushed[n_iteracao]
+            else:
+                # Gravar só as alterações no journal, com um único fsync por lote
+                now = time.time()
+                self._append_journal([{'n': n, 'subs': subs, 'ts': now} for n, subs in batch])
+            
+            self._pending_saves += len(batch)
+            if self._pending_saves >= self.checkpoint_every:
+                self.checkpoint()
+    
+    def acquire_lease(self, n_iteracao: int = None) -> Optional[Lease]:
+        """
+        Reserva uma faixa de iterações para o revisor
+        
+        Args:
+            n_iteracao: Iteração desejada (None = próxima faixa livre com itens
+                        pendentes, priorizando os itens em que o revisor é o Responsável)
+        
+        Returns:
+            Reserva obtida (None sem revisor ou sem faixa livre)
+        
+        Raises:
+            LeaseError: se a faixa pedida está reservada por outro revisor
+        """
+        if self.leases is None:
+            return None
+        
+        if n_iteracao is None:
+            pending = self.get_pending_items()
+            mine = [i['n_iteracao'] for i in pending
+                    if reviewer_slug(i.get('Responsável', '')) == reviewer_slug(self.reviewer)]
+            lease = self.leases.acquire_next(self.reviewer, mine + [i['n_iteracao'] for i in pending])
+        else:
+            lease = self.leases.acquire(self.reviewer, n_iteracao)
         
-        if len(row_index) == 0:
-            logging.error(f"Linha não encontrada para iteração {n_iteracao}")
+        if lease is not None:
+            with self._lease_lock:
+                self._leases[lease.start] = lease
+        return lease
+    
+    def _ensure_lease(self, n_iteracao: int):
+        """
+        Garante (e renova, se perto de expirar) a reserva da faixa da iteração
+        
+        Uma faixa livre é reservada no primeiro salvamento nela.
+        
+        Raises:
+            LeaseError: se a faixa está reservada por outro revisor
+        """
+        if self.leases is None:
             return
         
-        row_index = row_index[0]
+        start, _ = self.leases.chunk_of(n_iteracao)
+        with self._lease_lock:
+            lease = self._leases.get(start)
+            if lease is None or lease.expires_at - time.time() < self.leases.ttl * 0.75:
+                self._leases[start] = self.leases.acquire(self.reviewer, n_iteracao)
+    
+    def reserved_by_other(self, n_iteracao: int) -> Optional[str]:
+        """
+        Revisor que reservou a faixa da iteração, se não for este (só lê, não reserva)
+        
+        Args:
+            n_iteracao: Número da iteração
+        
+        Returns:
+            Nome do outro revisor ou None (faixa livre, própria ou sem revisores)
+        """
+        if self.leases is None:
+            return None
+        holder = self.leases.holder(n_iteracao)
+        return holder if holder is not None and holder != self.reviewer else None
+    
+    def release_leases(self, keep: int = None):
+        """
+        Libera as reservas deste revisor
+        
+        Args:
+            keep: Iteração cuja faixa continua reservada (None = liberar todas)
+        """
+        if self.leases is None:
+            return
+        with self._lease_lock:
+            for start, lease in list(self._leases.items()):
+                if keep is not None and lease.covers(keep):
+                    continue
+                self.leases.release(lease)
+                del self._leases[start]
+    
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Aguarda a gravação dos salvamentos enfileirados
+        
+        Args:
+            timeout: Tempo máximo em segundos (None = sem limite)
+        
+        Returns:
+            True se tudo foi gravado
+        """
+        if self.writer is None:
+            return True
+        return self.writer.flush(timeout)
+    
+    def _row_index(self, n_iteracao: int, create: bool = False):
+        """
+        Retorna o índice da linha de saída de uma iteração (ou None)
+        
+        Args:
+            n_iteracao: Número da iteração
+            create: No modo sob demanda, acrescenta a linha se ainda não existir
+        """
+        row_index = self.df_output[self.df_output['n_iteracao'] == n_iteracao].index
+        if len(row_index) > 0:
+            return row_index[0]
+        if not (create and self.lazy):
+            return None
         
+        row_index = int(self.df_output.index.max()) + 1 if len(self.df_output) else 0
+        row = pd.DataFrame({
+            column: pd.Series([None], index=[row_index], dtype=object) for column in self.df_output.columns
+        })
+        row['n_iteracao'] = int(n_iteracao)
+        self.df_output = pd.concat([self.df_output, row])
+        return row_index
+    
+    def _apply_substitutes(self, row_index, substitutes: List[Dict]):
+        """Grava os substitutos de uma linha no DataFrame de saída"""
         # Limpar substitutos existentes
         for i in range(1, 6):
             self.df_output.at[row_index, f'sub{i}_cod_produto'] = None
@@ -196,96 +750,687 @@ class FileManager:
             self.df_output.at[row_index, f'sub{i}_preco_loja_programada'] = None
         
         # Salvar novos substitutos (até 5)
-        for i, sub in enumerate(substitutes[:5], start=1):
+        for i, sub in enumerate((substitutes or [])[:5], start=1):
             self.df_output.at[row_index, f'sub{i}_cod_produto'] = sub.get('cod_produto', '')
             self.df_output.at[row_index, f'sub{i}_nome'] = sub.get('nome', '')
             self.df_output.at[row_index, f'sub{i}_preco_loja_programada'] = sub.get('preco_loja_programada', '')
+    
+    def _append_journal(self, records: List[Dict]):
+        """Acrescenta registros ao journal e força a gravação em disco"""
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
         
-        # Salvar arquivo
-        self.save_output()
+        self._journal.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+    
+    def checkpoint(self):
+        """Consolida o estado atual no CSV (atomicamente), registra um backup e zera o journal"""
+        with self._io_lock:
+            if self.store is not None:
+                if self.export_csv():
+                    self.create_backup(None, self.store.skipped_iterations())
+                    self._pending_saves = 0
+                return
+            
+            # Cópia rápida sob o lock; a escrita do CSV não bloqueia a interface.
+            # A cópia pode conter salvamentos ainda na fila: eles irão para o
+            # journal depois e serão reaplicados sem efeito colateral.
+            with self._lock:
+                snapshot = self.df_output.copy()
+                skipped = sorted(self._skipped)
+            
+            if not self.save_output(snapshot):
+                # Journal continua válido: nada se perde
+                return
+            self._save_state(skipped)
+            
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            
+            segment = ''
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    segment = f.read()
+            
+            self.create_backup(segment, skipped)
+            
+            with open(self.journal_path, 'w', encoding='utf-8') as f:
+                os.fsync(f.fileno())
+            
+            self._pending_saves = 0
+            logging.info("Checkpoint do arquivo de saída concluído")
+    
+    def close(self):
+        """Grava salvamentos enfileirados, consolida e fecha o journal (ou o banco)"""
+        if self.writer is not None:
+            if not self.writer.close():
+                logging.error("Nem todos os salvamentos puderam ser gravados no encerramento")
+            self.writer = None
         
-        logging.info(f"Salvos {len(substitutes)} substitutos para iteração {n_iteracao}")
+        with self._io_lock:
+            if self._pending_saves > 0:
+                self.checkpoint()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self.store is not None:
+                self.store.close()
+        
+        self.release_leases()
+    
+    def export_csv(self) -> bool:
+        """
+        Exporta o banco SQLite para o arquivo de saída (mesmo layout do modo CSV)
+        
+        Returns:
+            True se o arquivo foi salvo
+        """
+        with self._io_lock:
+            return self.save_output(self.store.export_output())
     
-    def save_output(self):
-        """Salva o arquivo de saída"""
+    def get_long_output(self) -> pd.DataFrame:
+        """
+        Retorna os substitutos salvos no formato longo
+        
+        Returns:
+            DataFrame com n_iteracao, rank, cod_produto, price_cents (Int64)
+        """
+        self.flush()
+        
+        if self.store is not None:
+            return normalize_long(self.store.export_long())
+        
+        with self._lock:
+            snapshot = self.df_output.copy()
+        return wide_to_long(snapshot)
+    
+    def export_long(self, path: str = None) -> str:
+        """
+        Exporta (n_iteracao, rank, cod_produto, price_cents) em CSV
+        
+        Args:
+            path: Arquivo de destino (padrão: exports/<saída>_long.csv, ao lado da saída)
+        
+        Returns:
+            Caminho gravado
+        """
+        path = path or f"{self._export_base()}_long.csv"
+        return write_long_csv(self.get_long_output(), path)
+    
+    def export_columnar(self, path: str = None) -> str:
+        """
+        Exporta o formato longo em arquivo colunar tipado (Parquet ou .npz)
+        
+        Args:
+            path: Arquivo de destino, sem extensão (padrão: exports/<saída>, ao lado da saída)
+        
+        Returns:
+            Caminho gravado
+        """
+        return write_columnar(self.get_long_output(), path or self._export_base())
+    
+    def _export_base(self) -> str:
+        """
+        Caminho base das exportações: subpasta exports/, para que os arquivos
+        não sejam confundidos com saídas de revisor (substituicoes_<revisor>.csv)
+        """
+        directory, name = os.path.split(self.output_path)
+        return os.path.join(directory, EXPORT_DIR, os.path.splitext(name)[0])
+    
+    def get_base_columns(self, columns: List[str]) -> pd.DataFrame:
+        """
+        Retorna n_iteracao e algumas colunas da Base_Fazer (as que existirem)
+        
+        Args:
+            columns: Nomes das colunas
+        
+        Returns:
+            DataFrame com n_iteracao e as colunas pedidas
+        """
+        if self.store is not None:
+            return self.store.get_base_columns(columns)
+        
+        wanted = ['n_iteracao'] + [c for c in columns if c != 'n_iteracao']
+        if self.lazy:
+            chunks = list(self.worklist.iter_chunks(CHUNK_ROWS, usecols=lambda c: c in wanted))
+            return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['n_iteracao'])
+        return self.df_base_fazer[[c for c in wanted if c in self.df_base_fazer.columns]]
+    
+    def refresh_prices(self, catalog, store: str = None) -> pd.DataFrame:
+        """
+        Atualiza em lote o preço dos substitutos salvos com o preço atual do catálogo
+        
+        Uma única passada vetorizada (join pelo cod_produto); só as iterações
+        alteradas vão para o journal (ou para o banco). Substitutos fora do
+        catálogo mantêm o preço salvo.
+        
+        Args:
+            catalog: Itens_Ativos atual (DataFrame ou DataProcessor.snapshot)
+            store: Loja dos preços (padrão: PRICE_STORE, a mesma das buscas)
+        
+        Returns:
+            Linhas alteradas: n_iteracao, rank, cod_produto, preco_antigo, preco_novo
+        """
+        columns = ['n_iteracao', 'rank', 'cod_produto', 'preco_antigo', 'preco_novo']
+        catalog = store_catalog(catalog, store)
+        
+        if self.store is not None:
+            self.flush()
+            long_df = self.store.export_long()
+            changes = price_changes(long_df, catalog)[columns]
+            if len(changes):
+                self.store.update_prices(list(zip(changes['n_iteracao'], changes['rank'], changes['preco_novo'])))
+                with self._io_lock:
+                    self._pending_saves += int(changes['n_iteracao'].nunique())
+                    if self._pending_saves >= self.checkpoint_every:
+                        self.checkpoint()
+        else:
+            with self._lock:
+                frames = []
+                for rank in range(1, 6):
+                    codes = self.df_output[f'sub{rank}_cod_produto']
+                    filled = codes.notna()
+                    frames.append(pd.DataFrame({
+                        'row': self.df_output.index[filled],
+                        'n_iteracao': self.df_output.loc[filled, 'n_iteracao'].to_numpy(),
+                        'rank': rank,
+                        'cod_produto': codes[filled].to_numpy(),
+                        'preco': self.df_output.loc[filled, f'sub{rank}_preco_loja_programada'].to_numpy(),
+                    }))
+                changes = price_changes(pd.concat(frames, ignore_index=True), catalog)
+                
+                # Atualizar o DataFrame uma coluna (rank) por vez
+                for rank, group in changes.groupby('rank'):
+                    self.df_output.loc[group['row'], f'sub{rank}_preco_loja_programada'] = group['preco_novo'].to_numpy()
+                
+                rows = changes.drop_duplicates('row')
+                batch = [
+                    (int(n_iteracao), self._row_substitutes(self.df_output.loc[row]))
+                    for n_iteracao, row in zip(rows['n_iteracao'], rows['row'])
+                ]
+                changes = changes[columns]
+            
+            if batch:
+                if self.writer is not None:
+                    for n_iteracao, subs in batch:
+                        self.writer.submit(n_iteracao, subs)
+                else:
+                    self._persist(batch)
+        
+        changes = changes.sort_values(['n_iteracao', 'rank']).reset_index(drop=True)
+        logging.info(
+            f"Preços atualizados: {len(changes)} substitutos em {changes['n_iteracao'].nunique()} iterações"
+        )
+        return changes
+    
+    def validate_against_catalog(self, catalog, price_tolerance_cents: int = 0, store: str = None) -> Dict:
+        """
+        Valida os substitutos salvos contra o catálogo atual
+        
+        Verifica substitutos fora do catálogo, preços desatualizados, repetidos
+        na mesma iteração e iguais ao produto original (ver output_validation).
+        
+        Args:
+            catalog: Itens_Ativos (DataFrame com cod_produto e preco_<loja>, ou
+                     DataProcessor.snapshot)
+            price_tolerance_cents: Diferença de preço tolerada
+            store: Loja dos preços (padrão: PRICE_STORE, a mesma das buscas)
+        
+        Returns:
+            Relatório com resumo e lista de problemas
+        """
+        return validate_substitutes(
+            self.get_long_output(),
+            self.get_base_columns(['cod_produto']),
+            store_catalog(catalog, store),
+            price_tolerance_cents
+        )
+    
+    def save_output(self, df: pd.DataFrame = None) -> bool:
+        """
+        Salva o arquivo de saída (arquivo temporário + rename atômico)
+        
+        Args:
+            df: DataFrame a salvar (padrão: df_output)
+        
+        Returns:
+            True se o arquivo foi salvo
+        """
+        if df is None:
+            df = self.df_output
+        
         try:
-            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
-            self.df_output.to_csv(self.output_path, index=False)
+            os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+            tmp_path = f"{self.output_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                if self.lazy and self.store is None:
+                    self._write_dense(f, df)
+                else:
+                    df.to_csv(f, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.output_path)
             logging.info(f"Arquivo de saída salvo: {self.output_path}")
+            return True
         except Exception as e:
             logging.error(f"Erro ao salvar arquivo de saída: {e}")
+            return False
+    
+    def _write_dense(self, f, df: pd.DataFrame):
+        """
+        Grava a saída esparsa no layout completo (uma linha por iteração), em blocos
+        
+        Args:
+            f: Arquivo de destino aberto
+            df: Linhas preenchidas
+        """
+        sparse = df.drop_duplicates('n_iteracao', keep='last').set_index('n_iteracao')
+        max_iteracao = self._base_max_iteration()
+        
+        if max_iteracao == 0:
+            df.head(0).to_csv(f, index=False)
+            return
+        
+        for start in range(1, max_iteracao + 1, CHUNK_ROWS):
+            block = sparse.reindex(pd.RangeIndex(start, min(start + CHUNK_ROWS, max_iteracao + 1), name='n_iteracao'))
+            block.reset_index().to_csv(f, index=False, header=(start == 1))
     
-    def create_backup(self):
-        """Cria backup do arquivo de saída"""
+    def create_backup(self, journal_segment: str = '', skipped: List[int] = None):
+        """
+        Registra um ponto de restauração do arquivo de saída
+        
+        Args:
+            journal_segment: Registros do journal consolidados no último checkpoint
+                             (viram um delta comprimido; periodicamente, ou com
+                             None, é feito um snapshot completo)
+            skipped: Iterações puladas no estado gravado (padrão: as atuais)
+        """
         if not os.path.exists(self.output_path):
             return
         
+        if skipped is None:
+            with self._lock:
+                skipped = sorted(self._skipped)
+        self.backups.add(self.output_path, journal_segment, skipped)
+    
+    def list_backups(self) -> List[Dict]:
+        """Retorna os pontos de restauração disponíveis (mais antigo primeiro)"""
+        return self.backups.list_backups()
+    
+    def restore_backup(self, backup_id: int = None) -> bool:
+        """
+        Restaura o arquivo de saída a partir de um backup
+        
+        Args:
+            backup_id: Id do backup no manifest (None = mais recente)
+        
+        Returns:
+            True se restaurado
+        """
+        # Gravar o que estiver na fila antes de sobrescrever
+        self.flush()
+        
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"substituicoes_backup_{timestamp}.csv"
-            backup_path = os.path.join(self.backup_dir, backup_name)
+            df, records, skipped = self.backups.restore(backup_id)
+        except Exception as e:
+            logging.error(f"Erro ao restaurar backup {backup_id}: {e}")
+            return False
+        
+        with self._io_lock, self._lock:
+            # Agregados montados sobre o estado anterior deixam de valer
+            self._stats = None
+            self._sub_index = None
+            self._unflushed.clear()
             
-            shutil.copy2(self.output_path, backup_path)
+            self.df_output = self._normalize_output(df)
+            if self.lazy:
+                self.df_output = self._sparsify(self.df_output).reset_index(drop=True)
             
-            # Manter apenas últimos 10 backups
-            self._cleanup_old_backups(max_backups=10)
+            if skipped is None:
+                # Backup antigo, sem as puladas: manter só as que continuam vazias
+                filled = set(self.df_output.loc[self.df_output['sub1_cod_produto'].notna(), 'n_iteracao'].astype(int))
+                skipped = [n for n in self._skipped if n not in filled]
+            self._skipped = set(skipped)
             
-            logging.info(f"Backup criado: {backup_path}")
+            for record in records:
+                row_index = self._row_index(record['n'], create=True)
+                if row_index is not None:
+                    self._apply_substitutes(row_index, record['subs'])
+                    # Mesma regra do journal: [] = pulada, None = de volta à fila
+                    if record['subs'] or record['subs'] is None:
+                        self._skipped.discard(record['n'])
+                    else:
+                        self._skipped.add(record['n'])
+        
+            if self.store is not None:
+                self.store.import_output(self.df_output, self._skipped)
+                self._pending_saves = 0
+                self._init_progress()
+                self.df_output = None
+                # No modo sob demanda o DataFrame restaurado é esparso: o CSV
+                # sai do banco, no layout completo (como em export_csv)
+                logging.info(f"Backup restaurado: {backup_id or 'mais recente'}")
+                return self.save_output(self.store.export_output())
+        
+            # Descartar salvamentos posteriores ao ponto restaurado
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._pending_saves = 0
+            self._init_progress()
+            self._save_state(sorted(self._skipped))
+        
+            logging.info(f"Backup restaurado: {backup_id or 'mais recente'}")
+            return self.save_output()
+    
+    def get_total_items(self) -> int:
+        """Retorna total de itens na Base_Fazer"""
+        return self._total
+    
+    def get_max_iteration(self) -> int:
+        """Retorna o maior n_iteracao da Base_Fazer"""
+        return self._max_iteration
+    
+    def get_completed_count(self) -> int:
+        """Retorna quantidade de iterações já preenchidas (pelo menos 1 substituto)"""
+        return len(self._sub_counts)
+    
+    def get_partial_count(self) -> int:
+        """Retorna quantidade de iterações com 1 a 4 substitutos"""
+        return self._partial
+    
+    def get_skipped_count(self) -> int:
+        """Retorna quantidade de iterações puladas (salvas sem substitutos)"""
+        return len(self._skipped)
+    
+    def get_progress_counts(self) -> Dict[str, int]:
+        """
+        Retorna todos os contadores de progresso
+        
+        Returns:
+            Dicionário com total, completed, partial, skipped e pending
+        """
+        completed = len(self._sub_counts)
+        return {
+            'total': self._total,
+            'completed': completed,
+            'partial': self._partial,
+            'skipped': len(self._skipped),
+            'pending': self._total - completed - len(self._skipped)
+        }
+    
+    def get_sub_count_distribution(self) -> Dict[int, int]:
+        """
+        Retorna quantas iterações têm 0, 1, ..., 5 substitutos
+        
+        Returns:
+            Dicionário {quantidade de subs: quantidade de iterações}
+        """
+        distribution = {i: 0 for i in range(6)}
+        for count in self._sub_counts.values():
+            distribution[count] += 1
+        distribution[0] = self._total - len(self._sub_counts)
+        return distribution
+    
+    def _get_stats(self) -> OutputStats:
+        """
+        Monta (uma vez, vetorizado) as estatísticas com recortes
+        
+        A leitura em blocos da Base_Fazer acontece fora do _lock, para não
+        travar salvamentos durante a varredura; só a carga da saída é feita
+        sob o lock. Chame de uma thread de trabalho (ver warm_stats).
+        """
+        with self._lock:
+            if self._stats is not None:
+                return self._stats
+        
+        with self._stats_build_lock:
+            if self._base_groups is None:
+                if self.lazy and self.store is None:
+                    # Em blocos, já como categorias (memória proporcional aos grupos)
+                    wanted = ['n_iteracao', *STAT_DIMENSIONS]
+                    self._base_groups = group_columns_from_chunks(
+                        self.worklist.iter_chunks(CHUNK_ROWS, usecols=lambda c: c in wanted)
+                    )
+                else:
+                    with self._lock:
+                        self._base_groups = self.get_base_columns(list(STAT_DIMENSIONS))
             
-        except Exception as e:
-            logging.error(f"Erro ao criar backup: {e}")
+            with self._lock:
+                if self._stats is None:
+                    self._stats = self._load_stats(self._base_groups)
+                return self._stats
     
-    def _cleanup_old_backups(self, max_backups: int = 10):
-        """Remove backups antigos, mantendo apenas os mais recentes"""
-        try:
-            backups = [
-                f for f in os.listdir(self.backup_dir) 
-                if f.startswith('substituicoes_backup_') and f.endswith('.csv')
-            ]
+    def warm_stats(self) -> threading.Thread:
+        """
+        Monta as estatísticas em segundo plano (ex.: na abertura da interface)
+        
+        Returns:
+            Thread iniciada
+        """
+        def build():
+            try:
+                self._get_stats()
+            except Exception as e:
+                logging.error(f"Erro ao montar estatísticas: {e}")
+        
+        thread = threading.Thread(target=build, daemon=True)
+        thread.start()
+        return thread
+    
+    def _load_stats(self, base_groups: pd.DataFrame) -> OutputStats:
+        """Carrega a saída atual sobre os grupos da Base_Fazer (chamado sob o _lock)"""
+        if self.store is not None:
+            saved = self.store.export_long()
+        else:
+            saved = wide_to_long(self.df_output)
+        
+        stats = OutputStats(base_groups)
+        stats.load(saved, self._skipped)
+        # Salvamentos ainda não gravados no SQLite
+        for n_iteracao, subs in self._unflushed.items():
+            stats.apply(n_iteracao, None if subs is None else [sub['cod_produto'] for sub in subs])
+        
+        return stats
+    
+    def get_stats_summary(self) -> Dict[str, int]:
+        """
+        Retorna totais gerais (vazias, parciais, completas, puladas, códigos repetidos)
+        
+        Returns:
+            Dicionário de OutputStats.summary
+        """
+        stats = self._get_stats()
+        with self._lock:
+            return stats.summary()
+    
+    def get_stats_breakdown(self, dimension: str) -> pd.DataFrame:
+        """
+        Retorna o progresso por grupo de uma dimensão da Base_Fazer
+        
+        Args:
+            dimension: 'Responsável', 'Comprador' ou 'Subcategoria'
+        
+        Returns:
+            DataFrame com total, completed, partial, full, skipped, pending e percent
+        """
+        stats = self._get_stats()
+        with self._lock:
+            return stats.breakdown(dimension)
+    
+    def get_group_progress(self, dimension: str, value) -> Dict[str, int]:
+        """Retorna o progresso de um único grupo (ex.: Responsável do item atual)"""
+        stats = self._get_stats()
+        with self._lock:
+            return stats.group_progress(dimension, value)
+    
+    def get_duplicate_codes(self, min_count: int = 2) -> Dict[str, int]:
+        """
+        Retorna os códigos usados como substituto em mais de uma posição
+        
+        Returns:
+            Dicionário {código: usos}, do mais usado para o menos usado
+        """
+        stats = self._get_stats()
+        with self._lock:
+            return stats.duplicate_codes(min_count)
+    
+    def _get_sub_index(self) -> SubstituteIndex:
+        """Monta (uma vez) o índice reverso dos substitutos salvos"""
+        with self._lock:
+            if self._sub_index is not None:
+                return self._sub_index
             
-            if len(backups) <= max_backups:
-                return
+            if self.store is not None:
+                saved = self.store.export_long()
+            else:
+                saved = wide_to_long(self.df_output)
             
-            # Ordenar por data de modificação
-            backups.sort(
-                key=lambda x: os.path.getmtime(os.path.join(self.backup_dir, x)),
-                reverse=True
-            )
+            index = SubstituteIndex()
+            index.load(saved)
+            # Salvamentos ainda não gravados no SQLite
+            for n_iteracao, subs in self._unflushed.items():
+                index.apply(n_iteracao, None if subs is None else [sub['cod_produto'] for sub in subs])
             
-            # Remover backups mais antigos
-            for backup in backups[max_backups:]:
-                os.remove(os.path.join(self.backup_dir, backup))
-                logging.info(f"Backup antigo removido: {backup}")
-                
-        except Exception as e:
-            logging.error(f"Erro ao limpar backups antigos: {e}")
+            self._sub_index = index
+            logging.info(f"Índice reverso montado: {len(index)} códigos substitutos")
+            return index
     
-    def get_total_items(self) -> int:
-        """Retorna total de itens na Base_Fazer"""
-        return len(self.df_base_fazer) if self.df_base_fazer is not None else 0
+    def get_iterations_using(self, cod_produto) -> List[Tuple[int, int]]:
+        """
+        Retorna onde um código está salvo como substituto
+        
+        Args:
+            cod_produto: Código do produto substituto
+        
+        Returns:
+            Lista de (n_iteracao, rank), em ordem
+        """
+        index = self._get_sub_index()
+        with self._lock:
+            return index.positions(cod_produto)
     
-    def get_completed_count(self) -> int:
-        """Retorna quantidade de iterações já preenchidas"""
-        if self.df_output is None:
-            return 0
+    def get_impact(self, codes: List) -> pd.DataFrame:
+        """
+        Retorna as posições afetadas por códigos que saíram do catálogo (ou sem estoque)
         
-        # Contar linhas que têm pelo menos 1 substituto
-        count = 0
-        for _, row in self.df_output.iterrows():
-            if pd.notna(row.get('sub1_cod_produto')):
-                count += 1
+        Args:
+            codes: Códigos de produto
         
-        return count
+        Returns:
+            DataFrame com n_iteracao, rank e cod_produto
+        """
+        index = self._get_sub_index()
+        with self._lock:
+            return index.impact(codes)
+    
+    def requeue_affected(self, codes: List, keep_others: bool = False) -> pd.DataFrame:
+        """
+        Devolve à fila de pendentes, em lote, as iterações que usam os códigos
+        
+        Args:
+            codes: Códigos que não podem mais ser substitutos
+            keep_others: True = só remove os códigos e mantém os demais
+                         substitutos (a iteração só volta a pendente se
+                         ficar vazia); False = limpa as iterações afetadas
+        
+        Returns:
+            Posições afetadas (ver get_impact), antes da alteração
+        """
+        index = self._get_sub_index()
+        batch = []
+        
+        with self._lock:
+            impact = index.impact(codes)
+            removed = set(impact['cod_produto'])
+            
+            for n_iteracao in impact['n_iteracao'].unique().tolist():
+                subs = None
+                if keep_others:
+                    current = self.get_saved_substitutes(n_iteracao)
+                    subs = [sub for sub in current if code_key(sub['cod_produto']) not in removed] or None
+                
+                if self.store is not None:
+                    self._unflushed[n_iteracao] = subs
+                else:
+                    row_index = self._row_index(n_iteracao)
+                    if row_index is None:
+                        continue
+                    self._apply_substitutes(row_index, subs)
+                
+                # Lista vazia significaria "pulada"; None devolve a iteração à fila
+                self._track_save(n_iteracao, len(subs or []), skipped=False)
+                self._apply_aggregates(n_iteracao, subs)
+                batch.append((n_iteracao, subs))
+        
+        if batch:
+            if self.writer is not None:
+                for n_iteracao, subs in batch:
+                    self.writer.submit(n_iteracao, subs)
+            else:
+                self._persist(batch)
+            # A lista de pendentes do SQLite vem do banco: gravar já
+            if self.store is not None:
+                self.flush()
+        
+        logging.info(
+            f"Devolvidas à fila: {len(batch)} iterações ({len(impact)} substitutos de {len(removed)} códigos)"
+        )
+        return impact
     
     def get_progress_percentage(self) -> float:
         """Retorna percentual de progresso"""
-        total = self.get_total_items()
-        completed = self.get_completed_count()
-        
-        if total == 0:
+        if self._total == 0:
             return 0.0
         
-        return (completed / total) * 100
+        return (len(self._sub_counts) / self._total) * 100
+
+
+def read_saved_long(
+    output_path: str = None,
+    storage: str = None,
+    db_path: str = None,
+    reviewer: str = None
+) -> pd.DataFrame:
+    """
+    Lê os substitutos salvos no formato longo sem abrir um FileManager
+
+    Somente leitura, para relatórios e linhas de comando: não cria saída,
+    journal nem backups e não reserva faixas. Os caminhos seguem os padrões
+    do FileManager; no CSV o journal ainda não consolidado é reaplicado em
+    memória, no SQLite o banco é aberto em modo somente leitura.
+    
+    Args:
+        output_path: Arquivo de saída (padrão: data/substituicoes.csv, ou
+                     data/substituicoes_<revisor>.csv com revisor)
+        storage: "csv" ou "sqlite" (padrão: variável STORAGE_BACKEND ou "csv")
+        db_path: Caminho do banco SQLite (padrão: SQLITE_PATH ou output_path com .db)
+        reviewer: Nome do revisor (padrão: variável REVIEWER)
+    
+    Returns:
+        DataFrame com n_iteracao, rank, cod_produto, price_cents (Int64)
+    """
+    reviewer = reviewer or os.getenv("REVIEWER") or None
+    if output_path is None:
+        output_path = f"data/substituicoes_{reviewer_slug(reviewer)}.csv" if reviewer else "data/substituicoes.csv"
+    
+    storage = storage or os.getenv("STORAGE_BACKEND", "csv")
+    if storage not in ("csv", "sqlite"):
+        raise ValueError(f"Backend de armazenamento desconhecido: {storage}")
+    
+    if storage == "sqlite":
+        db_path = db_path or os.getenv("SQLITE_PATH") or f"{os.path.splitext(output_path)[0]}.db"
+        if os.path.exists(db_path):
+            return normalize_long(read_long(db_path))
+    
+    if not os.path.exists(output_path):
+        raise FileNotFoundError(f"Arquivo de saída não encontrado: {output_path}")
+    return wide_to_long(load_output(output_path).reset_index())
 
 
 # Teste rápido
@@ -0,0 +1,469 @@
+"""
+Módulo de reservas (leases) de iterações para vários revisores
+Cada revisor reserva faixas de iterações por arquivos de lock criados de forma
+atômica (O_EXCL), com expiração; cada um grava o próprio arquivo de saída e
+merge_outputs junta tudo em substituicoes.csv
+"""
+
+import os
+import re
+import json
+import time
+import socket
+import logging
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+from pathlib import Path
+
+import pandas as pd
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+# Colunas que todo arquivo de saída de revisor tem
+REVIEWER_OUTPUT_COLUMNS = ('n_iteracao', 'sub1_cod_produto')
+
+
+class LeaseError(Exception):
+    """Iteração reservada por outro revisor"""
+
+
+def reviewer_slug(reviewer: str) -> str:
+    """
+    Normaliza o nome do revisor para uso em nomes de arquivo
+
+    Args:
+        reviewer: Nome do revisor (ex.: valor de Responsável)
+
+    Returns:
+        Nome sem acentos, minúsculo, só [a-z0-9_]
+    """
+    text = unicodedata.normalize('NFKD', str(reviewer)).encode('ASCII', 'ignore').decode('ASCII')
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_') or 'revisor'
+
+
+class Lease:
+    """Reserva de uma faixa de iterações"""
+
+    def __init__(self, reviewer: str, start: int, end: int, expires_at: float, path: str):
+        self.reviewer = reviewer
+        self.start = start
+        self.end = end
+        self.expires_at = expires_at
+        self.path = path
+
+    def covers(self, n_iteracao: int) -> bool:
+        return self.start <= n_iteracao <= self.end
+
+    def __repr__(self):
+        return f"Lease({self.reviewer!r}, {self.start}-{self.end})"
+
+
+class LeaseManager:
+    """Reservas de faixas fixas de iterações em um diretório compartilhado"""
+
+    def __init__(self, lease_dir: str = "data/leases", ttl: float = 1800, chunk_size: int = 50):
+        """
+        Inicializa o gerenciador
+
+        Args:
+            lease_dir: Diretório dos arquivos de lock (compartilhado entre as instâncias)
+            ttl: Validade de uma reserva sem renovação, em segundos
+            chunk_size: Tamanho das faixas (1-50, 51-100, ...)
+        """
+        self.lease_dir = lease_dir
+        self.ttl = ttl
+        self.chunk_size = max(1, chunk_size)
+        os.makedirs(lease_dir, exist_ok=True)
+
+    def chunk_of(self, n_iteracao: int) -> tuple:
+        """Retorna (início, fim) da faixa que contém a iteração"""
+        start = ((n_iteracao - 1) // self.chunk_size) * self.chunk_size + 1
+        return start, start + self.chunk_size - 1
+
+    def _path(self, start: int) -> str:
+        return os.path.join(self.lease_dir, f"faixa_{start:06d}.lease")
+
+    def _read(self, path: str) -> Optional[Dict]:
+        """Lê um arquivo de lock (None se não existir ou estiver ilegível)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_new(self, path: str, data: Dict) -> bool:
+        """Cria o arquivo de lock atomicamente (falha se já existir)"""
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        return True
+
+    def _lock(self, path: str, wait: float = 0) -> bool:
+        """
+        Trava a troca de dono de uma reserva (arquivo .guard criado com O_EXCL)
+
+        Renovação e quebra de reserva expirada só acontecem com a trava, para
+        que a verificação do dono e a escrita sejam uma operação só. Uma trava
+        esquecida por um processo que morreu é removida após 5 segundos.
+
+        Args:
+            path: Arquivo de lock da reserva
+            wait: Tempo máximo de espera pela trava, em segundos
+
+        Returns:
+            True se a trava foi obtida
+        """
+        guard_path = f"{path}.guard"
+        deadline = time.monotonic() + wait
+        while True:
+            if self._write_new(guard_path, {'pid': os.getpid()}):
+                return True
+            try:
+                if time.time() - os.path.getmtime(guard_path) >= 5:
+                    tombstone = f"{guard_path}.{os.getpid()}.{time.monotonic_ns()}.expired"
+                    os.rename(guard_path, tombstone)
+                    os.remove(tombstone)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def _unlock(self, path: str):
+        """Libera a trava obtida com _lock"""
+        try:
+            os.remove(f"{path}.guard")
+        except FileNotFoundError:
+            pass
+
+    def _break_expired(self, path: str, data: Optional[Dict]) -> bool:
+        """
+        Remove uma reserva expirada
+
+        Renomeia para um nome único antes de apagar: só um dos processos
+        concorrentes consegue o rename, os demais recebem FileNotFoundError.
+        Com uma renovação em andamento (trava ocupada) a reserva não é quebrada.
+        """
+        if data is not None and data.get('expires_at', 0) > time.time():
+            return False
+        if not self._lock(path):
+            return False
+        try:
+            # Relê com a trava: o dono pode ter renovado depois da primeira leitura
+            data = self._read(path)
+            return self._remove_expired(path, data)
+        finally:
+            self._unlock(path)
+
+    def _remove_expired(self, path: str, data: Optional[Dict]) -> bool:
+        """Apaga o arquivo de lock se a reserva lida estiver expirada (com a trava obtida)"""
+        if data is not None and data.get('expires_at', 0) > time.time():
+            return False
+        if data is None:
+            # Ilegível: pode estar sendo criado agora por outro processo
+            try:
+                if time.time() - os.path.getmtime(path) < 5:
+                    return False
+            except FileNotFoundError:
+                return True
+        tombstone = f"{path}.{os.getpid()}.{time.monotonic_ns()}.expired"
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            return False
+        os.remove(tombstone)
+        logging.info(f"Reserva expirada removida: {os.path.basename(path)} ({(data or {}).get('reviewer')})")
+        return True
+
+    def acquire(self, reviewer: str, n_iteracao: int) -> Lease:
+        """
+        Reserva (ou renova) a faixa que contém a iteração
+
+        Args:
+            reviewer: Nome do revisor
+            n_iteracao: Qualquer iteração da faixa desejada
+
+        Returns:
+            Reserva obtida
+
+        Raises:
+            LeaseError: se a faixa está reservada por outro revisor
+        """
+        start, end = self.chunk_of(n_iteracao)
+        path = self._path(start)
+
+        for _ in range(3):
+            data = {
+                'reviewer': reviewer,
+                'start': start,
+                'end': end,
+                'expires_at': time.time() + self.ttl,
+                'host': socket.gethostname(),
+                'pid': os.getpid()
+            }
+            if self._write_new(path, data):
+                logging.info(f"Reserva criada: {reviewer} {start}-{end}")
+                return Lease(reviewer, start, end, data['expires_at'], path)
+
+            current = self._read(path)
+            if current is not None and current.get('reviewer') == reviewer:
+                return self.renew(Lease(reviewer, start, end, current.get('expires_at', 0), path))
+
+            if not self._break_expired(path, current):
+                raise LeaseError(
+                    f"Iterações {start}-{end} reservadas por {current.get('reviewer') if current else '?'}"
+                )
+
+        raise LeaseError(f"Não foi possível reservar as iterações {start}-{end}")
+
+    def holder(self, n_iteracao: int) -> Optional[str]:
+        """Revisor com reserva válida na faixa da iteração (None se livre ou expirada)"""
+        data = self._read(self._path(self.chunk_of(n_iteracao)[0]))
+        if data is None or data.get('expires_at', 0) <= time.time():
+            return None
+        return data.get('reviewer')
+
+    def acquire_next(self, reviewer: str, candidates: Iterable[int]) -> Optional[Lease]:
+        """
+        Reserva a primeira faixa livre que contenha alguma das iterações candidatas
+
+        Args:
+            reviewer: Nome do revisor
+            candidates: Iterações a trabalhar, em ordem de preferência
+
+        Returns:
+            Reserva obtida ou None se todas as faixas candidatas estão ocupadas
+        """
+        tried = set()
+        for n_iteracao in candidates:
+            start, _ = self.chunk_of(int(n_iteracao))
+            if start in tried:
+                continue
+            tried.add(start)
+            try:
+                return self.acquire(reviewer, start)
+            except LeaseError:
+                continue
+        return None
+
+    def renew(self, lease: Lease) -> Lease:
+        """
+        Estende a validade de uma reserva própria (escrita atômica)
+
+        O dono é conferido e o arquivo substituído com a trava da reserva: uma
+        reserva expirada tomada por outro revisor nunca é sobrescrita.
+
+        Raises:
+            LeaseError: se a reserva passou para outro revisor (renovação perdida)
+        """
+        if not self._lock(lease.path, wait=1):
+            raise LeaseError(f"Reserva {lease.start}-{lease.end} ocupada por outra operação")
+        try:
+            current = self._read(lease.path)
+            if current is None or current.get('reviewer') != lease.reviewer:
+                raise LeaseError(f"Reserva {lease.start}-{lease.end} perdida")
+
+            current['expires_at'] = time.time() + self.ttl
+            tmp_path = f"{lease.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(current, f)
+            os.replace(tmp_path, lease.path)
+        finally:
+            self._unlock(lease.path)
+
+        lease.expires_at = current['expires_at']
+        return lease
+
+    def release(self, lease: Lease):
+        """Libera uma reserva própria (nunca apaga a de quem a tomou depois de expirar)"""
+        if not self._lock(lease.path, wait=1):
+            logging.warning(f"Reserva não liberada (trava ocupada): {lease.reviewer} {lease.start}-{lease.end}")
+            return
+        try:
+            current = self._read(lease.path)
+            if current is not None and current.get('reviewer') == lease.reviewer:
+                os.remove(lease.path)
+                logging.info(f"Reserva liberada: {lease.reviewer} {lease.start}-{lease.end}")
+        except FileNotFoundError:
+            pass
+        finally:
+            self._unlock(lease.path)
+
+    def active_leases(self) -> List[Lease]:
+        """Reservas válidas (não expiradas) de todos os revisores"""
+        now = time.time()
+        leases = []
+        for name in os.listdir(self.lease_dir):
+            if not name.endswith('.lease'):
+                continue
+            path = os.path.join(self.lease_dir, name)
+            data = self._read(path)
+            if data and data.get('expires_at', 0) > now:
+                leases.append(Lease(data['reviewer'], data['start'], data['end'], data['expires_at'], path))
+        return sorted(leases, key=lambda lease: lease.start)
+
+
+def load_output(path: str) -> pd.DataFrame:
+    """Lê um arquivo de saída (indexado por n_iteracao), reaplicando o journal ainda não consolidado"""
+    df = pd.read_csv(path)
+    sub_columns = [c for c in df.columns if c.startswith('sub')]
+    df[sub_columns] = df[sub_columns].astype(object)
+    df['n_iteracao'] = pd.to_numeric(df['n_iteracao'], errors='coerce').fillna(0).astype(int)
+    df = df.set_index('n_iteracao')
+
+    journal_path = f"{path}.journal"
+    if os.path.exists(journal_path):
+        latest = {}
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                latest[record['n']] = record['subs']
+        for n_iteracao, subs in latest.items():
+            if n_iteracao not in df.index:
+                continue
+            df.loc[n_iteracao, sub_columns] = None
+            for i, sub in enumerate((subs or [])[:5], start=1):
+                for field in ('cod_produto', 'nome', 'preco_loja_programada'):
+                    df.at[n_iteracao, f'sub{i}_{field}'] = sub.get(field, '')
+
+    return df
+
+
+def is_reviewer_output(path: str) -> bool:
+    """Se o CSV tem as colunas de um arquivo de saída (lê só o cabeçalho)"""
+    try:
+        columns = pd.read_csv(path, nrows=0).columns
+    except (OSError, ValueError) as e:
+        logging.warning(f"Arquivo ilegível ignorado no merge: {path} ({e})")
+        return False
+    return all(column in columns for column in REVIEWER_OUTPUT_COLUMNS)
+
+
+def find_reviewer_outputs(output_dir: str = "data") -> Dict[str, str]:
+    """
+    Localiza os arquivos substituicoes_<revisor>.csv
+
+    Arquivos com o mesmo padrão de nome que não são saídas de revisor (ex.:
+    uma exportação antiga substituicoes_long.csv) são ignorados.
+
+    Returns:
+        {revisor: caminho}
+    """
+    found = {}
+    for name in sorted(os.listdir(output_dir)):
+        if not (name.startswith('substituicoes_') and name.endswith('.csv')):
+            continue
+        path = os.path.join(output_dir, name)
+        if not is_reviewer_output(path):
+            logging.warning(f"Não é saída de revisor, ignorado no merge: {path}")
+            continue
+        found[name[len('substituicoes_'):-len('.csv')]] = path
+    return found
+
+
+def load_responsible(base_fazer_path: str) -> pd.Series:
+    """Série n_iteracao -> Responsável da Base_Fazer"""
+    df = pd.read_csv(base_fazer_path, skiprows=1, usecols=['n_iteracao', 'Responsável'])
+    df['n_iteracao'] = pd.to_numeric(df['n_iteracao'], errors='coerce')
+    df = df.dropna(subset=['n_iteracao'])
+    return df.set_index(df['n_iteracao'].astype(int))['Responsável']
+
+
+def merge_outputs(
+    reviewer_outputs: Dict[str, str],
+    merged_path: str,
+    responsible: Optional[pd.Series] = None
+) -> Dict:
+    """
+    Junta os arquivos de saída dos revisores em um único substituicoes.csv
+
+    Para cada iteração vale o revisor que a preencheu; se mais de um preencheu
+    com conteúdo diferente (conflito), vence o Responsável da linha e, depois,
+    o arquivo modificado mais recentemente.
+
+    Args:
+        reviewer_outputs: {revisor: caminho do arquivo de saída}
+        merged_path: Arquivo consolidado a gravar
+        responsible: Série n_iteracao -> Responsável (opcional, da Base_Fazer)
+
+    Returns:
+        Relatório com total mesclado, itens por revisor e conflitos
+    """
+    frames = []
+    columns = None
+    max_iteracao = 0
+
+    for reviewer, path in reviewer_outputs.items():
+        if not os.path.exists(path):
+            logging.warning(f"Arquivo de saída de {reviewer} não encontrado: {path}")
+            continue
+        if not is_reviewer_output(path):
+            logging.warning(f"Arquivo de {reviewer} não é saída de revisor, ignorado: {path}")
+            continue
+        df = load_output(path)
+        columns = columns or list(df.columns)
+        max_iteracao = max(max_iteracao, int(df.index.max()) if len(df) else 0)
+
+        filled = df[df['sub1_cod_produto'].notna()].copy()
+        filled['_reviewer'] = reviewer
+        filled['_mtime'] = os.path.getmtime(path)
+        frames.append(filled)
+
+    if columns is None:
+        raise ValueError("Nenhum arquivo de saída de revisor encontrado")
+
+    stacked = pd.concat(frames).reset_index() if frames else pd.DataFrame(columns=['n_iteracao', *columns])
+
+    # Prioridade: dono (Responsável) da linha, depois o arquivo mais recente
+    if responsible is not None and len(stacked):
+        owner = stacked['n_iteracao'].map(responsible).map(
+            lambda value: reviewer_slug(value) if pd.notna(value) else None
+        )
+        stacked['_owner'] = stacked['_reviewer'].map(reviewer_slug) == owner
+    else:
+        stacked['_owner'] = False
+
+    stacked = stacked.sort_values(['n_iteracao', '_owner', '_mtime'], ascending=[True, False, False])
+
+    # Conflito: a mesma iteração com conteúdos diferentes
+    if len(stacked):
+        signature = pd.util.hash_pandas_object(stacked[columns], index=False)
+        distinct = signature.groupby(stacked['n_iteracao']).nunique()
+        conflicts = distinct[distinct > 1].index.tolist()
+    else:
+        conflicts = []
+
+    winners = stacked.drop_duplicates('n_iteracao', keep='first').set_index('n_iteracao')
+
+    merged = winners[columns].reindex(range(1, max_iteracao + 1))
+    merged.index.name = 'n_iteracao'
+    merged = merged.reset_index()
+
+    os.makedirs(os.path.dirname(merged_path) or '.', exist_ok=True)
+    tmp_path = f"{merged_path}.tmp"
+    merged.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, merged_path)
+
+    report = {
+        'mesclados': len(winners),
+        'por_revisor': winners['_reviewer'].value_counts().to_dict() if len(winners) else {},
+        'conflitos': conflicts,
+    }
+    logging.info(f"Merge de {len(reviewer_outputs)} revisores: {report['mesclados']} iterações, "
+                 f"{len(conflicts)} conflitos")
+    return report
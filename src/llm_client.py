@@ -0,0 +1,395 @@
+"""
+Módulo de acesso resiliente à API da OpenAI
+Limita requisições/tokens por minuto, repete chamadas com backoff exponencial
+e ajusta a concorrência conforme a resposta do provedor
+"""
+
+import queue
+import random
+import threading
+import time
+import logging
+from typing import Dict, Iterator, List, Optional
+from pathlib import Path
+
+import openai
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'ai_agent.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Marca de fim da fila de chunks de stream()
+_STREAM_END = object()
+
+# Erros temporários que valem uma nova tentativa
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Indica se o 429 é falta de crédito (insufficient_quota), que não passa com espera"""
+    if not isinstance(error, openai.RateLimitError):
+        return False
+    if getattr(error, 'code', None) == 'insufficient_quota':
+        return True
+    body = getattr(error, 'body', None)
+    if isinstance(body, dict):
+        detail = body.get('error', body)
+        return isinstance(detail, dict) and detail.get('code') == 'insufficient_quota'
+    return False
+
+
+class TokenBucket:
+    """Balde de tokens reabastecido continuamente (capacidade por minuto)"""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        """
+        Inicializa o balde
+
+        Args:
+            per_minute: Quantidade reabastecida por minuto (0 ou menos = sem limite)
+            capacity: Capacidade máxima (padrão: per_minute)
+        """
+        self.unlimited = per_minute <= 0
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        """Reabastece o balde conforme o tempo decorrido"""
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Retorna quantos segundos faltam para haver 'amount' disponível"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # Pedidos maiores que a capacidade esperam apenas o balde encher
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        """Consome do balde (pode ficar negativo para compensar estimativas)"""
+        if not self.unlimited:
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """Limitador de requisições e tokens por minuto (RPM/TPM)"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """
+        Inicializa o limitador
+
+        Args:
+            requests_per_minute: Limite de requisições por minuto (0 = sem limite)
+            tokens_per_minute: Limite de tokens (prompt + resposta) por minuto (0 = sem limite)
+        """
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, estimated_tokens: int):
+        """
+        Bloqueia até haver capacidade para uma requisição
+
+        Args:
+            estimated_tokens: Estimativa de tokens consumidos pela chamada
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.wait_time(1, now),
+                    self._tokens.wait_time(estimated_tokens, now)
+                )
+                if wait <= 0:
+                    self._requests.consume(1)
+                    self._tokens.consume(estimated_tokens)
+                    return
+            time.sleep(min(wait, 1.0))
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """Corrige o balde de tokens com o consumo real informado pela API"""
+        with self._lock:
+            self._tokens.consume(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float):
+        """Suspende novas requisições (ex: após um 429 com retry-after)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """Controle de concorrência AIMD: cresce aos poucos, reduz pela metade em 429"""
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16):
+        """
+        Inicializa o controlador
+
+        Args:
+            initial: Limite inicial de chamadas simultâneas
+            minimum: Limite mínimo
+            maximum: Limite máximo
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Aguarda uma vaga de execução"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        """Libera a vaga ocupada"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        """Aumento aditivo: +1 vaga a cada 'limit' sucessos"""
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        """Redução multiplicativa após limitação do provedor"""
+        with self._cond:
+            self.limit = max(self.minimum, self.limit / 2)
+            logging.warning(f"Concorrência reduzida para {int(self.limit)}")
+
+
+class ResilientChatClient:
+    """Wrapper de chat.completions com limite de taxa, retry e backoff"""
+
+    def __init__(
+        self,
+        client,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 30000,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        max_concurrency: int = 8
+    ):
+        """
+        Inicializa o wrapper
+
+        Args:
+            client: Instância de openai.OpenAI
+            requests_per_minute: Limite de requisições por minuto (0 = sem limite)
+            tokens_per_minute: Limite de tokens por minuto (0 = sem limite)
+            max_retries: Tentativas extras em erros temporários
+            base_delay: Atraso base do backoff (segundos)
+            max_delay: Atraso máximo do backoff (segundos)
+            max_concurrency: Máximo de chamadas simultâneas
+        """
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(
+            initial=max(1, max_concurrency // 2),
+            maximum=max_concurrency
+        )
+
+    @staticmethod
+    def estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+        """Estimativa grosseira de tokens (~4 caracteres por token)"""
+        prompt_chars = sum(len(m.get('content', '')) for m in messages)
+        return prompt_chars // 4 + max_tokens
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Calcula espera com backoff exponencial e jitter completo"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+        # Respeitar retry-after informado pelo provedor
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('retry-after', 0))
+                delay = max(delay, retry_after)
+            except (TypeError, ValueError):
+                pass
+
+        return delay
+
+    def _acquire(self, estimated: int):
+        """Aguarda limite de taxa e vaga de concorrência"""
+        self.rate_limiter.acquire(estimated)
+        self.concurrency.acquire()
+
+    def _on_success(self, estimated: int, usage):
+        """Registra sucesso e corrige o consumo de tokens"""
+        self.concurrency.on_success()
+        if usage is not None and getattr(usage, 'total_tokens', None):
+            self.rate_limiter.reconcile(estimated, usage.total_tokens)
+
+    def _wait_before_retry(self, attempt: int, error: Exception, stats: Optional[Dict]) -> int:
+        """
+        Trata um erro temporário: ajusta limites e aguarda o backoff
+
+        Returns:
+            Número da próxima tentativa
+
+        Raises:
+            O próprio erro se as tentativas se esgotaram ou se a cota acabou
+        """
+        if is_quota_error(error):
+            # Sem crédito na conta: esperar não resolve
+            logging.error("Cota da API da OpenAI esgotada (insufficient_quota), sem novas tentativas")
+            raise error
+
+        if isinstance(error, openai.RateLimitError):
+            self.concurrency.on_throttle()
+
+        if attempt >= self.max_retries:
+            raise error
+
+        delay = self._backoff_delay(attempt, error)
+        if isinstance(error, openai.RateLimitError):
+            self.rate_limiter.pause(delay)
+
+        attempt += 1
+        if stats is not None:
+            stats['retries'] = attempt
+        logging.warning(
+            f"Erro temporário na API ({type(error).__name__}), "
+            f"tentativa {attempt}/{self.max_retries} em {delay:.1f}s"
+        )
+        time.sleep(delay)
+        return attempt
+
+    def create(self, stats: Optional[Dict] = None, **kwargs):
+        """
+        Chama chat.completions.create respeitando limites e repetindo em falhas
+
+        Args:
+            stats: Dicionário opcional preenchido com 'retries'
+            **kwargs: Argumentos de chat.completions.create
+
+        Returns:
+            Resposta da API
+
+        Raises:
+            Último erro da API se todas as tentativas falharem
+        """
+        estimated = self.estimate_tokens(kwargs.get('messages', []), kwargs.get('max_tokens', 0))
+        attempt = 0
+
+        while True:
+            self._acquire(estimated)
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+                error = None
+            except RETRYABLE_ERRORS as e:
+                error = e
+            finally:
+                self.concurrency.release()
+
+            if error is None:
+                self._on_success(estimated, getattr(response, 'usage', None))
+                return response
+
+            attempt = self._wait_before_retry(attempt, error, stats)
+
+    def stream(self, stats: Optional[Dict] = None, **kwargs) -> Iterator:
+        """
+        Versão em streaming de create(): entrega os chunks conforme chegam
+
+        Só há nova tentativa enquanto nenhum chunk foi entregue; erros no
+        meio do stream são repassados ao chamador.
+
+        Uma thread de leitura esvazia a resposta HTTP em uma fila e libera a
+        vaga de concorrência assim que ela termina: o tempo do consumidor
+        entre os chunks não segura a vaga de outras chamadas.
+
+        Args:
+            stats: Dicionário opcional preenchido com 'retries' e 'usage'
+            **kwargs: Argumentos de chat.completions.create
+
+        Yields:
+            Chunks da resposta
+        """
+        estimated = self.estimate_tokens(kwargs.get('messages', []), kwargs.get('max_tokens', 0))
+        attempt = 0
+
+        while True:
+            self._acquire(estimated)
+            try:
+                stream = self.client.chat.completions.create(
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **kwargs
+                )
+                break
+            except RETRYABLE_ERRORS as e:
+                self.concurrency.release()
+                attempt = self._wait_before_retry(attempt, e, stats)
+            except Exception:
+                self.concurrency.release()
+                raise
+
+        chunks = queue.Queue()
+        closed = threading.Event()
+        outcome = {}
+
+        def read_stream():
+            usage = None
+            try:
+                for chunk in stream:
+                    if closed.is_set():
+                        # Consumidor fechou o iterador: abandonar a resposta
+                        close = getattr(stream, 'close', None)
+                        if close is not None:
+                            close()
+                        return
+                    if getattr(chunk, 'usage', None) is not None:
+                        usage = chunk.usage
+                    chunks.put(chunk)
+            except Exception as e:
+                outcome['error'] = e
+            finally:
+                self.concurrency.release()
+
+            if 'error' not in outcome:
+                if stats is not None:
+                    stats['usage'] = usage
+                self._on_success(estimated, usage)
+            chunks.put(_STREAM_END)
+
+        threading.Thread(target=read_stream, name='llm-stream', daemon=True).start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _STREAM_END:
+                    break
+                yield chunk
+        finally:
+            closed.set()
+
+        if 'error' in outcome:
+            raise outcome['error']
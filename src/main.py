@@ -16,6 +16,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from ai_agent import AIAgent
 from data_processor import DataProcessor
 from file_manager import FileManager
+from output_stats import STAT_DIMENSIONS
+from prefetcher import IterationPrefetcher
+from product_families import detect_families
+from search_filters import parse_filter_expression
 from ui import SubstituteFinderUI
 
 # Configurar logging principal
@@ -44,8 +48,19 @@ class SubstituteFinderApp:
         
         try:
             self.file_manager = FileManager(self.base_fazer_path)
+            # Estatísticas montadas em segundo plano (no modo lazy é uma varredura completa)
+            self.file_manager.warm_stats()
             self.data_processor = DataProcessor(self.itens_ativos_path)
             self.ai_agent = AIAgent()
+            self.ai_agent.start_retry_worker()
+            
+            # Uma chamada à IA por família de produtos pendentes
+            families = detect_families(self.file_manager.get_pending_items())
+            for family in families:
+                if len(family) > 1:
+                    # O representante vai à IA com o próprio preço
+                    self._attach_price(family.representative_item)
+            self.ai_agent.register_families(families)
             
             logging.info("Componentes inicializados com sucesso")
             
@@ -54,6 +69,16 @@ class SubstituteFinderApp:
             print(f"ERRO: Não foi possível inicializar a aplicação: {e}")
             sys.exit(1)
         
+        # Pré-carregamento das próximas iterações (0 desativa)
+        self.prefetcher = IterationPrefetcher(
+            self._prefetch_iteration,
+            lookahead=int(os.getenv("PREFETCH_LOOKAHEAD", "3"))
+        )
+        
+        # Verificação periódica de Itens_Ativos.csv (0 desativa)
+        self.catalog_poll_ms = int(float(os.getenv("CATALOG_POLL_SECONDS", "60")) * 1000)
+        self._catalog_reloading = False
+        
         # Criar interface
         self.root = ctk.CTk()
         self.ui = SubstituteFinderUI(self.root)
@@ -63,7 +88,9 @@ class SubstituteFinderApp:
             on_load_iteration=self.load_iteration,
             on_save_substitutes=self.save_substitutes,
             on_search_manual=self.manual_search,
-            on_skip_iteration=self.skip_iteration
+            on_skip_iteration=self.skip_iteration,
+            on_show_stats=self.show_statistics,
+            on_claim_range=self.claim_next_range if self.file_manager.reviewer else None
         )
         
         # Carregar primeira iteração
@@ -73,8 +100,27 @@ class SubstituteFinderApp:
         # Atualizar progresso inicial
         self._update_progress()
         
-        # Carregar primeira iteração
-        self.load_iteration(1)
+        if self.catalog_poll_ms > 0:
+            self.root.after(self.catalog_poll_ms, self._poll_catalog)
+        
+        # Carregar primeira iteração (com revisor: início da faixa reservada)
+        if not (self.file_manager.reviewer and self.claim_next_range()):
+            self.ui.load_iteration(1)
+    
+    def claim_next_range(self) -> bool:
+        """
+        Reserva a próxima faixa livre com itens pendentes e abre o seu início
+        
+        Returns:
+            True se uma faixa foi reservada
+        """
+        lease = self.file_manager.acquire_lease()
+        if lease is None:
+            self.ui.show_message("Aviso", "Nenhuma faixa livre com itens pendentes.")
+            return False
+        logging.info(f"Faixa reservada para {lease.reviewer}: {lease.start}-{lease.end}")
+        self.ui.load_iteration(lease.start)
+        return True
     
     def _check_files(self):
         """Verifica se os arquivos CSV existem"""
@@ -107,18 +153,13 @@ class SubstituteFinderApp:
             )
             return
         
+        # Vários revisores: abrir não reserva (a faixa é reservada ao salvar);
+        # faixas próprias deixadas para trás são liberadas
+        owner = self.file_manager.reserved_by_other(iteration_num)
+        self.file_manager.release_leases(keep=iteration_num)
+        
         # Buscar preço do produto nos Itens_Ativos
-        cod_produto = product.get('cod_produto')
-        if cod_produto:
-            product_details = self.data_processor.get_product_by_code(cod_produto)
-            if product_details and 'preco_loja_programada' in product_details:
-                product['preco_loja_programada'] = product_details['preco_loja_programada']
-                logging.info(f"Preço encontrado: R$ {product['preco_loja_programada']}")
-            else:
-                logging.warning(f"Produto {cod_produto} não encontrado nos Itens_Ativos")
-                product['preco_loja_programada'] = 'N/A'
-        else:
-            product['preco_loja_programada'] = 'N/A'
+        self._attach_price(product)
         
         self.current_product = product
         
@@ -134,47 +175,134 @@ class SubstituteFinderApp:
             saved_codes = [sub['cod_produto'] for sub in saved_subs]
             self.ui.display_results(saved_subs, preselected=saved_codes)
             self.current_search_results = saved_subs
+        elif owner is not None:
+            # Faixa de outro revisor: não gastar chamadas de IA em itens que não podem ser salvos
+            self.ui.display_results([])
+            self.current_search_results = []
         else:
             # Não tem substitutos salvos, buscar com IA
-            self._search_substitutes_with_ai(product)
+            self._search_substitutes_with_ai(product, iteration_num)
+        
+        if owner is not None:
+            self.ui.show_message(
+                "Aviso",
+                f"Iteração {iteration_num} está na faixa reservada por {owner}. Salvamentos nesta faixa serão recusados."
+            )
+            return
+        
+        # Pré-carregar as próximas iterações em segundo plano
+        self.prefetcher.schedule(iteration_num, self.file_manager.get_max_iteration())
+    
+    def _attach_price(self, product: Dict):
+        """
+        Preenche o preço do produto a partir dos Itens_Ativos
+        
+        Args:
+            product: Dicionário com dados do produto (modificado no lugar)
+        """
+        cod_produto = product.get('cod_produto')
+        if cod_produto:
+            product_details = self.data_processor.get_product_by_code(cod_produto)
+            if product_details and 'preco_loja_programada' in product_details:
+                product['preco_loja_programada'] = product_details['preco_loja_programada']
+                logging.info(f"Preço encontrado: R$ {product['preco_loja_programada']}")
+            else:
+                logging.warning(f"Produto {cod_produto} não encontrado nos Itens_Ativos")
+                product['preco_loja_programada'] = 'N/A'
+        else:
+            product['preco_loja_programada'] = 'N/A'
+    
+    def _find_substitutes(self, product: Dict) -> List[Dict]:
+        """
+        Gera termos com IA e busca substitutos no catálogo
+        
+        Args:
+            product: Dicionário com dados do produto (já com preço)
+            
+        Returns:
+            Lista de dicts com os produtos encontrados
+        """
+        product_name = product.get('nome', '')
+        product_price = str(product.get('preco_loja_programada', ''))
+        
+        logging.info(f"Gerando termos de busca para: {product_name}")
+        search_terms = self.ai_agent.generate_search_terms(product_name, product_price)
+        
+        logging.info(f"Termos gerados: {search_terms}")
+        
+        # Buscar produtos
+        results = self.data_processor.search_products(
+            search_terms,
+            original_product_code=product.get('cod_produto'),
+            max_results=50
+        )
+        
+        # Converter DataFrame para lista de dicts
+        if len(results) > 0:
+            return results.to_dict('records')
+        return []
+    
+    def _prefetch_iteration(self, iteration_num: int, is_obsolete) -> List[Dict]:
+        """
+        Pré-carrega os resultados de uma iteração (executado pelo prefetcher)
+        
+        Args:
+            iteration_num: Número da iteração
+            is_obsolete: Função que indica se o trabalho deixou de ser necessário
+            
+        Returns:
+            Lista de resultados ou None se não houver o que pré-carregar
+        """
+        product = self.file_manager.get_item_by_iteration(iteration_num)
+        if product is None or self.file_manager.get_saved_substitutes(iteration_num):
+            return None
+        if self.file_manager.reserved_by_other(iteration_num):
+            return None
+        
+        self._attach_price(product)
+        if is_obsolete():
+            return None
+        
+        return self._find_substitutes(product)
     
-    def _search_substitutes_with_ai(self, product: Dict):
+    def _search_substitutes_with_ai(self, product: Dict, iteration_num: int):
         """
         Busca substitutos usando IA em thread separada
         
         Args:
             product: Dicionário com dados do produto
+            iteration_num: Número da iteração exibida
         """
+        # Resultado já pré-carregado: exibir imediatamente
+        prefetched = self.prefetcher.take(iteration_num, timeout=0)
+        if prefetched is not None:
+            logging.info(f"Usando resultados pré-carregados da iteração {iteration_num}")
+            self.current_search_results = prefetched
+            self._display_search_results(prefetched)
+            return
+        
+        # Limpar resultados da iteração anterior (e suas seleções)
+        self.ui.display_results([])
         self.ui.show_loading("Analisando produto e gerando termos de busca...")
         
         def search_thread():
             try:
-                # Gerar termos de busca com IA
-                product_name = product.get('nome', '')
-                product_price = str(product.get('preco_loja_programada', ''))
-                
-                logging.info(f"Gerando termos de busca para: {product_name}")
-                search_terms = self.ai_agent.generate_search_terms(product_name, product_price)
+                # Aproveitar pré-carregamento em andamento, se houver
+                results_list = self.prefetcher.take(iteration_num)
+                if results_list is None:
+                    results_list = self._stream_substitutes(product, iteration_num)
                 
-                logging.info(f"Termos gerados: {search_terms}")
-                
-                # Buscar produtos
-                results = self.data_processor.search_products(
-                    search_terms,
-                    original_product_code=product.get('cod_produto'),
-                    max_results=50
-                )
-                
-                # Converter DataFrame para lista de dicts
-                if len(results) > 0:
-                    results_list = results.to_dict('records')
-                else:
-                    results_list = []
+                # Ignorar resultado se o revisor já mudou de iteração
+                if self.ui.current_iteration != iteration_num:
+                    return
                 
                 self.current_search_results = results_list
                 
                 # Atualizar interface (deve ser na thread principal)
-                self.root.after(0, lambda: self._display_search_results(results_list))
+                self.root.after(0, lambda: self._display_search_results(
+                    results_list,
+                    preselected=self.ui.get_selected_codes()
+                ))
                 
             except Exception as e:
                 logging.error(f"Erro ao buscar substitutos: {e}")
@@ -189,9 +317,52 @@ class SubstituteFinderApp:
         thread = threading.Thread(target=search_thread, daemon=True)
         thread.start()
     
-    def _display_search_results(self, results: List[Dict]):
+    def _stream_substitutes(self, product: Dict, iteration_num: int) -> List[Dict]:
+        """
+        Busca substitutos consumindo os termos da IA em streaming,
+        exibindo resultados parciais assim que o primeiro termo chega
+        
+        Args:
+            product: Dicionário com dados do produto (já com preço)
+            iteration_num: Número da iteração exibida
+            
+        Returns:
+            Lista final de dicts com os produtos encontrados
+        """
+        product_name = product.get('nome', '')
+        product_price = str(product.get('preco_loja_programada', ''))
+        
+        logging.info(f"Gerando termos de busca (streaming) para: {product_name}")
+        terms = self.ai_agent.stream_search_terms(product_name, product_price)
+        
+        partial_results = self.data_processor.iter_search_products(
+            terms,
+            original_product_code=product.get('cod_produto'),
+            max_results=50
+        )
+        
+        results_list = []
+        for df_partial in partial_results:
+            results_list = df_partial.to_dict('records')
+            if results_list:
+                self.root.after(
+                    0,
+                    lambda r=results_list: self._display_partial_results(r, iteration_num)
+                )
+        
+        return results_list
+    
+    def _display_partial_results(self, results: List[Dict], iteration_num: int):
+        """Exibe resultados parciais mantendo as seleções já feitas"""
+        if self.ui.current_iteration != iteration_num:
+            return
+        
+        self.ui.hide_loading()
+        self.ui.display_results(results, preselected=self.ui.get_selected_codes())
+    
+    def _display_search_results(self, results: List[Dict], preselected: List[str] = None):
         """Exibe resultados na interface"""
-        self.ui.display_results(results)
+        self.ui.display_results(results, preselected=preselected)
         
         if len(results) == 0:
             self.ui.show_message(
@@ -204,7 +375,8 @@ class SubstituteFinderApp:
         Realiza busca manual com termo fornecido pelo usuário
         
         Args:
-            search_term: Termo de busca
+            search_term: Termo de busca (aceita filtros como preco:5-20,
+                         tamanho:100-500g, prefixo:SHOP,KDB e -marca)
         """
         logging.info(f"Busca manual: {search_term}")
         
@@ -212,12 +384,14 @@ class SubstituteFinderApp:
         
         def search_thread():
             try:
-                # Buscar usando o termo fornecido
+                term, filters = parse_filter_expression(search_term)
+                # Buscar usando o termo fornecido (só filtros: linhas que passam neles)
                 results = self.data_processor.search_products(
-                    [search_term],
+                    [term] if term else [],
                     original_product_code=self.current_product.get('cod_produto') if self.current_product else None,
                     max_results=50,
-                    min_similarity=50  # Menor threshold para busca manual
+                    min_similarity=50,  # Menor threshold para busca manual
+                    filters=filters
                 )
                 
                 if len(results) > 0:
@@ -266,6 +440,7 @@ class SubstituteFinderApp:
         
         try:
             self.file_manager.save_substitutes(iteration_num, selected_items)
+            self.prefetcher.invalidate(iteration_num)
             
             # Atualizar progresso
             self._update_progress()
@@ -289,7 +464,13 @@ class SubstituteFinderApp:
         logging.info(f"Pulando iteração {iteration_num}")
         
         # Salvar lista vazia
-        self.file_manager.save_substitutes(iteration_num, [])
+        try:
+            self.file_manager.save_substitutes(iteration_num, [])
+        except Exception as e:
+            logging.error(f"Erro ao pular iteração: {e}")
+            self.ui.show_message("Erro", f"Erro ao pular: {str(e)}")
+            return
+        self.prefetcher.invalidate(iteration_num)
         self._update_progress()
     
     def _update_progress(self):
@@ -299,11 +480,88 @@ class SubstituteFinderApp:
         
         self.ui.update_progress(completed, total)
     
+    def show_statistics(self, iteration_num: int):
+        """
+        Mostra o progresso geral e o dos grupos do item atual
+        
+        As estatísticas são lidas em uma thread de trabalho: se ainda não
+        estiverem prontas, a montagem não trava a interface.
+        
+        Args:
+            iteration_num: Número da iteração atual
+        """
+        def stats_thread():
+            try:
+                summary = self.file_manager.get_stats_summary()
+                lines = [
+                    f"Completos: {summary['completed']}/{summary['total']} "
+                    f"(parciais: {summary['partial']}, puladas: {summary['skipped']})",
+                    f"Códigos repetidos: {summary['duplicated_codes']}"
+                ]
+                
+                product = self.file_manager.get_item_by_iteration(iteration_num) or {}
+                for dimension in STAT_DIMENSIONS:
+                    if dimension not in product:
+                        continue
+                    group = self.file_manager.get_group_progress(dimension, product[dimension])
+                    if group:
+                        lines.append(f"{dimension} {product[dimension]}: {group['completed']}/{group['total']}")
+                
+                self.root.after(0, lambda: self.ui.show_message("Estatísticas", "\n".join(lines)))
+            except Exception as e:
+                logging.error(f"Erro ao calcular estatísticas: {e}")
+                self.root.after(0, lambda: self.ui.show_message(
+                    "Erro",
+                    f"Erro ao calcular estatísticas: {str(e)}"
+                ))
+        
+        thread = threading.Thread(target=stats_thread, daemon=True)
+        thread.start()
+    
+    def _poll_catalog(self):
+        """Recarrega Itens_Ativos em segundo plano quando o arquivo muda"""
+        if not self._catalog_reloading and self.data_processor.has_file_changed():
+            self._catalog_reloading = True
+            thread = threading.Thread(target=self._reload_catalog, daemon=True)
+            thread.start()
+        
+        self.root.after(self.catalog_poll_ms, self._poll_catalog)
+    
+    def _reload_catalog(self):
+        """Aplica as mudanças do catálogo e avisa sobre substitutos salvos afetados"""
+        try:
+            changes = self.data_processor.reload()
+            self.prefetcher.clear()
+            
+            removed = self.file_manager.get_impact(changes['deleted'])
+            updated = self.file_manager.get_impact(changes['updated'])
+            logging.info(
+                f"Catálogo recarregado: {len(removed)} substitutos salvos removidos do catálogo, "
+                f"{len(updated)} com dados alterados"
+            )
+            
+            if len(removed):
+                message = (
+                    f"Itens_Ativos foi atualizado: {len(changes['deleted'])} produtos saíram do catálogo.\n"
+                    f"{removed['n_iteracao'].nunique()} iterações salvas usam esses produtos "
+                    f"(ex.: {', '.join(map(str, removed['n_iteracao'].unique()[:10]))})."
+                )
+                self.root.after(0, lambda: self.ui.show_message("Catálogo atualizado", message))
+        except Exception as e:
+            logging.error(f"Erro ao recarregar itens ativos: {e}")
+        finally:
+            self._catalog_reloading = False
+    
     def run(self):
         """Inicia a aplicação"""
         logging.info("Aplicação iniciada")
-        self.root.mainloop()
-        logging.info("Aplicação encerrada")
+        try:
+            self.root.mainloop()
+        finally:
+            self.prefetcher.shutdown()
+            self.ai_agent.shutdown()
+            self.file_manager.close()
+            logging.info("Aplicação encerrada")
 
 
 def main():
@@ -0,0 +1,161 @@
+"""
+Módulo de exportação do arquivo de saída em formatos para sistemas downstream
+- Formato longo: uma linha por (n_iteracao, rank) com o preço em centavos
+- Formato colunar tipado: Parquet (se pyarrow estiver instalado) ou .npz
+"""
+
+import os
+import logging
+from typing import Optional
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Parquet é opcional
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+LONG_COLUMNS = ['n_iteracao', 'rank', 'cod_produto', 'price_cents']
+MISSING_PRICE = -1
+
+
+def parse_price_cents(prices: pd.Series) -> pd.Series:
+    """
+    Converte preços no formato brasileiro ("1.234,56", "R$ 10,99") em centavos (vetorizado)
+
+    Args:
+        prices: Série de preços (texto ou número)
+
+    Returns:
+        Série Int64 (NA quando vazio ou inválido)
+    """
+    text = prices.astype(object).where(prices.notna(), '').astype(str)
+    text = text.str.replace('R$', '', regex=False).str.strip()
+
+    # Com vírgula: "." é separador de milhar; sem vírgula: "." é decimal
+    has_comma = text.str.contains(',', regex=False)
+    normalized = text.where(
+        ~has_comma,
+        text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    )
+
+    values = pd.to_numeric(normalized, errors='coerce')
+    return (values * 100).round().astype('Int64')
+
+
+def wide_to_long(df_output: pd.DataFrame, max_substitutes: int = 5) -> pd.DataFrame:
+    """
+    Converte o layout largo (sub1_..sub5_) em formato longo, em uma passada vetorizada
+
+    Args:
+        df_output: DataFrame no layout de substituicoes.csv
+
+    Returns:
+        DataFrame com n_iteracao, rank, cod_produto, price_cents (ordenado)
+    """
+    ranks = range(1, max_substitutes + 1)
+    rows = len(df_output)
+
+    codes = np.concatenate([df_output[f'sub{r}_cod_produto'].to_numpy(dtype=object) for r in ranks])
+    prices = np.concatenate([df_output[f'sub{r}_preco_loja_programada'].to_numpy(dtype=object) for r in ranks])
+    iterations = np.tile(df_output['n_iteracao'].to_numpy(dtype=np.int64), max_substitutes)
+    rank_values = np.repeat(np.arange(1, max_substitutes + 1, dtype=np.int64), rows)
+
+    filled = pd.notna(codes)
+    long_df = pd.DataFrame({
+        'n_iteracao': iterations[filled],
+        'rank': rank_values[filled],
+        'cod_produto': codes[filled],
+        'preco': prices[filled],
+    })
+    return normalize_long(long_df)
+
+
+def normalize_long(long_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipa e ordena um DataFrame longo com coluna 'preco' em texto
+
+    Returns:
+        DataFrame com LONG_COLUMNS
+    """
+    result = pd.DataFrame({
+        'n_iteracao': long_df['n_iteracao'].astype('int32'),
+        'rank': long_df['rank'].astype('int8'),
+        'cod_produto': long_df['cod_produto'].astype(str),
+        'price_cents': parse_price_cents(long_df['preco']),
+    })
+    return result.sort_values(['n_iteracao', 'rank'], kind='stable').reset_index(drop=True)
+
+
+def write_long_csv(long_df: pd.DataFrame, path: str) -> str:
+    """Grava o formato longo em CSV (escrita atômica)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    long_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    logging.info(f"Exportação longa: {len(long_df)} linhas em {path}")
+    return path
+
+
+def write_columnar(long_df: pd.DataFrame, path: Optional[str] = None) -> str:
+    """
+    Grava o formato longo em arquivo colunar tipado
+
+    Args:
+        long_df: DataFrame de wide_to_long
+        path: Caminho sem extensão ou com .parquet/.npz (padrão: data/exports/substituicoes)
+
+    Returns:
+        Caminho gravado (.parquet com pyarrow; senão .npz)
+    """
+    base = os.path.splitext(path or "data/exports/substituicoes")[0]
+    os.makedirs(os.path.dirname(base) or '.', exist_ok=True)
+
+    if PARQUET_AVAILABLE:
+        path = f"{base}.parquet"
+        tmp_path = f"{path}.tmp"
+        long_df.to_parquet(tmp_path, index=False)
+    else:
+        # Arrays numpy tipados; códigos como texto de largura fixa
+        path = f"{base}.npz"
+        tmp_path = f"{base}.tmp.npz"
+        np.savez(
+            tmp_path,
+            n_iteracao=long_df['n_iteracao'].to_numpy(dtype=np.int32),
+            rank=long_df['rank'].to_numpy(dtype=np.int8),
+            cod_produto=long_df['cod_produto'].to_numpy(dtype=str),
+            price_cents=long_df['price_cents'].fillna(MISSING_PRICE).to_numpy(dtype=np.int64),
+        )
+
+    os.replace(tmp_path, path)
+    logging.info(f"Exportação colunar: {len(long_df)} linhas em {path}")
+    return path
+
+
+def read_columnar(path: str) -> pd.DataFrame:
+    """
+    Lê um arquivo gravado por write_columnar (para sistemas downstream)
+
+    Returns:
+        DataFrame com LONG_COLUMNS (price_cents Int64, NA quando ausente)
+    """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+
+    with np.load(path, allow_pickle=False) as data:
+        df = pd.DataFrame({column: data[column] for column in LONG_COLUMNS})
+    df['price_cents'] = df['price_cents'].astype('Int64').mask(df['price_cents'] == MISSING_PRICE)
+    return df
@@ -0,0 +1,289 @@
+"""
+Módulo de estatísticas do arquivo de saída
+Mantém, atualizados a cada salvamento, os contadores de status (vazias,
+parciais, completas, puladas) por Responsável/Comprador/Subcategoria e a
+contagem de uso de cada código substituto
+"""
+
+import sys
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Colunas da Base_Fazer usadas nos recortes
+STAT_DIMENSIONS = ('Responsável', 'Comprador', 'Subcategoria')
+
+# Colunas dos contadores (por grupo)
+STATUS_COLUMNS = ['total', 'completed', 'partial', 'full', 'skipped']
+
+# Rótulo dos itens sem valor na dimensão
+MISSING_GROUP = '(vazio)'
+
+
+def code_key(code) -> str:
+    """Normaliza um código de produto para contagem (123.0 e "123" contam juntos)"""
+    if isinstance(code, float) and code.is_integer():
+        return str(int(code))
+    return str(code).strip()
+
+
+def _status(codes: Optional[Tuple]) -> np.ndarray:
+    """Contribuição de uma iteração para completed/partial/full/skipped"""
+    if codes is None:
+        return np.zeros(4, dtype=np.int64)
+    count = len(codes)
+    return np.array([count > 0, 0 < count < 5, count >= 5, count == 0], dtype=np.int64)
+
+
+def group_columns_from_chunks(chunks: Iterable[pd.DataFrame], dimensions=STAT_DIMENSIONS) -> pd.DataFrame:
+    """
+    Junta n_iteracao e as colunas de recorte lidas em blocos, já como categorias
+
+    Args:
+        chunks: Blocos da Base_Fazer (ex.: WorklistIndex.iter_chunks)
+        dimensions: Colunas de recorte
+
+    Returns:
+        DataFrame com n_iteracao e uma coluna categórica por dimensão presente
+    """
+    iterations: List[np.ndarray] = []
+    columns: Dict[str, List[pd.Categorical]] = {}
+
+    for chunk in chunks:
+        iterations.append(chunk['n_iteracao'].to_numpy(dtype=np.int64))
+        for dim in dimensions:
+            if dim in chunk.columns:
+                columns.setdefault(dim, []).append(pd.Categorical(chunk[dim].astype(object)))
+
+    data = {'n_iteracao': np.concatenate(iterations) if iterations else np.array([], dtype=np.int64)}
+    for dim, parts in columns.items():
+        data[dim] = union_categoricals(parts) if parts else pd.Categorical([])
+    return pd.DataFrame(data)
+
+
+class OutputStats:
+    """Agregados do arquivo de saída, atualizados em O(1) por salvamento"""
+
+    def __init__(self, base_groups: pd.DataFrame):
+        """
+        Prepara os grupos de cada iteração
+
+        Args:
+            base_groups: n_iteracao + colunas de recorte da Base_Fazer
+        """
+        order = np.argsort(base_groups['n_iteracao'].to_numpy(dtype=np.int64), kind='stable')
+        self._iterations = base_groups['n_iteracao'].to_numpy(dtype=np.int64)[order]
+
+        self.dimensions = [dim for dim in STAT_DIMENSIONS if dim in base_groups.columns]
+        self._categories: Dict[str, pd.Index] = {}
+        self._group_codes: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, np.ndarray] = {}
+
+        for dim in self.dimensions:
+            categorical = pd.Categorical(base_groups[dim].astype(object))
+            codes = categorical.codes.astype(np.int32)[order]
+            # Itens sem valor vão para um grupo extra no fim
+            codes[codes < 0] = len(categorical.categories)
+            self._categories[dim] = categorical.categories
+            self._group_codes[dim] = codes
+
+            counts = np.zeros((len(categorical.categories) + 1, len(STATUS_COLUMNS)), dtype=np.int64)
+            counts[:, 0] = np.bincount(codes, minlength=len(counts))
+            self._counts[dim] = counts
+
+        # Iterações já salvas: n_iteracao -> códigos (tupla vazia = pulada)
+        self._saved: Dict[int, Tuple[str, ...]] = {}
+        self.code_counts: Counter = Counter()
+        self._totals = np.zeros(4, dtype=np.int64)
+
+    def _positions(self, iterations: np.ndarray) -> np.ndarray:
+        """Posição de cada n_iteracao na Base_Fazer (-1 se não existir)"""
+        positions = np.searchsorted(self._iterations, iterations)
+        positions = np.minimum(positions, max(len(self._iterations) - 1, 0))
+        found = len(self._iterations) > 0
+        valid = (self._iterations[positions] == iterations) if found else np.zeros(len(iterations), dtype=bool)
+        return np.where(valid, positions, -1)
+
+    def load(self, saved_long: pd.DataFrame, skipped: Iterable[int] = ()):
+        """
+        Calcula os agregados a partir do que já está salvo (vetorizado)
+
+        Args:
+            saved_long: DataFrame com n_iteracao, rank e cod_produto (formato longo)
+            skipped: Iterações puladas (salvas sem substitutos)
+        """
+        saved_long = saved_long.sort_values(['n_iteracao', 'rank'], kind='stable')
+        keys = saved_long['cod_produto'].map(code_key)
+
+        self._saved = {
+            int(n): tuple(codes)
+            for n, codes in keys.groupby(saved_long['n_iteracao'].to_numpy(), sort=False)
+        }
+        for n in skipped:
+            self._saved.setdefault(int(n), ())
+        self.code_counts = Counter(keys.value_counts().to_dict())
+
+        iterations = np.fromiter(self._saved.keys(), dtype=np.int64, count=len(self._saved))
+        sizes = np.fromiter((len(c) for c in self._saved.values()), dtype=np.int64, count=len(self._saved))
+        flags = np.stack([sizes > 0, (sizes > 0) & (sizes < 5), sizes >= 5, sizes == 0], axis=1).astype(np.int64)
+
+        self._totals = flags.sum(axis=0) if len(flags) else np.zeros(4, dtype=np.int64)
+
+        positions = self._positions(iterations)
+        inside = positions >= 0
+        for dim in self.dimensions:
+            counts = self._counts[dim]
+            counts[:, 1:] = 0
+            groups = self._group_codes[dim][positions[inside]]
+            for column in range(4):
+                counts[:, column + 1] = np.bincount(groups, weights=flags[inside, column], minlength=len(counts))
+
+    def apply(self, n_iteracao: int, codes: List):
+        """
+        Atualiza os agregados após um salvamento
+
+        Args:
+            n_iteracao: Número da iteração
+            codes: Códigos salvos (lista vazia = iteração pulada; None = volta a pendente)
+        """
+        new = None if codes is None else tuple(code_key(code) for code in codes)
+        old = self._saved.get(n_iteracao)
+
+        delta = _status(new) - _status(old)
+        self._totals += delta
+
+        position = self._positions(np.array([n_iteracao], dtype=np.int64))[0]
+        if position >= 0:
+            for dim in self.dimensions:
+                self._counts[dim][self._group_codes[dim][position], 1:] += delta
+
+        if old:
+            self.code_counts.subtract(old)
+            for code in old:
+                if self.code_counts[code] <= 0:
+                    self.code_counts.pop(code, None)
+        if new is None:
+            self._saved.pop(n_iteracao, None)
+            return
+        self.code_counts.update(new)
+        self._saved[n_iteracao] = new
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Retorna os totais gerais
+
+        Returns:
+            Dicionário com total, completed, partial, full, skipped, pending,
+            empty (sem substitutos), unique_codes, duplicated_codes e repetitions
+        """
+        total = len(self._iterations)
+        completed, partial, full, skipped = (int(v) for v in self._totals)
+        used = sum(self.code_counts.values())
+        return {
+            'total': total,
+            'completed': completed,
+            'partial': partial,
+            'full': full,
+            'skipped': skipped,
+            'pending': total - completed - skipped,
+            'empty': total - completed,
+            'unique_codes': len(self.code_counts),
+            'duplicated_codes': sum(1 for count in self.code_counts.values() if count > 1),
+            'repetitions': used - len(self.code_counts)
+        }
+
+    def breakdown(self, dimension: str) -> pd.DataFrame:
+        """
+        Retorna os contadores por grupo de uma dimensão
+
+        Args:
+            dimension: 'Responsável', 'Comprador' ou 'Subcategoria'
+
+        Returns:
+            DataFrame indexado pelo grupo com total, completed, partial, full,
+            skipped, pending e percent (ordenado por total)
+        """
+        if dimension not in self._counts:
+            raise ValueError(f"Dimensão indisponível na Base_Fazer: {dimension}")
+
+        labels = [str(c) for c in self._categories[dimension]] + [MISSING_GROUP]
+        df = pd.DataFrame(self._counts[dimension], index=pd.Index(labels, name=dimension), columns=STATUS_COLUMNS)
+        df = df[df['total'] > 0]
+        df['pending'] = df['total'] - df['completed'] - df['skipped']
+        df['percent'] = (df['completed'] / df['total'] * 100).round(1)
+        return df.sort_values('total', ascending=False, kind='stable')
+
+    def group_progress(self, dimension: str, value) -> Dict[str, int]:
+        """
+        Retorna os contadores de um único grupo (consulta O(1) para a interface)
+
+        Args:
+            dimension: Dimensão do recorte
+            value: Valor do grupo (ex.: nome do Responsável)
+        """
+        if dimension not in self._counts:
+            return {}
+        categories = self._categories[dimension]
+        index = categories.get_loc(value) if value in categories else len(categories)
+        row = self._counts[dimension][index]
+        result = dict(zip(STATUS_COLUMNS, (int(v) for v in row)))
+        result['pending'] = result['total'] - result['completed'] - result['skipped']
+        return result
+
+    def duplicate_codes(self, min_count: int = 2) -> Dict[str, int]:
+        """
+        Retorna os códigos usados em mais de uma posição
+
+        Args:
+            min_count: Usos mínimos para listar
+
+        Returns:
+            Dicionário {código: usos}, do mais usado para o menos usado
+        """
+        return {code: count for code, count in self.code_counts.most_common() if count >= min_count}
+
+
+def format_breakdown(df: pd.DataFrame, limit: int = 15) -> str:
+    """Formata um recorte de OutputStats.breakdown para o terminal"""
+    lines = []
+    for row in df.head(limit).itertuples():
+        lines.append(
+            f"   {str(row.Index)[:30]:<30} {row.completed:>6}/{row.total:<6} "
+            f"({row.percent:5.1f}%)  parciais: {row.partial}  puladas: {row.skipped}"
+        )
+    if len(df) > limit:
+        lines.append(f"   ... e mais {len(df) - limit} grupos")
+    return '\n'.join(lines)
+
+
+# Uso pela linha de comando: python src/output_stats.py [dimensão]
+if __name__ == "__main__":
+    try:
+        from .file_manager import FileManager
+    except ImportError:
+        from file_manager import FileManager
+
+    fm = FileManager("Base_Fazer.csv")
+    summary = fm.get_stats_summary()
+    print(f"\nTotal: {summary['total']}  Completos: {summary['completed']}  "
+          f"Parciais: {summary['partial']}  Puladas: {summary['skipped']}  Pendentes: {summary['pending']}")
+    print(f"Códigos únicos: {summary['unique_codes']}  Repetidos: {summary['duplicated_codes']}")
+
+    for dimension in (sys.argv[1:] or STAT_DIMENSIONS):
+        print(f"\n{dimension}:")
+        print(format_breakdown(fm.get_stats_breakdown(dimension)))
+    fm.close()
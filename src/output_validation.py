@@ -0,0 +1,241 @@
+"""
+Módulo de validação do arquivo de saída contra o catálogo (Itens_Ativos)
+Converte a saída para o formato longo e executa todas as verificações como
+joins vetorizados pelo cod_produto, gerando um relatório em JSON; também
+encontra os preços salvos desatualizados para a atualização em lote
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .output_export import parse_price_cents
+except ImportError:
+    from output_export import parse_price_cents
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Verificações (chaves do relatório)
+CHECKS = {
+    'fora_do_catalogo': 'Substituto não existe mais em Itens_Ativos',
+    'preco_desatualizado': 'Preço salvo vazio ou diferente do preço atual do catálogo',
+    'duplicado_na_linha': 'Mesmo substituto repetido na iteração',
+    'igual_ao_original': 'Substituto igual ao cod_produto original',
+}
+
+ISSUE_COLUMNS = ['check', 'n_iteracao', 'rank', 'cod_produto', 'price_cents', 'catalog_price_cents']
+
+# Loja padrão dos preços salvos (a mesma do DataProcessor)
+DEFAULT_PRICE_STORE = 'loja_programada'
+
+
+def normalize_codes(codes: pd.Series) -> pd.Series:
+    """Normaliza códigos para comparação (texto, sem espaços, 123.0 -> 123)"""
+    text = codes.astype(object).where(codes.notna(), '').astype(str).str.strip()
+    return text.str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+
+
+def load_catalog(itens_ativos_path: str) -> pd.DataFrame:
+    """
+    Lê só as colunas do catálogo usadas na validação
+
+    Args:
+        itens_ativos_path: Caminho de Itens_Ativos.csv
+
+    Returns:
+        DataFrame com cod_produto e as colunas de preço (preco_<loja>)
+    """
+    return pd.read_csv(itens_ativos_path, usecols=lambda c: c == 'cod_produto' or c.startswith('preco_'))
+
+
+def store_catalog(catalog, store: Optional[str] = None) -> pd.DataFrame:
+    """
+    Catálogo com o preço de uma loja na coluna preco_loja_programada
+
+    Os preços salvos vêm da loja usada nas buscas (PRICE_STORE); validar ou
+    atualizar contra outra loja marcaria todos como desatualizados.
+
+    Args:
+        catalog: DataFrame de Itens_Ativos (colunas preco_<loja>) ou
+                 CatalogSnapshot do DataProcessor (inclui lojas de arquivos)
+        store: Loja (padrão: variável PRICE_STORE ou loja_programada)
+
+    Returns:
+        DataFrame com cod_produto e preco_loja_programada
+    """
+    store = store or os.getenv("PRICE_STORE", DEFAULT_PRICE_STORE)
+    if hasattr(catalog, 'store_prices'):
+        return pd.DataFrame({
+            'cod_produto': catalog.codes.to_numpy(),
+            'preco_loja_programada': catalog.store_prices(store, np.arange(len(catalog))),
+        })
+
+    column = f'preco_{store}'
+    if column not in catalog.columns:
+        raise ValueError(f"Catálogo sem preço da loja {store} (coluna {column}); use o snapshot do DataProcessor")
+    return pd.DataFrame({
+        'cod_produto': catalog['cod_produto'].to_numpy(),
+        'preco_loja_programada': catalog[column].to_numpy(),
+    })
+
+
+def catalog_index(catalog: pd.DataFrame) -> pd.DataFrame:
+    """
+    Índice do catálogo por código (primeira ocorrência, como no DataProcessor)
+
+    Returns:
+        DataFrame indexado por cod_key com catalog_price (texto) e catalog_price_cents
+    """
+    index = pd.DataFrame({
+        'cod_key': normalize_codes(catalog['cod_produto']),
+        'catalog_price': catalog['preco_loja_programada'].to_numpy(),
+        'catalog_price_cents': parse_price_cents(catalog['preco_loja_programada']),
+    })
+    index = index[index['cod_key'] != '']
+    return index.drop_duplicates('cod_key', keep='first').set_index('cod_key')
+
+
+def validate_substitutes(
+    long_df: pd.DataFrame,
+    originals: pd.DataFrame,
+    catalog: pd.DataFrame,
+    price_tolerance_cents: int = 0
+) -> Dict:
+    """
+    Executa todas as verificações de uma vez (vetorizado)
+
+    Args:
+        long_df: Saída no formato longo (n_iteracao, rank, cod_produto, price_cents)
+        originals: n_iteracao e cod_produto da Base_Fazer
+        catalog: Itens_Ativos (cod_produto, preco_loja_programada)
+        price_tolerance_cents: Diferença de preço tolerada
+
+    Returns:
+        Relatório: {'gerado_em', 'resumo': {...}, 'problemas': [...]}
+    """
+    index = catalog_index(catalog)
+
+    subs = long_df[['n_iteracao', 'rank', 'cod_produto', 'price_cents']].copy()
+    subs['cod_key'] = normalize_codes(subs['cod_produto'])
+    subs = subs.join(index, on='cod_key')
+
+    original_keys = pd.Series(
+        normalize_codes(originals['cod_produto']).to_numpy(),
+        index=originals['n_iteracao'].to_numpy()
+    )
+    original_keys = original_keys[~original_keys.index.duplicated()]
+    subs['original_key'] = subs['n_iteracao'].map(original_keys)
+
+    in_catalog = subs['cod_key'].isin(index.index)
+    price_diff = (subs['price_cents'] - subs['catalog_price_cents']).abs()
+    # Preço salvo vazio conta como desatualizado se o catálogo tem preço (como em price_changes)
+    missing_price = subs['price_cents'].isna() & subs['catalog_price_cents'].notna()
+
+    masks = {
+        'fora_do_catalogo': ~in_catalog,
+        'preco_desatualizado': in_catalog & ((price_diff > price_tolerance_cents).fillna(False).astype(bool) | missing_price),
+        'duplicado_na_linha': subs.duplicated(['n_iteracao', 'cod_key'], keep='first'),
+        'igual_ao_original': subs['cod_key'] == subs['original_key'],
+    }
+
+    frames = []
+    for check, mask in masks.items():
+        flagged = subs.loc[mask, ISSUE_COLUMNS[1:]]
+        frames.append(flagged.assign(check=check)[ISSUE_COLUMNS])
+    issues = pd.concat(frames, ignore_index=True).sort_values(['n_iteracao', 'rank', 'check'], kind='stable')
+
+    summary = {check: int(mask.sum()) for check, mask in masks.items()}
+    summary.update({
+        'substitutos': len(subs),
+        'iteracoes': int(subs['n_iteracao'].nunique()),
+        'iteracoes_com_problema': int(issues['n_iteracao'].nunique()),
+        'problemas': len(issues),
+    })
+
+    # Int64 com NA não é serializável em JSON
+    records = issues.astype(object).where(issues.notna(), None).to_dict('records')
+
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'verificacoes': CHECKS,
+        'resumo': summary,
+        'problemas': records,
+    }
+
+
+def price_changes(subs_long: pd.DataFrame, catalog: pd.DataFrame) -> pd.DataFrame:
+    """
+    Encontra os substitutos cujo preço salvo difere do preço atual do catálogo (vetorizado)
+
+    Args:
+        subs_long: n_iteracao, rank, cod_produto e preco (texto salvo); outras
+                   colunas são repassadas ao resultado
+        catalog: Itens_Ativos (cod_produto, preco_loja_programada)
+
+    Returns:
+        Linhas alteradas com preco_antigo e preco_novo (texto do catálogo).
+        Códigos fora do catálogo ou sem preço válido no catálogo são mantidos.
+    """
+    index = catalog_index(catalog)
+
+    df = subs_long.copy()
+    df['cod_key'] = normalize_codes(df['cod_produto'])
+    df = df.join(index, on='cod_key')
+
+    stored_cents = parse_price_cents(df['preco'])
+    changed = df['catalog_price_cents'].notna() & stored_cents.ne(df['catalog_price_cents']).fillna(True)
+
+    result = df[changed.astype(bool)].rename(columns={'preco': 'preco_antigo', 'catalog_price': 'preco_novo'})
+    return result.drop(columns=['cod_key', 'catalog_price_cents'])
+
+
+def write_report(report: Dict, path: Optional[str] = None) -> str:
+    """
+    Grava o relatório em JSON (escrita atômica)
+
+    Args:
+        report: Resultado de validate_substitutes
+        path: Destino (padrão: data/validacao.json)
+
+    Returns:
+        Caminho gravado
+    """
+    path = path or "data/validacao.json"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=int)
+    os.replace(tmp_path, path)
+    logging.info(f"Relatório de validação: {report['resumo']['problemas']} problemas em {path}")
+    return path
+
+
+# Uso pela linha de comando: python src/output_validation.py
+if __name__ == "__main__":
+    try:
+        from .file_manager import read_saved_long
+    except ImportError:
+        from file_manager import read_saved_long
+
+    # Somente leitura: um FileManager criaria saída, journal e backups
+    # (e reservaria faixas com REVIEWER definido)
+    originals = pd.read_csv("Base_Fazer.csv", skiprows=1, usecols=['n_iteracao', 'cod_produto'])
+    report = validate_substitutes(read_saved_long(), originals, store_catalog(load_catalog("Itens_Ativos.csv")))
+
+    for key, value in report['resumo'].items():
+        print(f"{key}: {value}")
+    print(f"\nRelatório: {write_report(report)}")
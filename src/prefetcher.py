@@ -0,0 +1,185 @@
+"""
+Módulo de pré-carregamento (prefetch) das próximas iterações
+Gera termos com IA e executa a busca das iterações seguintes em segundo plano
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError
+from typing import Callable, Dict, List, Optional
+
+# Logger do módulo: segue a configuração de quem usa o prefetcher (ex.: ui.log)
+logger = logging.getLogger(__name__)
+
+
+class IterationPrefetcher:
+    """Pré-carrega resultados das próximas K iterações em segundo plano"""
+
+    def __init__(
+        self,
+        fetch_fn: Callable[[int, Callable[[], bool]], Optional[List[Dict]]],
+        lookahead: int = 3,
+        max_workers: int = 2,
+        max_cached: int = 50
+    ):
+        """
+        Inicializa o prefetcher
+
+        Args:
+            fetch_fn: Função (n_iteracao, is_obsolete) -> lista de resultados ou None.
+                      Deve consultar is_obsolete() entre etapas caras para abortar cedo.
+            lookahead: Quantas iterações à frente pré-carregar (0 desativa)
+            max_workers: Threads simultâneas de pré-carregamento
+            max_cached: Máximo de resultados prontos mantidos em memória
+        """
+        self.fetch_fn = fetch_fn
+        self.lookahead = max(0, lookahead)
+        self.max_cached = max_cached
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix='prefetch'
+        )
+        self._lock = threading.Lock()
+        self._futures: Dict[int, Future] = {}
+        self._results: "OrderedDict[int, List[Dict]]" = OrderedDict()
+        self._window = set()
+        # Incrementada por clear(): trabalhos de gerações anteriores são obsoletos
+        self._generation = 0
+        self._closed = False
+
+    def schedule(self, current_iteration: int, max_iteration: int = None):
+        """
+        Agenda o pré-carregamento das iterações seguintes à atual
+
+        Cancela trabalhos pendentes fora da nova janela (ex: quando o
+        revisor pula para outra faixa de iterações).
+
+        Args:
+            current_iteration: Iteração exibida agora
+            max_iteration: Última iteração existente (opcional)
+        """
+        if self.lookahead == 0 or self._closed:
+            return
+
+        last = current_iteration + self.lookahead
+        if max_iteration is not None:
+            last = min(last, max_iteration)
+        targets = list(range(current_iteration + 1, last + 1))
+
+        with self._lock:
+            # A iteração atual continua na janela: se já está sendo
+            # carregada, o take() aproveita o trabalho em andamento
+            self._window = set(targets) | {current_iteration}
+
+            # Cancelar trabalhos obsoletos
+            for n in list(self._futures):
+                if n not in self._window:
+                    self._futures.pop(n).cancel()
+                    logger.info(f"Prefetch cancelado para iteração {n}")
+
+            for n in list(self._results):
+                if n not in self._window:
+                    del self._results[n]
+
+            for n in targets:
+                if n in self._results or n in self._futures:
+                    continue
+                self._futures[n] = self._executor.submit(self._run, n, self._generation)
+
+    def _is_obsolete(self, n_iteracao: int, generation: int) -> bool:
+        """Indica se a iteração saiu da janela de interesse ou foi descartada por clear()"""
+        return self._closed or generation != self._generation or n_iteracao not in self._window
+
+    def _run(self, n_iteracao: int, generation: int) -> Optional[List[Dict]]:
+        """Executa o pré-carregamento de uma iteração (em thread de fundo)"""
+        if self._is_obsolete(n_iteracao, generation):
+            return None
+
+        try:
+            results = self.fetch_fn(n_iteracao, lambda: self._is_obsolete(n_iteracao, generation))
+        except Exception as e:
+            logger.error(f"Erro no prefetch da iteração {n_iteracao}: {e}")
+            results = None
+
+        with self._lock:
+            if generation != self._generation:
+                # Carregado com dados de antes do clear(): descartar
+                logger.info(f"Prefetch descartado para iteração {n_iteracao} (resultados anteriores ao clear)")
+                return None
+
+            self._futures.pop(n_iteracao, None)
+
+            if results is not None and not self._is_obsolete(n_iteracao, generation):
+                self._results[n_iteracao] = results
+
+                # Limitar memória usada pelos resultados prontos
+                while len(self._results) > self.max_cached:
+                    self._results.popitem(last=False)
+
+                logger.info(f"Prefetch concluído para iteração {n_iteracao}: {len(results)} resultados")
+
+        return results
+
+    def take(self, n_iteracao: int, timeout: float = None) -> Optional[List[Dict]]:
+        """
+        Retorna (e consome) o resultado pré-carregado de uma iteração
+
+        Se o pré-carregamento ainda estiver em andamento, aguarda até timeout
+        segundos em vez de refazer o trabalho.
+
+        Args:
+            n_iteracao: Número da iteração
+            timeout: Tempo máximo de espera em segundos (None = sem limite)
+
+        Returns:
+            Lista de resultados ou None se não houver pré-carregamento
+        """
+        with self._lock:
+            if n_iteracao in self._results:
+                return self._results.pop(n_iteracao)
+            future = self._futures.get(n_iteracao)
+
+        if future is None:
+            return None
+
+        try:
+            results = future.result(timeout=timeout)
+        except (CancelledError, Exception):
+            return None
+
+        with self._lock:
+            self._results.pop(n_iteracao, None)
+
+        return results
+
+    def invalidate(self, n_iteracao: int):
+        """Descarta o resultado pré-carregado de uma iteração"""
+        with self._lock:
+            self._results.pop(n_iteracao, None)
+
+    def clear(self):
+        """
+        Descarta todos os resultados pré-carregados (ex.: catálogo recarregado)
+
+        Trabalhos em andamento passam a ser obsoletos: o resultado deles é
+        descartado e o próximo schedule() agenda as iterações de novo.
+        """
+        with self._lock:
+            self._generation += 1
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._results.clear()
+
+    def shutdown(self):
+        """Cancela trabalhos pendentes e encerra as threads"""
+        with self._lock:
+            self._closed = True
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._results.clear()
+
+        self._executor.shutdown(wait=False)
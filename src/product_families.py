@@ -0,0 +1,266 @@
+"""
+Módulo de detecção de famílias de produtos
+Agrupa produtos estruturalmente iguais (variações de marca, sabor ou gramatura)
+para que a IA seja chamada uma única vez por família
+"""
+
+import re
+import logging
+from typing import Dict, Iterable, List, Tuple
+from pathlib import Path
+
+try:
+    from .data_processor import DataProcessor
+except ImportError:
+    from data_processor import DataProcessor
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'ai_agent.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Gramaturas e quantidades (texto já normalizado): "200g", "1 5l", "c 12un", "c 10"
+SIZE_PATTERN = re.compile(
+    r'\b(?:c )?\d+(?: \d+)?\s?(?:kg|g|mg|ml|l|un|unid|unidades)\b|\bc \d+\b'
+)
+
+# Palavras de ligação ignoradas na comparação de nomes
+STOPWORDS = {'de', 'do', 'da', 'dos', 'das', 'com', 'e', 'em', 'a', 'o', 'ao', 'na', 'no', 'c'}
+
+# Subcategorias que equivalem a "sem subcategoria" na Base_Fazer
+EMPTY_CATEGORIES = {'', '0', 'NAN'}
+
+
+class ProductFamily:
+    """Grupo de produtos que compartilham a mesma estrutura de nome"""
+
+    def __init__(self, representative: str, core_tokens: List[str], representative_item: Dict = None):
+        """
+        Inicializa a família
+
+        Args:
+            representative: Nome do produto usado na chamada à IA
+            core_tokens: Tokens descritivos (sem gramatura nem fornecedor) do representante
+            representative_item: Dados do representante (cod_produto, preço)
+        """
+        self.representative = representative
+        self.core_tokens = core_tokens
+        self.representative_item: Dict = dict(representative_item or {'nome': representative})
+        self.members: List[str] = [representative]
+
+    @property
+    def representative_price(self) -> str:
+        """Preço do representante enviado à IA junto com o nome ('' se desconhecido)"""
+        price = self.representative_item.get('preco_loja_programada', '')
+        return '' if price is None else str(price)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __repr__(self) -> str:
+        return f"ProductFamily({self.representative!r}, {len(self.members)} membros)"
+
+
+def split_name(name: str) -> Tuple[List[str], List[str]]:
+    """
+    Separa o nome normalizado em tokens principais e tokens de gramatura
+
+    Args:
+        name: Nome do produto
+
+    Returns:
+        (tokens principais, gramaturas encontradas)
+    """
+    normalized = DataProcessor.normalize_text(str(name))
+    sizes = [m.group(0) for m in SIZE_PATTERN.finditer(normalized)]
+    core = SIZE_PATTERN.sub(' ', normalized).split()
+    return core, sizes
+
+
+def _variant_tokens(rep_core: List[str], member_core: List[str]) -> Tuple[List[str], List[str]]:
+    """Retorna os tokens exclusivos do representante e do membro (em ordem)"""
+    rep_set = set(rep_core)
+    member_set = set(member_core)
+    rep_only = [t for t in rep_core if t not in member_set]
+    member_only = [t for t in member_core if t not in rep_set]
+    return rep_only, member_only
+
+
+def descriptive_tokens(core: List[str], supplier: str = '') -> List[str]:
+    """
+    Remove dos tokens principais as palavras de ligação e as do fornecedor
+
+    Nomes como "MINI PÃO BRIOCHE GALERIA DOS PÃES" repetem a marca em todos
+    os produtos do fornecedor; sem removê-la, produtos diferentes da mesma
+    marca parecem variações uns dos outros.
+
+    Args:
+        core: Tokens principais (de split_name)
+        supplier: Nome do fornecedor
+
+    Returns:
+        Tokens que descrevem o produto, na ordem do nome
+    """
+    supplier_tokens = set(DataProcessor.normalize_text(str(supplier or '')).split())
+    return [t for t in core if t not in STOPWORDS and t not in supplier_tokens]
+
+
+def detect_families(
+    items: Iterable[Dict],
+    min_shared: float = 0.7,
+    max_variant_tokens: int = 2,
+    max_family_size: int = 8
+) -> List[ProductFamily]:
+    """
+    Agrupa produtos com a mesma estrutura de nome
+
+    Produtos só são comparados dentro do mesmo bloco (Fornecedor +
+    Subcategoria + núcleo do nome, as duas primeiras palavras descritivas)
+    e entram na família do primeiro representante com quem compartilham
+    pelo menos min_shared dos tokens descritivos, diferindo em no máximo
+    max_variant_tokens tokens de cada lado. Palavras do fornecedor não
+    contam como tokens em comum.
+
+    Args:
+        items: Dicts com 'nome' (e opcionalmente 'Fornecedor', 'Subcategoria'
+            e 'preco_loja_programada')
+        min_shared: Fração mínima de tokens descritivos em comum (0-1)
+        max_variant_tokens: Máximo de tokens exclusivos de cada lado
+        max_family_size: Máximo de produtos por família
+
+    Returns:
+        Lista de famílias (inclusive as de um único produto)
+    """
+    blocks: Dict[Tuple, List[ProductFamily]] = {}
+    families: List[ProductFamily] = []
+    seen = set()
+
+    for item in items:
+        name = str(item.get('nome', '') or '').strip()
+        if not name or name.lower() in seen:
+            continue
+        seen.add(name.lower())
+
+        supplier = str(item.get('Fornecedor', '') or '').strip()
+        core = descriptive_tokens(split_name(name)[0], supplier)
+        if not core:
+            continue
+
+        category = str(item.get('Subcategoria', '') or '').strip().upper()
+        if category in EMPTY_CATEGORIES:
+            category = ''
+
+        block_key = (supplier.upper(), category, tuple(core[:2]))
+        candidates = blocks.setdefault(block_key, [])
+
+        for family in candidates:
+            if len(family) >= max_family_size:
+                continue
+            rep_only, member_only = _variant_tokens(family.core_tokens, core)
+            shared = len(set(core) & set(family.core_tokens))
+            if (
+                shared / max(len(set(core)), len(set(family.core_tokens))) >= min_shared
+                and len(rep_only) <= max_variant_tokens
+                and len(member_only) <= max_variant_tokens
+            ):
+                family.members.append(name)
+                break
+        else:
+            family = ProductFamily(name, core, item)
+            candidates.append(family)
+            families.append(family)
+
+    grouped = sum(len(f) for f in families if len(f) > 1)
+    logging.info(f"Famílias detectadas: {len(families)} para {len(seen)} produtos ({grouped} em famílias)")
+    return families
+
+
+def derive_terms(representative: str, representative_terms: List[str], member: str) -> List[str]:
+    """
+    Deriva os termos de um membro a partir dos termos do representante,
+    trocando os tokens de variante (marca, sabor) e a gramatura
+
+    Args:
+        representative: Nome do representante da família
+        representative_terms: Termos gerados pela IA para o representante
+        member: Nome do membro
+
+    Returns:
+        Lista com 5 termos para o membro
+    """
+    rep_core, rep_sizes = split_name(representative)
+    member_core, member_sizes = split_name(member)
+    rep_only, member_only = _variant_tokens(rep_core, member_core)
+
+    rep_size_tokens = {t for size in rep_sizes for t in size.split()}
+    member_size = member_sizes[0] if member_sizes else ''
+
+    # Sem variante a substituir, os tokens do membro entram após a palavra
+    # que os precede no nome do membro ("queijo ralado" -> "queijo ralado parmesao")
+    anchor = None
+    if member_only:
+        preceding = member_core[:member_core.index(member_only[0])]
+        anchor = next((t for t in reversed(preceding) if t not in STOPWORDS), None)
+
+    derived = []
+    variant_used = False
+    for term in representative_terms:
+        tokens = DataProcessor.normalize_text(term).split()
+        new_tokens = []
+        variant_done = False
+        size_done = False
+
+        for token in tokens:
+            if token in rep_only:
+                # Substituir o bloco de variante do representante uma única vez
+                if not variant_done:
+                    new_tokens.extend(member_only)
+                    variant_done = True
+            elif token in rep_size_tokens or SIZE_PATTERN.fullmatch(token):
+                if not size_done and member_size:
+                    new_tokens.append(member_size)
+                size_done = True
+            else:
+                new_tokens.append(token)
+                if not rep_only and not variant_done and token == anchor:
+                    new_tokens.extend(member_only)
+                    variant_done = True
+
+        variant_used = variant_used or (variant_done and bool(member_only))
+        new_term = ' '.join(new_tokens)
+        if new_term:
+            derived.append(new_term)
+
+    if not derived:
+        return []
+
+    # Nenhum termo tinha onde encaixar a variante: o mais específico a recebe
+    if member_only and not variant_used:
+        derived[0] = ' '.join([derived[0]] + member_only)
+
+    while len(derived) < 5:
+        derived.append(derived[-1])
+    return derived[:5]
+
+
+# Teste rápido
+if __name__ == "__main__":
+    produtos = [
+        {'nome': 'IOGURTE PROBIÓTICO ACTIVIA MORANGO 170G', 'Fornecedor': 'DANONE'},
+        {'nome': 'IOGURTE PROBIÓTICO ACTIVIA AMEIXA 170G', 'Fornecedor': 'DANONE'},
+        {'nome': 'IOGURTE PROBIÓTICO ACTIVIA MORANGO 800G', 'Fornecedor': 'DANONE'},
+        {'nome': 'OVO BRANCO MANTIQUEIRA C/ 12UN', 'Fornecedor': 'MANTIQUEIRA'},
+        {'nome': 'OVO BRANCO MANTIQUEIRA C/ 30UN', 'Fornecedor': 'MANTIQUEIRA'},
+    ]
+
+    for family in detect_families(produtos):
+        print(f"\n{family}")
+        for member in family.members:
+            print(f"   • {member}")
+
+    termos = ['iogurte probiotico activia morango 170g', 'iogurte activia morango', 'iogurte probiotico', 'iogurte', 'iogurte']
+    print(derive_terms(produtos[0]['nome'], termos, produtos[1]['nome']))
@@ -0,0 +1,187 @@
+"""
+Módulo de gravação em segundo plano
+Recebe intenções de salvamento em uma fila, agrupa salvamentos próximos
+(a mesma iteração salva várias vezes vira uma só gravação) e grava em lote
+fora da thread da interface
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+from pathlib import Path
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Modos de durabilidade
+#   sync      - save_substitutes só retorna depois do fsync (sem thread de fundo)
+#   journal   - retorna na hora; a thread grava assim que possível (lote = o que acumulou)
+#   debounced - retorna na hora; a thread espera `debounce` segundos sem novos
+#               salvamentos (no máximo 5x isso) e grava tudo em um lote
+DURABILITY_MODES = ('sync', 'journal', 'debounced')
+
+
+class SaveWriter:
+    """Thread de gravação com fila, coalescência por iteração e debounce"""
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Tuple[int, List[Dict]]]], None],
+        mode: str = "journal",
+        debounce: float = 0.3,
+        retry_delay: float = 1.0
+    ):
+        """
+        Inicializa e inicia a thread
+
+        Args:
+            write_batch: Função que grava uma lista de (n_iteracao, substitutos)
+            mode: "journal" ou "debounced"
+            debounce: Janela de agrupamento em segundos (modo debounced)
+            retry_delay: Espera antes de tentar de novo um lote que falhou
+        """
+        if mode not in ('journal', 'debounced'):
+            raise ValueError(f"Modo de gravação em segundo plano inválido: {mode}")
+
+        self.write_batch = write_batch
+        self.mode = mode
+        self.debounce = debounce
+        self.retry_delay = retry_delay
+
+        self._pending: "OrderedDict[int, List[Dict]]" = OrderedDict()
+        self._first_at = 0.0
+        self._last_at = 0.0
+        self._writing = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self.written_batches = 0
+        self.coalesced = 0
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, n_iteracao: int, substitutes: List[Dict]):
+        """
+        Enfileira um salvamento (não bloqueia)
+
+        Args:
+            n_iteracao: Número da iteração
+            substitutes: Substitutos a gravar (substitui um salvamento pendente da mesma iteração)
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SaveWriter encerrado")
+
+            now = time.monotonic()
+            if not self._pending:
+                self._first_at = now
+            if n_iteracao in self._pending:
+                self.coalesced += 1
+                del self._pending[n_iteracao]
+            self._pending[n_iteracao] = substitutes
+            self._last_at = now
+            self._cond.notify_all()
+
+    def pending_count(self) -> int:
+        """Salvamentos enfileirados ainda não gravados"""
+        with self._cond:
+            return len(self._pending) + (1 if self._writing else 0)
+
+    def _ready(self, now: float) -> bool:
+        """Verifica se o lote pendente já deve ser gravado"""
+        if self._closed or self.mode == 'journal':
+            return True
+        return now - self._last_at >= self.debounce or now - self._first_at >= self.debounce * 5
+
+    def _run(self):
+        """Loop da thread: espera, agrupa e grava"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+
+                now = time.monotonic()
+                while not self._ready(now):
+                    deadline = min(self._last_at + self.debounce, self._first_at + self.debounce * 5)
+                    self._cond.wait(max(0.0, deadline - now))
+                    now = time.monotonic()
+
+                batch = list(self._pending.items())
+                self._pending.clear()
+                self._writing = True
+
+            try:
+                self.write_batch(batch)
+                self.written_batches += 1
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                logging.error(f"Erro na gravação em segundo plano ({len(batch)} itens): {e}")
+                with self._cond:
+                    # Devolver à fila o que não foi sobrescrito por um salvamento mais novo
+                    for n_iteracao, substitutes in reversed(batch):
+                        if n_iteracao not in self._pending:
+                            self._pending[n_iteracao] = substitutes
+                            self._pending.move_to_end(n_iteracao, last=False)
+                    self._first_at = self._last_at = time.monotonic()
+                if not self._closed:
+                    time.sleep(self.retry_delay)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+            if self._closed and self.last_error is not None:
+                # No encerramento não insistir indefinidamente
+                logging.error(f"Encerrando com {self.pending_count()} salvamentos não gravados")
+                return
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Bloqueia até a fila esvaziar
+
+        Args:
+            timeout: Tempo máximo em segundos (None = sem limite)
+
+        Returns:
+            True se tudo foi gravado
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # Gravar já, sem esperar o debounce
+            self._first_at = self._last_at = 0.0
+            self._cond.notify_all()
+            while self._pending or self._writing:
+                if not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 0.5)
+        return self.last_error is None
+
+    def close(self, timeout: float = None) -> bool:
+        """
+        Grava o que estiver pendente e encerra a thread
+
+        Returns:
+            True se tudo foi gravado
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            return not self._pending and self.last_error is None
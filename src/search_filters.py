@@ -0,0 +1,221 @@
+"""
+Módulo de pré-filtros da busca
+Mantém, por snapshot do catálogo, arrays prontos para cada dimensão de filtro
+(máscaras por prefixo de código, arrays ordenados de preço e gramatura,
+postings de tokens do nome) e os combina em uma máscara de candidatos antes
+da busca por termos - com filtro, a busca percorre menos linhas
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .catalog_file import SIZE_UNITS, UNIT_FACTORS
+except ImportError:
+    from catalog_file import SIZE_UNITS, UNIT_FACTORS
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'data_processor.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Chaves aceitas em filters (ver parse_filter_expression)
+FILTER_KEYS = ('prefix', 'price', 'size', 'exclude')
+
+# Prefixo do código: letras iniciais ("SHOP01" -> "SHOP", "KDB123" -> "KDB")
+CODE_PREFIX = re.compile(r'^([A-Za-z]+)')
+
+# Expressões na busca manual: preco:5-20  tamanho:100-500g  prefixo:SHOP,KDB  -marca
+# (só no início de uma palavra: "coca-cola" e "semi-desnatado" continuam no termo)
+EXPRESSION_TOKEN = re.compile(r'(?:(?<=\s)|^)(?:(preco|tamanho|prefixo|sem):(\S+)|-(\S+))', re.IGNORECASE)
+SIZE_BOUND = re.compile(r'^([\d.,]*)-?([\d.,]*)\s*(kg|g|ml|l|un)?$', re.IGNORECASE)
+
+
+def _to_number(text: str) -> Optional[float]:
+    """'10,5' / '10.5' -> 10.5; vazio -> None"""
+    text = text.strip()
+    return float(text.replace(',', '.')) if text else None
+
+
+def parse_filter_expression(text: str) -> Tuple[str, Dict]:
+    """
+    Separa os filtros digitados junto com o termo de busca
+
+    Exemplo: "queijo ralado preco:5-20 tamanho:40-100g prefixo:SHOP -tirolez"
+    Filtros com valor inválido (ex: "preco:abc") são ignorados.
+
+    Args:
+        text: Texto digitado
+
+    Returns:
+        (termo sem os filtros, dicionário de filtros para search_products)
+    """
+    filters: Dict = {}
+
+    def collect(match: re.Match) -> str:
+        key, value, excluded = match.group(1), match.group(2), match.group(3)
+        if excluded:
+            filters.setdefault('exclude', []).append(excluded)
+            return ' '
+        key = key.lower()
+        if key == 'prefixo':
+            filters['prefix'] = [p for p in value.upper().split(',') if p]
+        elif key == 'sem':
+            filters.setdefault('exclude', []).extend(v for v in value.split(',') if v)
+        elif key == 'preco':
+            # Sem "-": valor exato; "5-" e "-20" deixam um lado aberto
+            low, dash, high = value.partition('-')
+            try:
+                filters['price'] = (_to_number(low), _to_number(high if dash else low))
+            except ValueError:
+                logging.warning(f"Filtro de preço ignorado: {match.group(0)}")
+        else:
+            bound = SIZE_BOUND.match(value)
+            try:
+                if not bound:
+                    raise ValueError(value)
+                low, high, unit = bound.groups()
+                if '-' not in value:
+                    high = low
+                filters['size'] = (_to_number(low), _to_number(high), unit.lower() if unit else None)
+            except ValueError:
+                logging.warning(f"Filtro de tamanho ignorado: {match.group(0)}")
+        return ' '
+
+    remaining = EXPRESSION_TOKEN.sub(collect, text)
+    return re.sub(r'\s+', ' ', remaining).strip(), filters
+
+
+class FilterIndex:
+    """Arrays de filtro de um snapshot (montados sob demanda, uma vez por dimensão)"""
+
+    def __init__(self, snapshot):
+        """
+        Args:
+            snapshot: CatalogSnapshot dono dos arrays
+        """
+        self._snapshot = snapshot
+        self._size = len(snapshot)
+        self._prefix_codes: Optional[np.ndarray] = None
+        self._prefix_masks: Dict[str, np.ndarray] = {}
+        self._sorted_prices: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._sorted_sizes: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._postings: Optional[Dict[str, np.ndarray]] = None
+
+    def prefix_mask(self, prefixes: List[str]) -> np.ndarray:
+        """Linhas cujo cod_produto começa com um dos prefixos (máscara por prefixo, em cache)"""
+        if self._prefix_codes is None:
+            codes = pd.Series(self._snapshot.codes.to_numpy(), dtype=object).astype(str)
+            self._prefix_codes = codes.str.extract(CODE_PREFIX, expand=False).str.upper().fillna('').to_numpy()
+
+        mask = np.zeros(self._size, dtype=bool)
+        for prefix in prefixes:
+            prefix = prefix.upper()
+            if prefix not in self._prefix_masks:
+                self._prefix_masks[prefix] = self._prefix_codes == prefix
+            mask |= self._prefix_masks[prefix]
+        return mask
+
+    @staticmethod
+    def _range_mask(order: np.ndarray, values: np.ndarray, size: int, low, high) -> np.ndarray:
+        """Máscara de um intervalo fechado a partir de um array ordenado (searchsorted)"""
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        mask = np.zeros(size, dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def price_mask(self, store: str, low: float = None, high: float = None) -> np.ndarray:
+        """Linhas com preço da loja entre low e high (em reais; sem preço ficam de fora)"""
+        if store not in self._sorted_prices:
+            cents = np.asarray(self._snapshot.store_cents(store))
+            valid = np.flatnonzero(cents >= 0)
+            order = valid[np.argsort(cents[valid], kind='stable')]
+            self._sorted_prices[store] = (order, cents[order])
+        order, values = self._sorted_prices[store]
+        low, high = (_to_number(v) if isinstance(v, str) else v for v in (low, high))
+        low = None if low is None else int(round(low * 100))
+        high = None if high is None else int(round(high * 100))
+        return self._range_mask(order, values, self._size, low, high)
+
+    def size_mask(self, low: float = None, high: float = None, unit: str = None) -> np.ndarray:
+        """Linhas com gramatura entre low e high (kg/l convertidos para g/ml)"""
+        if self._sorted_sizes is None:
+            sizes, units = self._snapshot.size_arrays()
+            valid = np.flatnonzero(~np.isnan(sizes))
+            order = valid[np.argsort(sizes[valid], kind='stable')]
+            self._sorted_sizes = (order, sizes[order], np.asarray(units))
+
+        order, values, units = self._sorted_sizes
+        factor = UNIT_FACTORS[unit][1] if unit else 1.0
+        mask = self._range_mask(
+            order, values, self._size,
+            None if low is None else low * factor,
+            None if high is None else high * factor
+        )
+        if unit:
+            # Evita comparar 500 g com 500 ml
+            mask &= units == SIZE_UNITS[UNIT_FACTORS[unit][0]]
+        return mask
+
+    def token_mask(self, tokens: List[str]) -> np.ndarray:
+        """Linhas cujo nome contém algum dos tokens inteiros (postings por token)"""
+        if self._postings is None:
+            names = pd.Series(self._snapshot.names().to_numpy(), dtype=object).fillna('').str.split()
+            exploded = names.explode().dropna()
+            self._postings = {
+                token: positions.to_numpy(dtype=np.int64)
+                for token, positions in pd.Series(exploded.index, index=exploded.to_numpy()).groupby(level=0)
+            }
+
+        mask = np.zeros(self._size, dtype=bool)
+        for token in tokens:
+            # Marca com várias palavras: todas precisam estar no nome
+            matched = None
+            for part in token.split():
+                found = np.zeros(self._size, dtype=bool)
+                found[self._postings.get(part, np.empty(0, dtype=np.int64))] = True
+                matched = found if matched is None else matched & found
+            if matched is not None:
+                mask |= matched
+        return mask
+
+    def mask(self, filters: Optional[Dict], store: str, normalize=None) -> Optional[np.ndarray]:
+        """
+        Intersecta os filtros em uma máscara de candidatos
+
+        Args:
+            filters: {'prefix': [..], 'price': (min, max), 'size': (min, max, unidade),
+                      'exclude': [marcas/fornecedores]} (valores None = sem limite)
+            store: Loja do preço
+            normalize: Função de normalização dos tokens excluídos
+
+        Returns:
+            Máscara booleana (None quando não há filtro)
+        """
+        if not filters:
+            return None
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Filtros desconhecidos: {', '.join(sorted(unknown))}")
+
+        mask = np.ones(self._size, dtype=bool)
+        if filters.get('prefix'):
+            mask &= self.prefix_mask(list(filters['prefix']))
+        if filters.get('price'):
+            mask &= self.price_mask(store, *filters['price'])
+        if filters.get('size'):
+            mask &= self.size_mask(*filters['size'])
+        if filters.get('exclude'):
+            tokens = [normalize(t) if normalize else t.lower() for t in filters['exclude']]
+            mask &= ~self.token_mask(tokens)
+        return mask
@@ -0,0 +1,376 @@
+"""
+Módulo de armazenamento em SQLite
+Base_Fazer e substitutos em tabelas indexadas por n_iteracao, com WAL e
+salvamentos transacionais; importa/exporta o layout de substituicoes.csv
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+import pandas as pd
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MAX_SUBSTITUTES = 5
+SUB_FIELDS = ('cod_produto', 'nome', 'preco_loja_programada')
+
+# Substitutos no formato longo (preço no texto original)
+LONG_QUERY = (
+    "SELECT n_iteracao, rank, cod_produto, preco_loja_programada AS preco "
+    "FROM substitutes ORDER BY n_iteracao, rank"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS substitutes (
+    n_iteracao            INTEGER NOT NULL,
+    rank                  INTEGER NOT NULL,
+    cod_produto,
+    nome,
+    preco_loja_programada,
+    PRIMARY KEY (n_iteracao, rank)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_substitutes_cod ON substitutes (cod_produto);
+CREATE TABLE IF NOT EXISTS skipped (
+    n_iteracao INTEGER PRIMARY KEY
+);
+"""
+
+
+def read_long(db_path: str) -> pd.DataFrame:
+    """
+    Substitutos no formato longo, lidos com uma conexão somente leitura
+
+    Não cria o banco nem altera o schema (ao contrário de SQLiteStore).
+
+    Args:
+        db_path: Caminho do arquivo .db
+
+    Returns:
+        DataFrame com n_iteracao, rank, cod_produto, preco (texto original)
+    """
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(LONG_QUERY, conn)
+    finally:
+        conn.close()
+
+
+def _none_if_nan(value):
+    """Converte NaN/NA do pandas em NULL"""
+    return None if pd.isna(value) else value
+
+
+class SQLiteStore:
+    """Armazenamento de Base_Fazer e substitutos em um banco SQLite local"""
+
+    def __init__(self, db_path: str = "data/substituicoes.db", synchronous: str = "NORMAL"):
+        """
+        Abre (ou cria) o banco
+
+        Args:
+            db_path: Caminho do arquivo .db
+            synchronous: PRAGMA synchronous do SQLite; FULL faz fsync do WAL a
+                cada transação (durabilidade "sync"), NORMAL só nos checkpoints
+                do WAL (uma queda de energia pode perder as últimas transações)
+        """
+        if synchronous not in ("NORMAL", "FULL"):
+            raise ValueError(f"PRAGMA synchronous não suportado: {synchronous}")
+        self.db_path = db_path
+        self.synchronous = synchronous
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+
+        # Uma conexão compartilhada entre threads (UI + pré-carregamento), serializada pelo lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA synchronous={synchronous}")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        """Fecha a conexão"""
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Metadados
+    # ------------------------------------------------------------------
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Lê um valor da tabela meta"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        """Grava um valor na tabela meta"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    # ------------------------------------------------------------------
+    # Base_Fazer
+    # ------------------------------------------------------------------
+
+    def has_base_fazer(self) -> bool:
+        """Verifica se a Base_Fazer já foi importada"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'base_fazer'"
+            ).fetchone()
+        return row is not None
+
+    def import_base_fazer(self, df, signature: str):
+        """
+        Substitui a tabela base_fazer pelo conteúdo do DataFrame
+
+        Args:
+            df: Base_Fazer já limpa (n_iteracao inteiro e > 0), ou um iterável
+                de blocos (importados em sequência, na mesma transação)
+            signature: Assinatura do CSV de origem (tamanho + mtime)
+        """
+        chunks = [df] if isinstance(df, pd.DataFrame) else df
+        rows = 0
+        with self._lock, self._conn:
+            for i, chunk in enumerate(chunks):
+                chunk.to_sql('base_fazer', self._conn, if_exists='replace' if i == 0 else 'append', index=False)
+                rows += len(chunk)
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_base_fazer_n ON base_fazer (n_iteracao)"
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('base_fazer_signature', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (signature,)
+            )
+        logging.info(f"Base_Fazer importada no SQLite: {rows} itens")
+
+    def get_base_columns(self, columns: List[str]) -> pd.DataFrame:
+        """
+        Lê n_iteracao e as colunas pedidas da Base_Fazer (as que existirem)
+
+        Args:
+            columns: Nomes das colunas
+
+        Returns:
+            DataFrame com n_iteracao e as colunas existentes
+        """
+        with self._lock:
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(base_fazer)")}
+            selected = ['n_iteracao'] + [c for c in columns if c in existing and c != 'n_iteracao']
+            query = "SELECT " + ", ".join(f'"{c}"' for c in selected) + " FROM base_fazer"
+            return pd.read_sql_query(query, self._conn)
+
+    def get_item(self, n_iteracao: int) -> Optional[Dict]:
+        """Retorna um item da Base_Fazer pelo n_iteracao (ou None)"""
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT * FROM base_fazer WHERE n_iteracao = ?", self._conn, params=(int(n_iteracao),)
+            )
+        return df.iloc[0].to_dict() if len(df) > 0 else None
+
+    def get_pending_items(self) -> List[Dict]:
+        """Itens da Base_Fazer sem substitutos salvos (ordem de n_iteracao)"""
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT b.* FROM base_fazer b "
+                "WHERE NOT EXISTS (SELECT 1 FROM substitutes s WHERE s.n_iteracao = b.n_iteracao) "
+                "ORDER BY b.n_iteracao",
+                self._conn
+            )
+        return df.to_dict('records')
+
+    def total_items(self) -> int:
+        """Quantidade de itens na Base_Fazer"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM base_fazer").fetchone()[0]
+
+    def max_iteration(self) -> int:
+        """Maior n_iteracao da Base_Fazer"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(n_iteracao), 0) FROM base_fazer").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Substitutos
+    # ------------------------------------------------------------------
+
+    def get_substitutes(self, n_iteracao: int) -> List[Dict]:
+        """Substitutos salvos de uma iteração, em ordem"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cod_produto, nome, preco_loja_programada FROM substitutes "
+                "WHERE n_iteracao = ? ORDER BY rank",
+                (int(n_iteracao),)
+            ).fetchall()
+
+        return [
+            {
+                'cod_produto': cod,
+                'nome': nome if nome is not None else '',
+                'preco_loja_programada': preco if preco is not None else ''
+            }
+            for cod, nome, preco in rows
+        ]
+
+    def save_substitutes(self, n_iteracao: int, substitutes: List[Dict]):
+        """
+        Substitui os substitutos de uma iteração (uma transação)
+
+        Args:
+            n_iteracao: Número da iteração
+            substitutes: Até 5 dicts com cod_produto, nome, preco_loja_programada
+        """
+        self.save_many([(n_iteracao, substitutes)])
+
+    def save_many(self, batch: List[Tuple[int, List[Dict]]]):
+        """
+        Substitui os substitutos de várias iterações em uma única transação
+
+        Args:
+            batch: Lista de (n_iteracao, substitutos); substitutos None devolve
+                   a iteração aos pendentes
+        """
+        with self._lock, self._conn:
+            for n_iteracao, substitutes in batch:
+                rows = [
+                    (int(n_iteracao), rank, *(_none_if_nan(sub.get(field, '')) for field in SUB_FIELDS))
+                    for rank, sub in enumerate((substitutes or [])[:MAX_SUBSTITUTES], start=1)
+                ]
+                self._conn.execute("DELETE FROM substitutes WHERE n_iteracao = ?", (int(n_iteracao),))
+                self._conn.executemany("INSERT INTO substitutes VALUES (?, ?, ?, ?, ?)", rows)
+                # Salvamento vazio = iteração pulada
+                if rows or substitutes is None:
+                    self._conn.execute("DELETE FROM skipped WHERE n_iteracao = ?", (int(n_iteracao),))
+                else:
+                    self._conn.execute("INSERT OR IGNORE INTO skipped VALUES (?)", (int(n_iteracao),))
+
+    def update_prices(self, changes: List[Tuple[int, int, str]]) -> int:
+        """
+        Atualiza preços de substitutos já salvos (uma transação)
+
+        Args:
+            changes: Lista de (n_iteracao, rank, novo preço)
+
+        Returns:
+            Linhas atualizadas
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "UPDATE substitutes SET preco_loja_programada = ? WHERE n_iteracao = ? AND rank = ?",
+                [(price, int(n), int(rank)) for n, rank, price in changes]
+            )
+        return cursor.rowcount
+
+    def completed_count(self) -> int:
+        """Quantidade de iterações com pelo menos 1 substituto"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(DISTINCT n_iteracao) FROM substitutes"
+            ).fetchone()[0]
+
+    def sub_counts(self) -> Dict[int, int]:
+        """Quantidade de substitutos salvos por iteração (apenas iterações com algum)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT n_iteracao, COUNT(*) FROM substitutes GROUP BY n_iteracao"
+            ).fetchall()
+        return dict(rows)
+
+    def skipped_iterations(self) -> List[int]:
+        """Iterações puladas (salvas sem substitutos)"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT n_iteracao FROM skipped")]
+
+    # ------------------------------------------------------------------
+    # Importação / exportação no layout de substituicoes.csv
+    # ------------------------------------------------------------------
+
+    def import_output(self, df_output: pd.DataFrame, skipped=()) -> int:
+        """
+        Importa um DataFrame no layout largo (sub1_cod_produto, ...) substituindo o conteúdo
+
+        Args:
+            df_output: DataFrame no layout de substituicoes.csv
+            skipped: Iterações puladas
+
+        Returns:
+            Quantidade de substitutos importados
+        """
+        frames = []
+        for rank in range(1, MAX_SUBSTITUTES + 1):
+            cod_col = f'sub{rank}_cod_produto'
+            if cod_col not in df_output.columns:
+                continue
+            filled = df_output[df_output[cod_col].notna()]
+            frames.append(pd.DataFrame({
+                'n_iteracao': filled['n_iteracao'].astype(int),
+                'rank': rank,
+                **{field: filled[f'sub{rank}_{field}'] for field in SUB_FIELDS}
+            }))
+
+        long_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        rows = [tuple(_none_if_nan(v) for v in row) for row in long_df.itertuples(index=False, name=None)]
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM substitutes")
+            self._conn.executemany("INSERT INTO substitutes VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("DELETE FROM skipped")
+            self._conn.executemany("INSERT OR IGNORE INTO skipped VALUES (?)", [(int(n),) for n in skipped])
+
+        logging.info(f"Substitutos importados no SQLite: {len(rows)}")
+        return len(rows)
+
+    def export_long(self) -> pd.DataFrame:
+        """
+        Substitutos no formato longo, direto da tabela
+
+        Returns:
+            DataFrame com n_iteracao, rank, cod_produto, preco (texto original)
+        """
+        with self._lock:
+            return pd.read_sql_query(LONG_QUERY, self._conn)
+
+    def export_output(self) -> pd.DataFrame:
+        """
+        Monta o DataFrame no layout de substituicoes.csv (uma linha por iteração)
+
+        Returns:
+            DataFrame com n_iteracao e sub{i}_{cod_produto,nome,preco_loja_programada}
+        """
+        max_iteracao = self.max_iteration()
+
+        with self._lock:
+            long_df = pd.read_sql_query("SELECT * FROM substitutes", self._conn)
+
+        wide = long_df.pivot(index='n_iteracao', columns='rank', values=list(SUB_FIELDS))
+        wide = wide.reindex(range(1, max_iteracao + 1))
+
+        data = {'n_iteracao': range(1, max_iteracao + 1)}
+        for rank in range(1, MAX_SUBSTITUTES + 1):
+            for field in SUB_FIELDS:
+                column = (field, rank)
+                data[f'sub{rank}_{field}'] = (
+                    wide[column].to_numpy() if column in wide.columns else [None] * max_iteracao
+                )
+
+        return pd.DataFrame(data)
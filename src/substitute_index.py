@@ -0,0 +1,136 @@
+"""
+Módulo do índice reverso de substitutos
+Mapeia cada código usado como substituto para as posições (n_iteracao, rank)
+em que ele aparece, atualizado a cada salvamento, para saber na hora quais
+itens da Base_Fazer dependem de um código que saiu do catálogo
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from .output_stats import code_key
+except ImportError:
+    from output_stats import code_key
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+IMPACT_COLUMNS = ['n_iteracao', 'rank', 'cod_produto']
+
+
+class SubstituteIndex:
+    """Índice cod_produto -> {(n_iteracao, rank)}, atualizado em O(5) por salvamento"""
+
+    def __init__(self):
+        self._positions: Dict[str, Set[Tuple[int, int]]] = {}
+        # Códigos de cada iteração salva (para desfazer na próxima gravação)
+        self._saved: Dict[int, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, code) -> bool:
+        return code_key(code) in self._positions
+
+    def load(self, saved_long: pd.DataFrame):
+        """
+        Monta o índice a partir do que já está salvo
+
+        Args:
+            saved_long: DataFrame com n_iteracao, rank e cod_produto (formato longo)
+        """
+        saved_long = saved_long.sort_values(['n_iteracao', 'rank'], kind='stable')
+        keys = saved_long['cod_produto'].map(code_key).tolist()
+        iterations = saved_long['n_iteracao'].astype(int).tolist()
+        ranks = saved_long['rank'].astype(int).tolist()
+
+        self._positions = {}
+        self._saved = {}
+        saved: Dict[int, List[str]] = {}
+        for key, n_iteracao, rank in zip(keys, iterations, ranks):
+            self._positions.setdefault(key, set()).add((n_iteracao, rank))
+            saved.setdefault(n_iteracao, []).append(key)
+        self._saved = {n: tuple(codes) for n, codes in saved.items()}
+
+    def apply(self, n_iteracao: int, codes: Optional[List]):
+        """
+        Atualiza o índice após um salvamento
+
+        Args:
+            n_iteracao: Número da iteração
+            codes: Códigos salvos, na ordem dos ranks (vazio ou None = sem substitutos)
+        """
+        for rank, key in enumerate(self._saved.pop(n_iteracao, ()), start=1):
+            positions = self._positions.get(key)
+            if positions is not None:
+                positions.discard((n_iteracao, rank))
+                if not positions:
+                    del self._positions[key]
+
+        new = tuple(code_key(code) for code in (codes or []))
+        for rank, key in enumerate(new, start=1):
+            self._positions.setdefault(key, set()).add((n_iteracao, rank))
+        if new:
+            self._saved[n_iteracao] = new
+
+    def positions(self, code) -> List[Tuple[int, int]]:
+        """Posições (n_iteracao, rank) em que o código é substituto, em ordem"""
+        return sorted(self._positions.get(code_key(code), ()))
+
+    def iterations(self, codes: Iterable) -> List[int]:
+        """Iterações que usam qualquer um dos códigos, em ordem"""
+        found = set()
+        for code in codes:
+            found.update(n for n, _ in self._positions.get(code_key(code), ()))
+        return sorted(found)
+
+    def impact(self, codes: Iterable) -> pd.DataFrame:
+        """
+        Retorna todas as posições afetadas por um conjunto de códigos
+
+        Args:
+            codes: Códigos (ex.: itens que saíram de Itens_Ativos)
+
+        Returns:
+            DataFrame com n_iteracao, rank e cod_produto, ordenado
+        """
+        rows = [
+            (n_iteracao, rank, key)
+            for key in dict.fromkeys(code_key(code) for code in codes)
+            for n_iteracao, rank in self._positions.get(key, ())
+        ]
+        df = pd.DataFrame(rows, columns=IMPACT_COLUMNS)
+        df[['n_iteracao', 'rank']] = df[['n_iteracao', 'rank']].astype('int64')
+        return df.sort_values(['n_iteracao', 'rank']).reset_index(drop=True)
+
+
+# Uso pela linha de comando: python src/substitute_index.py <código> [<código> ...]
+if __name__ == "__main__":
+    import sys
+
+    try:
+        from .file_manager import read_saved_long
+    except ImportError:
+        from file_manager import read_saved_long
+
+    # Somente leitura: um FileManager criaria saída, journal e backups
+    # (e reservaria faixas com REVIEWER definido)
+    index = SubstituteIndex()
+    index.load(read_saved_long())
+    impact = index.impact(sys.argv[1:])
+
+    if impact.empty:
+        print("Nenhuma iteração usa esses códigos como substituto")
+    else:
+        print(impact.to_string(index=False))
+        print(f"\n{impact['n_iteracao'].nunique()} iterações afetadas")
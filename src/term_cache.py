@@ -0,0 +1,274 @@
+"""
+Módulo de cache de termos da IA
+Cache limitado (LRU ou LFU), com expiração opcional e entradas versionadas
+por modelo e hash do prompt
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from pathlib import Path
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'ai_agent.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+CACHE_FORMAT_VERSION = 2
+
+
+class TermCache:
+    """Cache de termos com limite de tamanho, TTL e invalidação por versão"""
+
+    def __init__(
+        self,
+        cache_file: str,
+        model: str,
+        prompt_hash: str,
+        max_entries: int = 20000,
+        ttl_seconds: float = None,
+        policy: str = "lru",
+        save_delay: float = 5.0
+    ):
+        """
+        Inicializa o cache e carrega o arquivo, descartando entradas inválidas
+
+        Args:
+            cache_file: Caminho do arquivo JSON
+            model: Modelo atual (entradas de outro modelo são invalidadas)
+            prompt_hash: Hash do prompt atual (idem)
+            max_entries: Máximo de entradas em memória e em disco
+            ttl_seconds: Tempo de vida das entradas (None = sem expiração)
+            policy: Política de remoção: "lru" ou "lfu"
+            save_delay: Janela (segundos) que agrupa as alterações em uma
+                        gravação do arquivo (ver schedule_save; 0 = gravar na hora)
+        """
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Política de cache desconhecida: {policy}")
+
+        self.cache_file = cache_file
+        self.model = model
+        self.prompt_hash = prompt_hash
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.policy = policy
+        self.save_delay = max(0.0, save_delay)
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        # Versão do conteúdo: cada alteração incrementa; save() pula se já gravada
+        self._version = 0
+        self._saved_version = 0
+        self._save_timer: Optional[threading.Timer] = None
+
+        self.load()
+
+    def _is_valid(self, entry: Dict, now: float) -> bool:
+        """Entrada é da versão atual e não expirou"""
+        if entry.get('model') != self.model or entry.get('prompt_hash') != self.prompt_hash:
+            return False
+        if self.ttl_seconds is not None and now - entry.get('created_at', 0) > self.ttl_seconds:
+            return False
+        return True
+
+    def load(self):
+        """Carrega o arquivo de cache (aceita o formato antigo {chave: termos})"""
+        if not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao carregar cache: {e}")
+            return
+
+        now = time.time()
+
+        if data.get('format') == CACHE_FORMAT_VERSION:
+            entries = data.get('entries', {})
+        else:
+            # Formato antigo: gerado pelo único modelo/prompt usado até então,
+            # então as entradas são adotadas com a versão atual
+            entries = {
+                key: {'terms': terms, 'model': self.model, 'prompt_hash': self.prompt_hash,
+                      'created_at': now, 'hits': 0}
+                for key, terms in data.items() if isinstance(terms, list)
+            }
+            logging.info(f"Cache no formato antigo migrado: {len(entries)} entradas")
+
+        # Ordem do arquivo = ordem de uso (mais antigo primeiro)
+        valid = OrderedDict((k, e) for k, e in entries.items() if self._is_valid(e, now))
+        dropped = len(entries) - len(valid)
+
+        with self._lock:
+            self._entries = valid
+            self._evict()
+            self._saved_version = self._version
+
+        if dropped:
+            logging.info(f"Cache: {dropped} entradas invalidadas (versão ou TTL)")
+
+    def save(self):
+        """Salva o cache em arquivo (escrita atômica via arquivo temporário)"""
+        try:
+            # A cópia é feita dentro de _save_lock: uma gravação nunca
+            # sobrescreve o arquivo com uma cópia mais antiga que a anterior
+            with self._save_lock:
+                with self._lock:
+                    if self._version == self._saved_version and os.path.exists(self.cache_file):
+                        return
+                    version = self._version
+                    snapshot = {
+                        'format': CACHE_FORMAT_VERSION,
+                        'model': self.model,
+                        'prompt_hash': self.prompt_hash,
+                        'entries': OrderedDict((k, dict(e)) for k, e in self._entries.items())
+                    }
+
+                os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+                tmp_path = f"{self.cache_file}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.cache_file)
+                self._saved_version = version
+        except Exception as e:
+            logging.error(f"Erro ao salvar cache: {e}")
+
+    def schedule_save(self):
+        """
+        Agenda a gravação do arquivo
+
+        Alterações dentro de save_delay segundos são gravadas juntas, em vez
+        de regravar o JSON inteiro a cada put.
+        """
+        if self.save_delay == 0:
+            self.save()
+            return
+
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self._run_scheduled_save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _run_scheduled_save(self):
+        with self._lock:
+            self._save_timer = None
+        self.save()
+
+    def close(self):
+        """Cancela a gravação agendada e grava o que estiver pendente"""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+        self.save()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """
+        Retorna os termos de uma chave (None se ausente, expirada ou de outra versão)
+
+        Args:
+            key: Chave do produto
+
+        Returns:
+            Lista de termos ou None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if not self._is_valid(entry, time.time()):
+                del self._entries[key]
+                return None
+
+            entry['hits'] = entry.get('hits', 0) + 1
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            self._version += 1
+            return entry['terms']
+
+    def put(self, key: str, terms: List[str]):
+        """
+        Armazena termos com a versão atual, removendo entradas se necessário
+
+        Args:
+            key: Chave do produto
+            terms: Termos gerados
+        """
+        with self._lock:
+            self._entries[key] = {
+                'terms': terms,
+                'model': self.model,
+                'prompt_hash': self.prompt_hash,
+                'created_at': time.time(),
+                'hits': 0
+            }
+            self._entries.move_to_end(key)
+            self._evict()
+            self._version += 1
+
+    def _evict(self):
+        """Remove entradas excedentes (em lote de 10% para amortizar o custo)"""
+        if len(self._entries) <= self.max_entries:
+            return
+
+        target = max(0, self.max_entries - self.max_entries // 10)
+        excess = len(self._entries) - target
+
+        if self.policy == "lru":
+            for _ in range(excess):
+                self._entries.popitem(last=False)
+        else:
+            # LFU: menos usadas primeiro, desempate pela mais antiga
+            victims = sorted(
+                self._entries,
+                key=lambda k: (self._entries[k].get('hits', 0), self._entries[k].get('created_at', 0))
+            )[:excess]
+            for key in victims:
+                del self._entries[key]
+
+        logging.info(f"Cache: {excess} entradas removidas ({self.policy})")
+
+    def invalidate(self, model: str = None, prompt_hash: str = None) -> int:
+        """
+        Remove entradas geradas por um modelo e/ou prompt específicos
+
+        Args:
+            model: Modelo das entradas a remover
+            prompt_hash: Hash do prompt das entradas a remover
+
+        Returns:
+            Quantidade de entradas removidas
+        """
+        with self._lock:
+            keys = [
+                k for k, e in self._entries.items()
+                if (model is None or e.get('model') == model)
+                and (prompt_hash is None or e.get('prompt_hash') == prompt_hash)
+            ]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._version += 1
+        return len(keys)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self._is_valid(entry, time.time())
+
+    def __len__(self) -> int:
+        return len(self._entries)
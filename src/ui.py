@@ -40,6 +40,8 @@ class SubstituteFinderUI:
         self.on_save_substitutes: Callable = None
         self.on_search_manual: Callable = None
         self.on_skip_iteration: Callable = None
+        self.on_show_stats: Callable = None
+        self.on_claim_range: Callable = None
         
         # Estado atual
         self.current_iteration = 1
@@ -150,6 +152,21 @@ class SubstituteFinderUI:
         )
         self.progress_label.pack(side="left", padx=5)
         
+        ctk.CTkButton(
+            actions_frame,
+            text="📊",
+            command=self._on_show_stats,
+            width=36
+        ).pack(side="left", padx=5)
+        
+        # Reservar próxima faixa (só com vários revisores)
+        self.claim_button = ctk.CTkButton(
+            actions_frame,
+            text="Reservar faixa",
+            command=self._on_claim_range,
+            width=110
+        )
+        
         # Espaçador
         ctk.CTkLabel(actions_frame, text="").pack(side="left", expand=True)
         
@@ -324,7 +341,9 @@ class SubstituteFinderUI:
         on_load_iteration: Callable,
         on_save_substitutes: Callable,
         on_search_manual: Callable = None,
-        on_skip_iteration: Callable = None
+        on_skip_iteration: Callable = None,
+        on_show_stats: Callable = None,
+        on_claim_range: Callable = None
     ):
         """
         Define callbacks para comunicação com backend
@@ -334,11 +353,17 @@ class SubstituteFinderUI:
             on_save_substitutes: Callback(iteration_num, selected_items) -> None
             on_search_manual: Callback(search_term) -> list
             on_skip_iteration: Callback(iteration_num) -> None
+            on_show_stats: Callback(iteration_num) -> None
+            on_claim_range: Callback() -> None (None esconde o botão "Reservar faixa")
         """
         self.on_load_iteration = on_load_iteration
         self.on_save_substitutes = on_save_substitutes
         self.on_search_manual = on_search_manual
         self.on_skip_iteration = on_skip_iteration
+        self.on_show_stats = on_show_stats
+        self.on_claim_range = on_claim_range
+        if on_claim_range:
+            self.claim_button.pack(side="left", padx=5, after=self.progress_label)
     
     def load_iteration(self, iteration_num: int):
         """
@@ -525,6 +550,16 @@ class SubstituteFinderUI:
             self.on_skip_iteration(self.current_iteration)
         self._on_next()
     
+    def _on_show_stats(self):
+        """Handler para mostrar estatísticas"""
+        if self.on_show_stats:
+            self.on_show_stats(self.current_iteration)
+    
+    def _on_claim_range(self):
+        """Handler para reservar a próxima faixa livre"""
+        if self.on_claim_range:
+            self.on_claim_range()
+    
     def _on_save(self):
         """Handler para salvar selecionados"""
         selected_items = self._get_selected_items()
@@ -551,6 +586,10 @@ class SubstituteFinderUI:
         
         return selected
     
+    def get_selected_codes(self) -> List[str]:
+        """Retorna códigos dos itens atualmente selecionados"""
+        return [item['cod_produto'] for item in self._get_selected_items()]
+    
     def show_message(self, title: str, message: str):
         """Exibe mensagem para o usuário"""
         dialog = ctk.CTkToplevel(self.root)
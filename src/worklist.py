@@ -0,0 +1,248 @@
+"""
+Módulo de carregamento sob demanda da Base_Fazer
+Indexa uma única vez o byte de início de cada linha (índice salvo ao lado do
+CSV) e materializa apenas a janela de linhas em torno da iteração atual
+"""
+
+import io
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Configurar logging - caminho relativo ao diretório raiz do projeto
+log_dir = Path(__file__).parent.parent / 'logs'
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=log_dir / 'file_manager.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+INDEX_FORMAT_VERSION = 1
+
+
+def clean_worklist_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza n_iteracao (inteiro) e remove linhas sem n_iteracao válido
+
+    Args:
+        df: Linhas da Base_Fazer lidas do CSV
+
+    Returns:
+        DataFrame limpo
+    """
+    if 'n_iteracao' not in df.columns:
+        raise ValueError("Coluna 'n_iteracao' não encontrada em Base_Fazer")
+
+    df['n_iteracao'] = pd.to_numeric(df['n_iteracao'], errors='coerce').fillna(0).astype(int)
+    return df[df['n_iteracao'] > 0]
+
+
+def iter_worklist_chunks(path: str, skiprows: int = 1, chunksize: int = 50000,
+                         usecols: List[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Percorre a Base_Fazer inteira em blocos já limpos (memória limitada ao bloco)
+
+    Args:
+        path: Caminho da Base_Fazer
+        skiprows: Linhas antes do cabeçalho (metadados)
+        chunksize: Linhas por bloco
+        usecols: Colunas a ler (None = todas)
+    """
+    reader = pd.read_csv(path, skiprows=skiprows, chunksize=chunksize, usecols=usecols)
+    for chunk in reader:
+        yield clean_worklist_frame(chunk)
+
+
+def _parse_iteration(line: bytes) -> int:
+    """Lê o primeiro campo (n_iteracao) de uma linha do CSV; 0 se inválido"""
+    field = line.split(b',', 1)[0].strip().strip(b'"')
+    try:
+        return int(float(field))
+    except ValueError:
+        return 0
+
+
+class WorklistIndex:
+    """Base_Fazer indexada por byte offset, com janelas materializadas sob demanda"""
+
+    def __init__(self, path: str, skiprows: int = 1, window: int = 200, max_windows: int = 4):
+        """
+        Abre (ou cria) o índice
+
+        Args:
+            path: Caminho da Base_Fazer
+            skiprows: Linhas antes do cabeçalho (metadados)
+            window: Linhas materializadas por janela
+            max_windows: Janelas mantidas em memória
+        """
+        self.path = path
+        self.skiprows = skiprows
+        self.window = max(1, window)
+        self.max_windows = max(1, max_windows)
+        self.index_path = f"{path}.idx.npz"
+
+        self._windows: "OrderedDict[int, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        stat = os.stat(path)
+        self.signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+        if not self._load_index():
+            self._build_index()
+
+    # ------------------------------------------------------------------
+    # Índice
+    # ------------------------------------------------------------------
+
+    def _load_index(self) -> bool:
+        """Carrega o índice salvo, se for da mesma versão do arquivo"""
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                if str(data['signature']) != self.signature or int(data['format']) != INDEX_FORMAT_VERSION:
+                    return False
+                self.header = bytes(data['header'])
+                self.offsets = data['offsets']
+                self.iterations = data['iterations']
+                self.data_end = int(data['data_end'])
+        except Exception as e:
+            logging.warning(f"Índice da Base_Fazer ilegível, recriando: {e}")
+            return False
+
+        self._finish_index()
+        return True
+
+    def _build_index(self):
+        """Percorre o arquivo uma vez registrando o início de cada linha"""
+        offsets: List[int] = []
+        iterations: List[int] = []
+
+        with open(self.path, 'rb') as f:
+            for _ in range(self.skiprows):
+                f.readline()
+            self.header = f.readline()
+
+            position = f.tell()
+            line = f.readline()
+            while line:
+                # Campo entre aspas com quebra de linha: continuar até fechar as aspas
+                while line.count(b'"') % 2 == 1:
+                    continuation = f.readline()
+                    if not continuation:
+                        break
+                    line += continuation
+
+                n_iteracao = _parse_iteration(line)
+                if n_iteracao > 0:
+                    offsets.append(position)
+                    iterations.append(n_iteracao)
+
+                position = f.tell()
+                line = f.readline()
+            self.data_end = position
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.iterations = np.asarray(iterations, dtype=np.int64)
+
+        try:
+            tmp_path = f"{self.path}.idx.tmp.npz"
+            np.savez(
+                tmp_path,
+                format=INDEX_FORMAT_VERSION,
+                signature=self.signature,
+                header=np.frombuffer(self.header, dtype=np.uint8),
+                offsets=self.offsets,
+                iterations=self.iterations,
+                data_end=self.data_end
+            )
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logging.warning(f"Não foi possível salvar o índice da Base_Fazer: {e}")
+
+        self._finish_index()
+        logging.info(f"Base_Fazer indexada: {len(self.offsets)} linhas")
+
+    def _finish_index(self):
+        """Estruturas derivadas: busca n_iteracao -> posição no arquivo"""
+        self._order = np.argsort(self.iterations, kind='stable')
+        self._sorted_iterations = self.iterations[self._order]
+        self.columns = list(pd.read_csv(io.BytesIO(self.header), nrows=0).columns)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def max_iteration(self) -> int:
+        """Maior n_iteracao"""
+        return int(self._sorted_iterations[-1]) if len(self._sorted_iterations) else 0
+
+    def position_of(self, n_iteracao: int) -> Optional[int]:
+        """Posição (ordem no arquivo) da linha de uma iteração, ou None"""
+        i = np.searchsorted(self._sorted_iterations, n_iteracao)
+        if i < len(self._sorted_iterations) and self._sorted_iterations[i] == n_iteracao:
+            return int(self._order[i])
+        return None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _read_rows(self, first: int, last: int) -> pd.DataFrame:
+        """Lê as linhas nas posições [first, last) com um único seek"""
+        start = int(self.offsets[first])
+        end = int(self.offsets[last]) if last < len(self.offsets) else self.data_end
+
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            chunk = f.read(end - start)
+
+        df = pd.read_csv(io.BytesIO(self.header + chunk))
+        return clean_worklist_frame(df)
+
+    def _window_frame(self, position: int) -> pd.DataFrame:
+        """Janela (alinhada) que contém a posição, indexada por n_iteracao"""
+        window_id = position // self.window
+        frame = self._windows.get(window_id)
+        if frame is None:
+            first = window_id * self.window
+            frame = self._read_rows(first, min(first + self.window, len(self.offsets)))
+            frame = frame.set_index('n_iteracao', drop=False)
+            self._windows[window_id] = frame
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(window_id)
+        return frame
+
+    def get_item(self, n_iteracao: int) -> Optional[Dict]:
+        """
+        Retorna uma linha da Base_Fazer materializando só a sua janela
+
+        Args:
+            n_iteracao: Número da iteração
+
+        Returns:
+            Dicionário com os dados do item ou None
+        """
+        position = self.position_of(n_iteracao)
+        if position is None:
+            return None
+        with self._lock:
+            frame = self._window_frame(position)
+        if n_iteracao not in frame.index:
+            return None
+        row = frame.loc[n_iteracao]
+        if isinstance(row, pd.DataFrame):
+            row = row.iloc[0]
+        return row.to_dict()
+
+    def iter_chunks(self, chunksize: int = 50000, usecols: List[str] = None) -> Iterator[pd.DataFrame]:
+        """Percorre a Base_Fazer inteira em blocos (ver iter_worklist_chunks)"""
+        return iter_worklist_chunks(self.path, self.skiprows, chunksize, usecols)
@@ -0,0 +1,89 @@
+"""
+Fixtures compartilhadas dos testes (catálogo e Base_Fazer pequenos em tmp_path)
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Mesmo layout de execução do app: módulos de src/ importados pelo nome
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+CATALOG_ROWS = [
+    # id_modelo, cod_produto, nome, preco_loja_programada, preco_loja_fresh
+    (1, 'SHOP01', 'QUEIJO RALADO TIROLEZ 50G', '6,50', '7,00'),
+    (2, 'SHOP02', 'QUEIJO RALADO VIGOR 100G', '9,90', ''),
+    (3, 'SHOP03', 'COCA-COLA LATA 350ML', '4,50', '4,00'),
+    (4, 'KDB10', 'LEITE SEMI-DESNATADO ITALAC 1L', '5,20', '5,50'),
+    (5, 'KDB11', 'LEITE INTEGRAL NESTLE 1L', '6,10', ''),
+    (6, 'CT100', 'ARROZ BRANCO TIO JOAO 5KG', '28,90', '27,50'),
+    (7, 'CT101', 'CAFE TORRADO SANTA CLARA 500G', '19,90', ''),
+    (8, 'SHOP04', 'BISCOITO RECHEADO NESTLE 140G', '3,49', '3,20'),
+]
+
+BASE_FAZER_ROWS = [
+    # n_iteracao, id_modelo, cod_produto, nome, Fornecedor, Comprador, Responsável, Subcategoria
+    (1, 1, 'SHOP01', 'QUEIJO RALADO TIROLEZ 50G', 'TIROLEZ', 'Ana', 'Pietro', 'Frios'),
+    (2, 4, 'KDB10', 'LEITE SEMI-DESNATADO ITALAC 1L', 'ITALAC', 'Ana', 'Pietro', 'Laticínios'),
+    (3, 6, 'CT100', 'ARROZ BRANCO TIO JOAO 5KG', 'TIO JOAO', 'Bruno', 'Carla', 'Mercearia'),
+    (4, 7, 'CT101', 'CAFE TORRADO SANTA CLARA 500G', 'SANTA CLARA', 'Bruno', 'Carla', 'Mercearia'),
+    (5, 8, 'SHOP04', 'BISCOITO RECHEADO NESTLE 140G', 'NESTLE', 'Ana', 'Pietro', 'Mercearia'),
+]
+
+
+def _write_csv(path: Path, header: str, rows, first_line: str = None) -> Path:
+    lines = [first_line] if first_line is not None else []
+    lines.append(header)
+    for row in rows:
+        lines.append(','.join(f'"{v}"' if ',' in str(v) else str(v) for v in row))
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def catalog_csv(tmp_path) -> Path:
+    """Itens_Ativos.csv pequeno, no formato do arquivo real"""
+    return _write_csv(
+        tmp_path / 'Itens_Ativos.csv',
+        'id_modelo,cod_produto,nome,preco_loja_programada,preco_loja_fresh,',
+        [row + ('',) for row in CATALOG_ROWS]
+    )
+
+
+@pytest.fixture
+def base_fazer_csv(tmp_path) -> Path:
+    """Base_Fazer.csv pequeno (com a linha de totais antes do cabeçalho, como o real)"""
+    return _write_csv(
+        tmp_path / 'Base_Fazer.csv',
+        'n_iteracao,id_modelo,cod_produto,nome,Fornecedor,Comprador,Responsável,Subcategoria',
+        BASE_FAZER_ROWS,
+        first_line=f',,,{len(BASE_FAZER_ROWS)},,,,'
+    )
+
+
+@pytest.fixture
+def make_manager(base_fazer_csv, tmp_path, monkeypatch):
+    """Fábrica de FileManager isolado em tmp_path (fechados no fim do teste)"""
+    from file_manager import FileManager
+
+    for name in ('REVIEWER', 'STORAGE_BACKEND', 'SQLITE_PATH', 'SAVE_DURABILITY', 'BASE_FAZER_LAZY'):
+        monkeypatch.delenv(name, raising=False)
+    managers = []
+
+    def make(**kwargs):
+        kwargs.setdefault('backup_dir', str(tmp_path / 'backups'))
+        if 'output_path' not in kwargs and not kwargs.get('reviewer'):
+            kwargs['output_path'] = str(tmp_path / 'substituicoes.csv')
+        manager = FileManager(str(base_fazer_csv), **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def substitute(code: str, price: str = '1,00') -> dict:
+    """Substituto no formato que a interface salva"""
+    return {'cod_produto': code, 'nome': f'PRODUTO {code}', 'preco_loja_programada': price}
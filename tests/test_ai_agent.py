@@ -0,0 +1,141 @@
+"""
+Testes do AIAgent com um cliente de chat falso (sem rede)
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ai_agent import AIAgent
+from ai_metrics import AIMetrics
+from product_families import ProductFamily
+
+TERMS = ['queijo ralado parmesao 50g', 'queijo ralado parmesao', 'queijo parmesao', 'queijo ralado', 'queijo']
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeChat:
+    """Substitui o ResilientChatClient: conta as chamadas e responde TERMS"""
+
+    def __init__(self, chunk_delay: float = 0.0):
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+
+    def create(self, stats=None, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content='\n'.join(TERMS))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    def stream(self, stats=None, **kwargs):
+        self.calls += 1
+        for term in TERMS:
+            time.sleep(self.chunk_delay)
+            yield _chunk(term + '\n')
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('TERM_CACHE_SAVE_SECONDS', '0')
+    agent = AIAgent(cache_file=str(tmp_path / 'cache.json'))
+    agent.metrics = AIMetrics(str(tmp_path / 'metrics.jsonl'))
+    agent.chat = FakeChat()
+    yield agent
+    agent.shutdown()
+
+
+def test_concurrent_calls_share_one_api_call(agent):
+    agent.chat = FakeChat(chunk_delay=0.02)
+    results = agent.generate_search_terms_batch([('QUEIJO RALADO 50G', '')] * 8)
+    assert all(terms == TERMS for terms in results)
+    assert agent.chat.calls == 1
+    assert agent.generate_search_terms('queijo ralado 50g') == TERMS
+    assert agent.chat.calls == 1
+
+
+def test_stream_latency_excludes_consumer_time(agent):
+    for _ in agent.stream_search_terms('QUEIJO RALADO 50G'):
+        time.sleep(0.05)
+
+    row = agent.metrics.rows[-1]
+    assert row['outcome'] == 'miss' and row['path'] == 'stream'
+    assert row['api_latency_ms'] < 100
+    assert row['latency_ms'] < 100
+    assert agent.generate_search_terms('QUEIJO RALADO 50G') == TERMS
+
+
+def test_closed_stream_publishes_emitted_terms_to_waiters(agent):
+    stream = agent.stream_search_terms('QUEIJO RALADO 50G')
+    first = [next(stream), next(stream)]
+
+    waited = {}
+    waiter = threading.Thread(target=lambda: waited.update(terms=agent.generate_search_terms('QUEIJO RALADO 50G')))
+    waiter.start()
+    time.sleep(0.1)
+    stream.close()
+    waiter.join(timeout=5)
+
+    assert waited['terms'] == first == TERMS[:2]
+    assert agent.chat.calls == 1
+    # Resposta incompleta não vai para o cache
+    assert agent.cache.get('queijo ralado 50g') is None
+
+
+def test_closed_stream_records_an_interrupted_metrics_row(agent):
+    stream = agent.stream_search_terms('QUEIJO RALADO 50G')
+    next(stream)
+    time.sleep(0.2)
+    stream.close()
+
+    row = agent.metrics.rows[-1]
+    assert (row['outcome'], row['path'], row['interrupted']) == ('miss', 'stream', True)
+    # O tempo parado no consumidor antes do close não entra na latência
+    assert row['latency_ms'] < 100
+    assert agent.metrics.summary()['interrompidas'] == 1
+
+    for _ in agent.stream_search_terms('QUEIJO RALADO 50G'):
+        pass
+    assert agent.metrics.rows[-1]['interrupted'] is False
+
+
+def test_family_representative_is_generated_with_its_price(agent):
+    prompts = []
+    create = agent.chat.create
+
+    def recording_create(stats=None, **kwargs):
+        prompts.append(kwargs['messages'][-1]['content'])
+        return create(stats=stats, **kwargs)
+
+    agent.chat.create = recording_create
+    family = ProductFamily('QUEIJO RALADO TIROLEZ 50G', ['queijo', 'ralado', 'tirolez'],
+                           {'nome': 'QUEIJO RALADO TIROLEZ 50G', 'preco_loja_programada': '8,99'})
+    family.members.append('QUEIJO RALADO TIROLEZ 100G')
+    agent.register_families([family])
+
+    derived = agent.generate_search_terms('QUEIJO RALADO TIROLEZ 100G', '15,99')
+
+    assert agent.chat.calls == 1
+    assert 'R$ 8,99' in prompts[0] and 'QUEIJO RALADO TIROLEZ 50G' in prompts[0]
+    assert derived[0] == 'queijo ralado parmesao 100g'
+
+
+def test_retry_queue_is_capped_oldest_first(agent):
+    agent.retry_queue_max = 3
+    for i in range(5):
+        agent._queue_retry(f'p{i}', f'P{i}', '')
+    agent._queue_retry('p2', 'P2', '')
+    assert list(agent.retry_queue) == ['p3', 'p4', 'p2']
+
+
+def test_shutdown_stops_retry_worker(agent):
+    agent.start_retry_worker(interval=60)
+    worker = agent._retry_thread
+    started = time.perf_counter()
+    agent.shutdown()
+    assert not worker.is_alive()
+    assert time.perf_counter() - started < 2
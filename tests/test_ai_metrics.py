@@ -0,0 +1,57 @@
+"""
+Testes das métricas por chamada do AIAgent
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from ai_metrics import AIMetrics, load_rows, main, summarize
+
+
+@pytest.fixture
+def metrics(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_PRICE_INPUT_PER_1M', '2.00')
+    monkeypatch.setenv('OPENAI_PRICE_OUTPUT_PER_1M', '10.00')
+    return AIMetrics(str(tmp_path / 'metrics.jsonl'), window=3)
+
+
+def test_record_computes_cost_and_appends_jsonl(metrics):
+    usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=100)
+    row = metrics.record('QUEIJO', 'miss', 120.0, api_latency_ms=100.0, usage=usage, retries=1)
+
+    assert row['cost_usd'] == pytest.approx(0.003)
+    assert load_rows(metrics.metrics_file) == [json.loads(json.dumps(row))]
+
+
+def test_summary_rates_and_window(metrics):
+    metrics.record('A', 'miss', 100.0, api_latency_ms=90.0)
+    metrics.record('A', 'hit', 1.0)
+    metrics.record('B', 'fallback', 50.0, api_latency_ms=50.0, retries=2)
+    metrics.record('C', 'derived', 2.0)
+
+    # Janela de 3: a primeira linha saiu da memória, mas continua no arquivo
+    summary = metrics.summary()
+    assert summary['chamadas'] == 3
+    assert summary['taxa_cache'] == pytest.approx(0.667)
+    assert summary['taxa_fallback'] == pytest.approx(0.333)
+    assert summary['retries'] == 2
+    assert summarize(load_rows(metrics.metrics_file))['chamadas_api'] == 2
+    assert metrics.summary(last=1)['desfechos']['derived'] == 1
+
+
+def test_load_rows_filters_and_skips_broken_lines(metrics):
+    metrics.record('A', 'miss', 10.0)
+    with open(metrics.metrics_file, 'a', encoding='utf-8') as f:
+        f.write('{"ts": 1, "outcome": "hit"}\n{quebrada\n')
+
+    assert len(load_rows(metrics.metrics_file)) == 2
+    assert len(load_rows(metrics.metrics_file, since=1000)) == 1
+    assert load_rows(metrics.metrics_file, last=1)[0]['ts'] == 1
+
+
+def test_cli_prints_json_summary(metrics, capsys):
+    metrics.record('A', 'miss', 10.0, api_latency_ms=8.0)
+    main(['--file', metrics.metrics_file, '--json'])
+    assert json.loads(capsys.readouterr().out)['chamadas_api'] == 1
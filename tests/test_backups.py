@@ -0,0 +1,74 @@
+"""
+Testes dos backups (snapshot + deltas) e da restauração
+"""
+
+import json
+
+import pandas as pd
+
+import pytest
+
+from conftest import substitute
+
+
+@pytest.mark.parametrize('storage', ['csv', 'sqlite'])
+def test_restore_brings_back_skipped_and_counters(make_manager, storage, monkeypatch):
+    monkeypatch.setenv('BACKUP_FULL_EVERY', '3')
+    manager = make_manager(storage=storage, durability='sync', checkpoint_every=1)
+    manager.save_substitutes(1, [substitute('SHOP02')])
+    manager.save_substitutes(2, [])
+    restore_point = manager.list_backups()[-1]['id']
+    manager.get_stats_summary()
+    manager.get_iterations_using('SHOP02')
+
+    # Depois do ponto de restauração
+    manager.save_substitutes(3, [])
+    manager.save_substitutes(2, [substitute('KDB11')])
+    manager.save_substitutes(4, [substitute('SHOP02')])
+    assert manager.get_skipped_count() == 1
+
+    assert manager.restore_backup(restore_point)
+    assert manager.get_skipped_count() == 1
+    assert manager.get_saved_substitutes(2) == []
+    assert manager.get_saved_substitutes(4) == []
+    assert manager.get_completed_count() == 1
+    summary = manager.get_stats_summary()
+    assert summary['skipped'] == 1
+    assert manager.get_iterations_using('SHOP02') == [(1, 1)]
+    if storage == 'csv':
+        with open(manager.state_path, encoding='utf-8') as f:
+            assert json.load(f)['skipped'] == [2]
+
+
+def test_restore_replays_deltas_in_order(make_manager, monkeypatch):
+    monkeypatch.setenv('BACKUP_FULL_EVERY', '10')
+    manager = make_manager(durability='sync', checkpoint_every=1)
+    manager.save_substitutes(1, [substitute('SHOP02')])
+    manager.save_substitutes(2, [])
+    manager.save_substitutes(2, [substitute('KDB11')])
+    manager.save_substitutes(3, [])
+    kinds = [entry['type'] for entry in manager.list_backups()]
+    assert kinds[0] == 'full' and set(kinds[1:]) == {'delta'}
+
+    manager.save_substitutes(5, [substitute('CT100')])
+    assert manager.restore_backup(manager.list_backups()[-2]['id'])
+    assert [sub['cod_produto'] for sub in manager.get_saved_substitutes(2)] == ['KDB11']
+    assert manager.get_skipped_count() == 1
+    assert manager.get_saved_substitutes(5) == []
+
+
+@pytest.mark.parametrize('storage', ['csv', 'sqlite'])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_restore_rewrites_the_full_output_layout(make_manager, storage, lazy, monkeypatch):
+    monkeypatch.setenv('BACKUP_FULL_EVERY', '3')
+    manager = make_manager(storage=storage, lazy=lazy, durability='sync', checkpoint_every=1)
+    manager.save_substitutes(1, [substitute('SHOP02')])
+    manager.save_substitutes(3, [substitute('KDB11')])
+    restore_point = manager.list_backups()[-1]['id']
+    manager.save_substitutes(4, [substitute('CT100')])
+
+    assert manager.restore_backup(restore_point)
+    output = pd.read_csv(manager.output_path)
+    # Uma linha por iteração da Base_Fazer, não só as preenchidas
+    assert output['n_iteracao'].tolist() == [1, 2, 3, 4, 5]
+    assert output['sub1_cod_produto'].notna().tolist() == [True, False, True, False, False]
@@ -0,0 +1,102 @@
+"""
+Testes do catálogo: recarga incremental, snapshots, arquivo colunar (mmap)
+e preços por loja
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import CATALOG_ROWS, _write_csv
+
+pytest.importorskip('fuzzywuzzy')
+from catalog_file import ColumnarCatalog, read_source_signature  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+
+HEADER = 'id_modelo,cod_produto,nome,preco_loja_programada,preco_loja_fresh,'
+
+
+@pytest.fixture(params=['memoria', 'mmap'])
+def processor(request, catalog_csv, tmp_path, monkeypatch):
+    monkeypatch.delenv('PRICE_STORE', raising=False)
+    monkeypatch.delenv('STORE_PRICE_FILES', raising=False)
+    catalog_file = str(tmp_path / 'catalogo.bin') if request.param == 'mmap' else ''
+    return DataProcessor(str(catalog_csv), catalog_file=catalog_file)
+
+
+def _rewrite(path, rows):
+    """Regrava o catálogo com outra assinatura (tamanho/mtime)"""
+    _write_csv(path, HEADER, [row + ('',) for row in rows])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_reload_reports_changes_and_matches_a_full_load(processor, catalog_csv):
+    rows = [row for row in CATALOG_ROWS if row[1] != 'SHOP03']
+    rows[0] = (1, 'SHOP01', 'QUEIJO RALADO TIROLEZ 100G', '11,90', '12,00')
+    rows.append((9, 'NEW01', 'ÁGUA MINERAL CRYSTAL 500ML', '2,50', ''))
+    _rewrite(catalog_csv, rows)
+    assert processor.has_file_changed()
+
+    changes = processor.reload()
+    assert changes == {'inserted': ['NEW01'], 'updated': ['SHOP01'], 'deleted': ['SHOP03']}
+    assert not processor.has_file_changed()
+
+    fresh = DataProcessor(str(catalog_csv), catalog_file='')
+    columns = ['cod_produto', 'nome', 'preco_loja_programada', 'nome_normalizado']
+    pd.testing.assert_frame_equal(
+        processor.df_ativos[columns].reset_index(drop=True).astype(str),
+        fresh.df_ativos[columns].reset_index(drop=True).astype(str)
+    )
+
+
+def test_reload_publishes_a_new_snapshot_and_keeps_the_old_one(processor, catalog_csv):
+    before = processor.snapshot
+    assert processor.reload() == {'inserted': [], 'updated': [], 'deleted': []}
+    assert processor.snapshot.version == before.version
+
+    _rewrite(catalog_csv, [row for row in CATALOG_ROWS if row[1] != 'KDB10'])
+    processor.reload()
+
+    after = processor.snapshot
+    assert after is not before and after.version == before.version + 1
+    # Quem guardou o snapshot anterior continua enxergando o catálogo antigo
+    assert 'KDB10' in before.codes and 'KDB10' not in after.codes
+    assert processor.get_product_by_code('KDB10', snapshot=before)['nome'] == 'LEITE SEMI-DESNATADO ITALAC 1L'
+    assert processor.get_product_by_code('KDB10') is None
+
+
+def test_catalog_file_is_shared_between_processes(catalog_csv, tmp_path):
+    catalog_file = str(tmp_path / 'catalogo.bin')
+    first = DataProcessor(str(catalog_csv), catalog_file=catalog_file)
+    assert read_source_signature(catalog_file) == first.snapshot.signature
+
+    # Outro processo com o mesmo CSV só abre o arquivo, sem reler o CSV
+    second = DataProcessor(str(catalog_csv), catalog_file=catalog_file)
+    assert second.snapshot.columnar is not None and second.snapshot._df is None
+    assert second.get_product_by_code('SHOP02')['nome'] == 'QUEIJO RALADO VIGOR 100G'
+
+    columnar = ColumnarCatalog(catalog_file)
+    assert len(columnar) == len(CATALOG_ROWS)
+    assert columnar.column('cod_produto').tolist() == [row[1] for row in CATALOG_ROWS]
+    assert columnar.contains('nome_normalizado', 'leite').tolist() == [3, 4]
+
+
+def test_store_prices_share_the_catalog_index(processor):
+    assert processor.stores == ['loja_programada', 'loja_fresh']
+    assert processor.get_product_by_code('SHOP01', store='loja_fresh')['preco_loja_programada'] == '7,00'
+
+    matched = processor.load_store_prices('loja_sul', pd.DataFrame({
+        'cod_produto': ['SHOP01', 'KDB11', 'FORA'],
+        'preco_loja_sul': ['6,00', '5,90', '1,00'],
+    }))
+    assert matched == 2
+    assert 'loja_sul' in processor.stores
+
+    positions = processor.snapshot.codes.get_indexer(['KDB11', 'SHOP02', 'NAO_EXISTE'])
+    prices = processor.snapshot.store_prices('loja_sul', positions)
+    assert prices[0] == '5,90' and pd.isna(prices[1]) and pd.isna(prices[2])
+
+    with pytest.raises(ValueError):
+        processor.snapshot.store_prices('loja_inexistente', positions)
@@ -0,0 +1,71 @@
+"""
+Testes de gravação do FileManager (journal, durabilidade, checkpoints)
+"""
+
+import json
+
+import pytest
+
+from conftest import substitute
+
+
+def test_default_durability_is_sync_and_durable_on_return(make_manager, tmp_path):
+    manager = make_manager()
+    assert manager.durability == 'sync' and manager.writer is None
+    manager.save_substitutes(1, [substitute('SHOP02')])
+
+    # Sem close(): outra instância (como após uma queda) enxerga o salvamento pelo journal
+    with open(manager.journal_path, encoding='utf-8') as f:
+        assert [json.loads(line)['n'] for line in f] == [1]
+    reopened = make_manager(output_path=str(tmp_path / 'substituicoes.csv'))
+    assert [sub['cod_produto'] for sub in reopened.get_saved_substitutes(1)] == ['SHOP02']
+
+
+@pytest.mark.parametrize('durability', ['journal', 'debounced'])
+def test_background_modes_are_opt_in_and_flush_on_close(make_manager, tmp_path, durability):
+    manager = make_manager(durability=durability, debounce=0.05)
+    for n in range(1, 4):
+        manager.save_substitutes(n, [substitute('SHOP02')])
+    assert manager.get_completed_count() == 3
+    manager.close()
+
+    reopened = make_manager(output_path=str(tmp_path / 'substituicoes.csv'), durability='sync')
+    assert reopened.get_completed_count() == 3
+
+
+def test_checkpoint_consolidates_journal(make_manager, tmp_path):
+    manager = make_manager(durability='sync', checkpoint_every=2)
+    manager.save_substitutes(1, [substitute('SHOP02')])
+    manager.save_substitutes(2, [])
+    assert open(manager.journal_path, encoding='utf-8').read() == ''
+
+    manager.save_substitutes(3, [substitute('CT101'), substitute('CT100')])
+    reopened = make_manager(output_path=str(tmp_path / 'substituicoes.csv'))
+    assert reopened.get_skipped_count() == 1
+    assert [sub['cod_produto'] for sub in reopened.get_saved_substitutes(3)] == ['CT101', 'CT100']
+
+
+def test_truncated_journal_line_is_ignored(make_manager, tmp_path):
+    manager = make_manager(durability='sync')
+    manager.save_substitutes(1, [substitute('SHOP02')])
+    with open(manager.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"n": 2, "subs": [{"cod_')
+
+    reopened = make_manager(output_path=str(tmp_path / 'substituicoes.csv'))
+    assert reopened.get_completed_count() == 1
+    assert reopened.get_saved_substitutes(2) == []
+
+
+@pytest.mark.parametrize('storage', ['csv', 'sqlite'])
+def test_read_saved_long_is_read_only(make_manager, tmp_path, storage):
+    from file_manager import read_saved_long
+
+    manager = make_manager(storage=storage)
+    manager.save_substitutes(1, [substitute('SHOP02', '9,90'), substitute('KDB10')])
+    manager.save_substitutes(3, [substitute('CT101')])
+
+    before = sorted(p.name for p in tmp_path.rglob('*'))
+    long_df = read_saved_long(str(tmp_path / 'substituicoes.csv'), storage=storage)
+    assert sorted(p.name for p in tmp_path.rglob('*')) == before
+    assert long_df.equals(manager.get_long_output())
+    assert long_df['cod_produto'].tolist() == ['SHOP02', 'KDB10', 'CT101']
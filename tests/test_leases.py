@@ -0,0 +1,139 @@
+"""
+Testes das saídas por revisor e do merge (leases)
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import substitute
+from leases import LeaseError, LeaseManager, find_reviewer_outputs, merge_outputs
+
+
+@pytest.fixture
+def reviewers(make_manager, tmp_path, monkeypatch):
+    """Dois revisores no mesmo diretório, com faixas de 2 iterações"""
+    monkeypatch.setenv('LEASE_CHUNK_SIZE', '2')
+    ana = make_manager(reviewer='Ana', output_path=str(tmp_path / 'substituicoes_ana.csv'), durability='sync')
+    bruno = make_manager(reviewer='Bruno', output_path=str(tmp_path / 'substituicoes_bruno.csv'), durability='sync')
+    return ana, bruno
+
+
+def test_lease_files_are_exclusive_and_expire(tmp_path):
+    leases = LeaseManager(str(tmp_path / 'leases'), ttl=60, chunk_size=10)
+    lease = leases.acquire('ana', 3)
+    assert (lease.start, lease.end) == (1, 10)
+    with pytest.raises(LeaseError):
+        leases.acquire('bruno', 7)
+    assert leases.holder(7) == 'ana'
+    assert leases.acquire_next('bruno', [5, 12]).start == 11
+
+    # Reserva expirada pode ser tomada
+    expired = LeaseManager(str(tmp_path / 'leases'), ttl=-1, chunk_size=10)
+    expired.renew(lease)
+    assert leases.holder(3) is None
+    assert leases.acquire('bruno', 3).reviewer == 'bruno'
+
+
+def test_renew_never_overwrites_a_takeover(tmp_path, monkeypatch):
+    ana = LeaseManager(str(tmp_path / 'leases'), ttl=-1, chunk_size=10)
+    bruno = LeaseManager(str(tmp_path / 'leases'), ttl=60, chunk_size=10)
+    lease = ana.acquire('ana', 3)
+
+    # Bruno tenta tomar a reserva expirada no meio da renovação de Ana
+    read = ana._read
+    attempts = []
+
+    def read_then_takeover(path):
+        data = read(path)
+        try:
+            attempts.append(bruno.acquire('bruno', 3))
+        except LeaseError as e:
+            attempts.append(e)
+        return data
+
+    monkeypatch.setattr(ana, '_read', read_then_takeover)
+    ana.renew(lease)
+    assert isinstance(attempts[0], LeaseError)
+    assert ana.holder(3) is None  # Ana renovou com ttl=-1
+
+    # Depois da renovação, a tomada acontece e a próxima renovação é perdida
+    monkeypatch.setattr(ana, '_read', read)
+    assert bruno.acquire('bruno', 3).reviewer == 'bruno'
+    with pytest.raises(LeaseError):
+        ana.renew(lease)
+    ana.release(lease)
+    assert bruno.holder(3) == 'bruno'
+    assert sorted(os.listdir(tmp_path / 'leases')) == ['faixa_000001.lease']
+
+
+def test_opening_an_iteration_does_not_reserve(reviewers):
+    ana, bruno = reviewers
+    ana.get_item_by_iteration(1)
+    assert ana.leases.active_leases() == []
+    assert bruno.reserved_by_other(1) is None
+
+
+def test_save_reserves_and_other_reviewer_is_refused(reviewers):
+    ana, bruno = reviewers
+    ana.save_substitutes(1, [substitute('SHOP02')])
+    assert bruno.reserved_by_other(2) == 'Ana'
+    assert ana.reserved_by_other(2) is None
+
+    with pytest.raises(LeaseError):
+        bruno.save_substitutes(2, [substitute('KDB11')])
+    assert bruno.get_saved_substitutes(2) == []
+
+    # Faixa livre: reservada no primeiro salvamento
+    bruno.save_substitutes(3, [substitute('CT101')])
+    assert ana.reserved_by_other(4) == 'Bruno'
+
+
+def test_release_leases_keeps_only_current_range(reviewers):
+    ana, bruno = reviewers
+    ana.save_substitutes(1, [substitute('SHOP02')])
+    ana.save_substitutes(3, [substitute('CT101')])
+    assert len(ana.leases.active_leases()) == 2
+
+    ana.release_leases(keep=4)
+    assert [(lease.start, lease.end) for lease in ana.leases.active_leases()] == [(3, 4)]
+    assert bruno.reserved_by_other(1) is None
+    bruno.save_substitutes(1, [substitute('KDB11')])
+    assert os.path.exists(bruno.output_path)
+
+
+def test_long_export_is_not_taken_for_a_reviewer(make_manager, tmp_path):
+    manager = make_manager(durability='sync')
+    manager.save_substitutes(1, [substitute('SHOP02')])
+    export_path = manager.export_long()
+    manager.export_columnar()
+    assert 'exports' in export_path
+
+    # Exportação antiga gravada com o nome antigo, no padrão das saídas de revisor
+    pd.read_csv(export_path).to_csv(tmp_path / 'substituicoes_long.csv', index=False)
+    ana = make_manager(output_path=str(tmp_path / 'substituicoes_ana.csv'), durability='sync')
+    ana.save_substitutes(2, [substitute('KDB11')])
+
+    outputs = find_reviewer_outputs(str(tmp_path))
+    assert set(outputs) == {'ana'}
+
+    report = merge_outputs(outputs, str(tmp_path / 'merged.csv'))
+    assert report['mesclados'] == 1
+    merged = pd.read_csv(tmp_path / 'merged.csv')
+    assert merged.loc[merged['n_iteracao'] == 2, 'sub1_cod_produto'].item() == 'KDB11'
+
+
+def test_merge_prefers_responsible_on_conflict(make_manager, tmp_path):
+    ana = make_manager(output_path=str(tmp_path / 'substituicoes_ana.csv'), durability='sync')
+    carla = make_manager(output_path=str(tmp_path / 'substituicoes_carla.csv'), durability='sync')
+    ana.save_substitutes(3, [substitute('SHOP01')])
+    carla.save_substitutes(3, [substitute('CT101')])
+    carla.save_substitutes(4, [substitute('CT100')])
+
+    responsible = pd.Series({3: 'Carla', 4: 'Carla'})
+    report = merge_outputs(find_reviewer_outputs(str(tmp_path)), str(tmp_path / 'merged.csv'), responsible)
+    assert report['conflitos'] == [3]
+    merged = pd.read_csv(tmp_path / 'merged.csv').set_index('n_iteracao')
+    assert merged.loc[3, 'sub1_cod_produto'] == 'CT101'
+    assert report['por_revisor'] == {'carla': 2}
@@ -0,0 +1,112 @@
+"""
+Testes do cliente resiliente (limite de taxa, retry e cota esgotada)
+"""
+
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from llm_client import RateLimiter, ResilientChatClient, TokenBucket, is_quota_error
+
+
+def _rate_limit_error(code='rate_limit_exceeded'):
+    response = SimpleNamespace(status_code=429, headers={'retry-after': '0'}, request=None)
+    return openai.RateLimitError('429', response=response, body={'code': code, 'message': '429'})
+
+
+class FlakyClient:
+    """Cliente falso: levanta os erros da lista antes de responder"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(choices=[], usage=None)
+
+
+def _client(errors, **kwargs):
+    kwargs.setdefault('base_delay', 0.0)
+    return ResilientChatClient(FlakyClient(errors), **kwargs)
+
+
+def test_zero_limits_mean_unlimited():
+    bucket = TokenBucket(0)
+    assert bucket.wait_time(10**6, time.monotonic()) == 0.0
+
+    limiter = RateLimiter(0, 0)
+    start = time.monotonic()
+    for _ in range(100):
+        limiter.acquire(10**6)
+    assert time.monotonic() - start < 0.5
+
+
+def test_request_bucket_blocks_when_empty():
+    bucket = TokenBucket(60)  # 1 por segundo
+    now = time.monotonic()
+    bucket.consume(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0, abs=0.05)
+
+
+def test_transient_rate_limit_is_retried():
+    client = _client([_rate_limit_error(), _rate_limit_error()])
+    stats = {}
+    client.create(stats=stats, messages=[], max_tokens=10)
+    assert client.client.calls == 3
+    assert stats['retries'] == 2
+
+
+def test_insufficient_quota_fails_fast():
+    error = _rate_limit_error('insufficient_quota')
+    assert is_quota_error(error)
+
+    client = _client([error, error])
+    with pytest.raises(openai.RateLimitError):
+        client.create(messages=[], max_tokens=10)
+    assert client.client.calls == 1
+
+    client = _client([error])
+    with pytest.raises(openai.RateLimitError):
+        list(client.stream(messages=[], max_tokens=10))
+    assert client.client.calls == 1
+    assert client.concurrency.in_flight == 0
+
+
+def test_retries_give_up_after_max_retries():
+    client = _client([_rate_limit_error()] * 3, max_retries=2)
+    with pytest.raises(openai.RateLimitError):
+        client.create(messages=[], max_tokens=10)
+    assert client.client.calls == 3
+    assert client.concurrency.in_flight == 0
+
+
+def test_concurrency_halves_on_throttle():
+    client = _client([_rate_limit_error()], max_concurrency=8)
+    assert int(client.concurrency.limit) == 4
+    client.create(messages=[], max_tokens=10)
+    assert int(client.concurrency.limit) == 2
+
+
+def test_stream_releases_the_slot_before_the_consumer_finishes():
+    usage = SimpleNamespace(total_tokens=20)
+    chunks = [SimpleNamespace(choices=[], usage=None), SimpleNamespace(choices=[], usage=usage)]
+    client = _client([])
+    client.client.chat.completions.create = lambda **kwargs: iter(chunks)
+
+    stats = {}
+    stream = client.stream(stats=stats, messages=[], max_tokens=10)
+    assert next(stream) is chunks[0]
+    # Consumidor ainda no primeiro chunk: a resposta HTTP já terminou e a vaga voltou
+    deadline = time.monotonic() + 5
+    while client.concurrency.in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.concurrency.in_flight == 0
+
+    assert list(stream) == chunks[1:]
+    assert stats['usage'] is usage
@@ -0,0 +1,55 @@
+"""
+Testes das exportações longa e colunar da saída
+"""
+
+import pandas as pd
+import pytest
+
+import output_export
+from conftest import substitute
+from output_export import parse_price_cents, read_columnar, wide_to_long, write_columnar
+
+
+def test_parse_price_cents_handles_brazilian_formats():
+    prices = pd.Series(['1.234,56', 'R$ 10,99', '5.5', 7, '', None, 'abc'])
+    assert parse_price_cents(prices).tolist() == [123456, 1099, 550, 700, pd.NA, pd.NA, pd.NA]
+
+
+def test_wide_to_long_keeps_only_filled_positions():
+    wide = pd.DataFrame({'n_iteracao': [2, 1]})
+    for rank in range(1, 6):
+        wide[f'sub{rank}_cod_produto'] = pd.Series([None, None], dtype=object)
+        wide[f'sub{rank}_preco_loja_programada'] = pd.Series([None, None], dtype=object)
+    wide.loc[0, ['sub1_cod_produto', 'sub1_preco_loja_programada']] = ['B1', '2,00']
+    wide.loc[1, ['sub1_cod_produto', 'sub3_cod_produto', 'sub3_preco_loja_programada']] = ['A1', 'A3', '3,50']
+
+    long_df = wide_to_long(wide)
+    assert long_df[['n_iteracao', 'rank', 'cod_produto']].values.tolist() == [[1, 1, 'A1'], [1, 3, 'A3'], [2, 1, 'B1']]
+    assert long_df['price_cents'].tolist() == [pd.NA, 350, 200]
+    assert str(long_df['n_iteracao'].dtype) == 'int32' and str(long_df['rank'].dtype) == 'int8'
+
+
+def test_npz_round_trip_keeps_missing_prices(tmp_path, monkeypatch):
+    monkeypatch.setattr(output_export, 'PARQUET_AVAILABLE', False)
+    long_df = pd.DataFrame({
+        'n_iteracao': pd.Series([1, 1], dtype='int32'),
+        'rank': pd.Series([1, 2], dtype='int8'),
+        'cod_produto': ['A', 'B'],
+        'price_cents': pd.Series([199, pd.NA], dtype='Int64'),
+    })
+
+    path = write_columnar(long_df, str(tmp_path / 'out'))
+    assert path.endswith('.npz')
+    assert read_columnar(path)['price_cents'].tolist() == [199, pd.NA]
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_manager_exports_next_to_the_output(make_manager, tmp_path, backend):
+    manager = make_manager(durability='sync', storage=backend)
+    manager.save_substitutes(1, [substitute('SHOP02', '9,90'), substitute('CT100', '')])
+
+    path = manager.export_long()
+    assert path.startswith(str(tmp_path / 'exports'))
+    exported = pd.read_csv(path, dtype={'cod_produto': str})
+    assert exported['cod_produto'].tolist() == ['SHOP02', 'CT100']
+    assert exported['price_cents'].fillna(-1).tolist() == [990, -1]
@@ -0,0 +1,59 @@
+"""
+Testes das estatísticas de progresso com recortes
+"""
+
+import threading
+import time
+
+import pytest
+
+import file_manager
+from conftest import substitute
+
+
+def test_lazy_stats_build_in_background_without_blocking_saves(make_manager, monkeypatch):
+    manager = make_manager(lazy=True, durability='sync')
+    scanning = threading.Event()
+    original = file_manager.group_columns_from_chunks
+
+    def slow_scan(chunks):
+        scanning.set()
+        time.sleep(0.5)
+        return original(chunks)
+
+    monkeypatch.setattr(file_manager, 'group_columns_from_chunks', slow_scan)
+    worker = manager.warm_stats()
+    assert scanning.wait(5)
+
+    # A varredura da Base_Fazer não segura o lock dos salvamentos
+    started = time.perf_counter()
+    manager.save_substitutes(1, [substitute(f'SHOP0{i}') for i in range(1, 5)] + [substitute('KDB10')])
+    assert time.perf_counter() - started < 0.4
+
+    worker.join(5)
+    summary = manager.get_stats_summary()
+    assert summary['completed'] == 1 and summary['full'] == 1
+
+
+@pytest.mark.parametrize('storage', ['csv', 'sqlite'])
+def test_breakdown_and_duplicates_follow_saves(make_manager, storage):
+    manager = make_manager(storage=storage, durability='sync')
+    manager.save_substitutes(1, [substitute('SHOP02'), substitute('SHOP03')])
+    # Estatísticas montadas; os salvamentos seguintes são aplicados incrementalmente
+    assert manager.get_stats_summary()['completed'] == 1
+
+    manager.save_substitutes(3, [substitute('SHOP02')])
+    manager.save_substitutes(4, [])
+
+    summary = manager.get_stats_summary()
+    assert (summary['completed'], summary['partial'], summary['skipped'], summary['pending']) == (2, 2, 1, 2)
+    assert manager.get_duplicate_codes() == {'SHOP02': 2}
+
+    breakdown = manager.get_stats_breakdown('Responsável')
+    assert breakdown.loc['Carla', ['total', 'completed', 'skipped', 'pending']].tolist() == [2, 1, 1, 0]
+    assert breakdown.loc['Pietro', 'percent'] == pytest.approx(33.3)
+    assert manager.get_group_progress('Subcategoria', 'Mercearia')['completed'] == 1
+    assert manager.get_group_progress('Subcategoria', 'Inexistente')['total'] == 0
+
+    with pytest.raises(ValueError):
+        manager.get_stats_breakdown('Fornecedor')
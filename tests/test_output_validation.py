@@ -0,0 +1,62 @@
+"""
+Testes da validação da saída contra o catálogo e da atualização de preços
+"""
+
+import pandas as pd
+import pytest
+
+from conftest import substitute
+from output_validation import load_catalog, store_catalog
+
+
+@pytest.fixture
+def fresh_saved(make_manager, catalog_csv, monkeypatch):
+    """Saída com os preços da loja_fresh, como a interface salva com PRICE_STORE=loja_fresh"""
+    monkeypatch.setenv('PRICE_STORE', 'loja_fresh')
+    manager = make_manager(durability='sync')
+    manager.save_substitutes(1, [substitute('SHOP01', '7,00'), substitute('SHOP03', '4,00')])
+    manager.save_substitutes(2, [substitute('KDB10', '5,50')])
+    return manager, load_catalog(str(catalog_csv))
+
+
+def test_validation_uses_the_search_store(fresh_saved):
+    manager, catalog = fresh_saved
+    report = manager.validate_against_catalog(catalog)
+    assert report['resumo']['preco_desatualizado'] == 0
+
+    # Contra a loja_programada todos os preços estão diferentes
+    report = manager.validate_against_catalog(catalog, store='loja_programada')
+    assert report['resumo']['preco_desatualizado'] == 3
+
+
+def test_refresh_keeps_prices_of_the_search_store(fresh_saved):
+    manager, catalog = fresh_saved
+    assert len(manager.refresh_prices(catalog)) == 0
+    assert manager.get_saved_substitutes(1)[0]['preco_loja_programada'] == '7,00'
+
+
+def test_store_catalog_from_snapshot_and_unknown_store(catalog_csv):
+    pytest.importorskip('fuzzywuzzy')
+    from data_processor import DataProcessor
+
+    processor = DataProcessor(str(catalog_csv), catalog_file='')
+    processor.load_store_prices('loja_centro', pd.DataFrame({'cod_produto': ['SHOP01'], 'preco': ['1,11']}))
+    prices = store_catalog(processor.snapshot, 'loja_centro').set_index('cod_produto')['preco_loja_programada']
+    assert prices['SHOP01'] == '1,11' and pd.isna(prices['SHOP02'])
+
+    with pytest.raises(ValueError):
+        store_catalog(load_catalog(str(catalog_csv)), 'loja_centro')
+
+
+
+def test_empty_stored_price_is_flagged_and_refreshed(make_manager, catalog_csv):
+    manager = make_manager(durability='sync')
+    manager.save_substitutes(1, [substitute('SHOP02', '')])
+    catalog = load_catalog(str(catalog_csv))
+
+    report = manager.validate_against_catalog(catalog)
+    assert report['resumo']['preco_desatualizado'] == 1
+
+    changes = manager.refresh_prices(catalog)
+    assert changes['preco_novo'].tolist() == ['9,90']
+    assert manager.validate_against_catalog(catalog)['resumo']['preco_desatualizado'] == 0
@@ -0,0 +1,101 @@
+"""
+Testes do pré-carregamento das próximas iterações
+"""
+
+import threading
+import time
+
+import pytest
+
+from prefetcher import IterationPrefetcher
+
+
+@pytest.fixture
+def prefetcher():
+    started = []
+
+    def fetch(n, is_obsolete):
+        started.append(n)
+        return [{'cod_produto': f'P{n}'}]
+
+    prefetcher = IterationPrefetcher(fetch, lookahead=3, max_workers=1)
+    prefetcher.started = started
+    yield prefetcher
+    prefetcher.shutdown()
+
+
+def test_schedules_the_next_iterations_and_take_consumes(prefetcher):
+    prefetcher.schedule(10, max_iteration=12)
+    assert prefetcher.take(11, timeout=5) == [{'cod_produto': 'P11'}]
+    assert prefetcher.take(12, timeout=5) == [{'cod_produto': 'P12'}]
+    assert sorted(prefetcher.started) == [11, 12]
+    # Consumido: a próxima consulta refaz a busca
+    assert prefetcher.take(11) is None
+
+
+def test_jumping_away_aborts_obsolete_work():
+    release = threading.Event()
+    aborted = []
+
+    def fetch(n, is_obsolete):
+        release.wait(5)
+        if is_obsolete():
+            aborted.append(n)
+            return None
+        return [n]
+
+    prefetcher = IterationPrefetcher(fetch, lookahead=2, max_workers=1)
+    try:
+        prefetcher.schedule(1)
+        time.sleep(0.05)
+        prefetcher.schedule(100)
+        release.set()
+        assert prefetcher.take(101, timeout=5) == [101]
+        assert 2 in aborted
+        assert prefetcher.take(2) is None
+    finally:
+        prefetcher.shutdown()
+
+
+def test_lookahead_zero_disables(prefetcher):
+    prefetcher.lookahead = 0
+    prefetcher.schedule(1)
+    assert prefetcher.take(2) is None and prefetcher.started == []
+
+
+def test_clear_drops_ready_results(prefetcher):
+    prefetcher.schedule(1, max_iteration=2)
+    deadline = time.time() + 5
+    while 2 not in prefetcher._results and time.time() < deadline:
+        time.sleep(0.01)
+    prefetcher.clear()
+    assert prefetcher.take(2) is None
+
+
+def test_clear_discards_fetches_in_flight():
+    started = threading.Event()
+    release = threading.Event()
+    catalog = {'versao': 1}
+
+    def fetch(n, is_obsolete):
+        version = catalog['versao']
+        started.set()
+        release.wait(5)
+        return [{'cod_produto': f'P{n}', 'versao': version}]
+
+    prefetcher = IterationPrefetcher(fetch, lookahead=1, max_workers=1)
+    try:
+        prefetcher.schedule(1, max_iteration=2)
+        assert started.wait(5)
+
+        # Catálogo recarregado enquanto a busca da iteração 2 está bloqueada
+        catalog['versao'] = 2
+        prefetcher.clear()
+        release.set()
+        prefetcher._executor.submit(lambda: None).result(timeout=5)
+        assert prefetcher.take(2) is None
+
+        prefetcher.schedule(1, max_iteration=2)
+        assert prefetcher.take(2, timeout=5) == [{'cod_produto': 'P2', 'versao': 2}]
+    finally:
+        prefetcher.shutdown()
@@ -0,0 +1,77 @@
+"""
+Testes da detecção de famílias e da derivação de termos
+"""
+
+from product_families import derive_terms, detect_families
+
+
+def _item(nome, fornecedor, subcategoria='Padaria', **extra):
+    return dict(nome=nome, Fornecedor=fornecedor, Subcategoria=subcategoria, **extra)
+
+
+def _family_of(families, name):
+    return next(f for f in families if name in f.members)
+
+
+def test_supplier_tokens_do_not_make_different_products_a_family():
+    families = detect_families([
+        _item('MINI PÃO BRIOCHE DE COCO GALERIA DOS PÃES 240G', 'Galeria dos Pães'),
+        _item('MINI PÃO BRIOCHE DE CHOCOLATE GALERIA DOS PÃES 240G', 'Galeria dos Pães'),
+        _item('MINI PÃO CIABATTA GALERIA DOS PÃES 240G', 'Galeria dos Pães'),
+        _item('MINI BROA DE FUBÁ GALERIA DOS PÃES 240G', 'Galeria dos Pães'),
+    ])
+
+    brioche = _family_of(families, 'MINI PÃO BRIOCHE DE COCO GALERIA DOS PÃES 240G')
+    assert brioche.members == [
+        'MINI PÃO BRIOCHE DE COCO GALERIA DOS PÃES 240G',
+        'MINI PÃO BRIOCHE DE CHOCOLATE GALERIA DOS PÃES 240G',
+    ]
+    assert len(_family_of(families, 'MINI PÃO CIABATTA GALERIA DOS PÃES 240G')) == 1
+    assert len(_family_of(families, 'MINI BROA DE FUBÁ GALERIA DOS PÃES 240G')) == 1
+
+
+def test_sweet_and_savory_crepes_stay_apart():
+    supplier = 'ÈZE CRÊPERIE FÁBRICA DE CONGELADOS LTDA.'
+    families = detect_families([
+        _item('CREPE FRANCÊS CONGELADO ÈZE CRÊPERIE DE CALABRESA COM CATUPIRY 200G', supplier, 'Pratos Prontos'),
+        _item('CREPE FRANCÊS CONGELADO ÈZE CRÊPERIE DE FRANGO COM CATUPIRY 200G', supplier, 'Pratos Prontos'),
+        _item('CREPE FRANCÊS CONGELADO ÈZE CRÊPERIE DE NUTELLA 200G', supplier, 'Pratos Prontos'),
+    ])
+
+    assert len(_family_of(families, 'CREPE FRANCÊS CONGELADO ÈZE CRÊPERIE DE NUTELLA 200G')) == 1
+    assert len(_family_of(families, 'CREPE FRANCÊS CONGELADO ÈZE CRÊPERIE DE FRANGO COM CATUPIRY 200G')) == 2
+
+
+def test_category_and_size_cap_split_blocks():
+    families = detect_families([
+        _item('IOGURTE NATURAL VIGOR 170G', 'VIGOR', 'Iogurtes'),
+        _item('IOGURTE NATURAL VIGOR 500G', 'VIGOR', 'Sobremesas'),
+    ])
+    assert [len(f) for f in families] == [1, 1]
+
+    sizes = [_item(f'AGUA DE COCO VERO {ml}ML', 'VERO', 'Bebidas') for ml in range(100, 1100, 100)]
+    assert [len(f) for f in detect_families(sizes, max_family_size=4)] == [4, 4, 2]
+
+
+def test_representative_keeps_its_price():
+    family = detect_families([
+        _item('QUEIJO RALADO TIROLEZ 50G', 'TIROLEZ', 'Frios', preco_loja_programada='8,99'),
+        _item('QUEIJO RALADO TIROLEZ 100G', 'TIROLEZ', 'Frios', preco_loja_programada='15,99'),
+    ])[0]
+    assert family.representative_price == '8,99'
+
+
+def test_derive_swaps_variant_and_size():
+    terms = ['iogurte probiotico activia morango 170g', 'iogurte activia morango', 'iogurte probiotico', 'iogurte', 'iogurte']
+    derived = derive_terms('IOGURTE PROBIÓTICO ACTIVIA MORANGO 170G', terms, 'IOGURTE PROBIÓTICO ACTIVIA AMEIXA 800G')
+    assert derived[:3] == ['iogurte probiotico activia ameixa 800g', 'iogurte activia ameixa', 'iogurte probiotico']
+
+
+def test_derive_keeps_member_tokens_without_representative_variant():
+    terms = ['queijo ralado 50g', 'queijo ralado', 'queijo', 'queijo', 'queijo']
+    derived = derive_terms('QUEIJO RALADO 50G', terms, 'QUEIJO RALADO PARMESÃO 100G')
+    assert derived[:3] == ['queijo ralado parmesao 100g', 'queijo ralado parmesao', 'queijo']
+
+    # Sem âncora nos termos, o termo mais específico recebe a variante
+    derived = derive_terms('QUEIJO RALADO 50G', ['queijo 50g', 'queijo'], 'QUEIJO RALADO PARMESÃO 100G')
+    assert 'parmesao' in derived[0]
@@ -0,0 +1,97 @@
+"""
+Testes do armazenamento da saída, dos contadores de progresso e do índice
+reverso de substitutos (nos dois backends: csv e sqlite)
+"""
+
+import pytest
+
+from conftest import substitute
+
+BACKENDS = ['csv', 'sqlite']
+
+
+def _subs(*codes):
+    return [substitute(code) for code in codes]
+
+
+@pytest.mark.parametrize('storage', BACKENDS)
+def test_counters_follow_saves_overwrites_and_skips(make_manager, storage):
+    manager = make_manager(storage=storage, durability='sync')
+    assert manager.get_progress_counts() == {'total': 5, 'completed': 0, 'partial': 0, 'skipped': 0, 'pending': 5}
+
+    manager.save_substitutes(1, _subs('SHOP02', 'SHOP03'))
+    manager.save_substitutes(2, _subs('SHOP01', 'SHOP02', 'SHOP03', 'SHOP04', 'CT100'))
+    manager.save_substitutes(3, [])
+    assert manager.get_progress_counts() == {'total': 5, 'completed': 2, 'partial': 1, 'skipped': 1, 'pending': 2}
+    assert manager.get_sub_count_distribution() == {0: 3, 1: 0, 2: 1, 3: 0, 4: 0, 5: 1}
+
+    # Sobrescrever: pulada passa a preenchida e parcial passa a completa
+    manager.save_substitutes(3, _subs('KDB11'))
+    manager.save_substitutes(1, _subs('SHOP02', 'SHOP03', 'SHOP04', 'CT100', 'CT101'))
+    assert manager.get_progress_counts() == {'total': 5, 'completed': 3, 'partial': 1, 'skipped': 0, 'pending': 2}
+    assert [item['n_iteracao'] for item in manager.get_pending_items()] == [4, 5]
+    assert manager.get_progress_percentage() == pytest.approx(60.0)
+
+
+@pytest.mark.parametrize('storage', BACKENDS)
+def test_saves_survive_reopening(make_manager, tmp_path, storage):
+    output = str(tmp_path / 'substituicoes.csv')
+    manager = make_manager(storage=storage, durability='sync', output_path=output)
+    manager.save_substitutes(2, _subs('KDB11', 'SHOP02'))
+    manager.save_substitutes(4, [])
+    manager.close()
+
+    reopened = make_manager(storage=storage, output_path=output)
+    assert [sub['cod_produto'] for sub in reopened.get_saved_substitutes(2)] == ['KDB11', 'SHOP02']
+    assert reopened.get_progress_counts()['skipped'] == 1
+    assert reopened.get_item_by_iteration(2)['nome'] == 'LEITE SEMI-DESNATADO ITALAC 1L'
+
+
+def test_sqlite_imports_existing_csv_output(make_manager, tmp_path):
+    output = str(tmp_path / 'substituicoes.csv')
+    csv_manager = make_manager(durability='sync', output_path=output)
+    csv_manager.save_substitutes(1, _subs('SHOP02'))
+    csv_manager.save_substitutes(5, [])
+    csv_manager.close()
+
+    sqlite_manager = make_manager(storage='sqlite', output_path=output)
+    assert [sub['cod_produto'] for sub in sqlite_manager.get_saved_substitutes(1)] == ['SHOP02']
+    assert sqlite_manager.get_progress_counts()['skipped'] == 1
+
+
+@pytest.mark.parametrize('durability, level', [('sync', 2), ('journal', 1)])
+def test_sqlite_sync_durability_uses_full_synchronous(make_manager, durability, level):
+    manager = make_manager(storage='sqlite', durability=durability)
+    assert manager.store._conn.execute('PRAGMA synchronous').fetchone()[0] == level  # FULL=2, NORMAL=1
+    manager.close()
+
+
+@pytest.mark.parametrize('storage', BACKENDS)
+def test_reverse_index_tracks_saves(make_manager, storage):
+    manager = make_manager(storage=storage, durability='sync')
+    manager.save_substitutes(1, _subs('SHOP02', 'SHOP03'))
+    manager.save_substitutes(2, _subs('SHOP03'))
+    assert manager.get_iterations_using('SHOP03') == [(1, 2), (2, 1)]
+
+    # Índice já montado: atualizado a cada salvamento
+    manager.save_substitutes(2, _subs('CT100'))
+    assert manager.get_iterations_using('SHOP03') == [(1, 2)]
+    assert manager.get_iterations_using('CT100') == [(2, 1)]
+    assert manager.get_impact(['SHOP02', 'CT100'])[['n_iteracao', 'rank']].values.tolist() == [[1, 1], [2, 1]]
+
+
+@pytest.mark.parametrize('storage', BACKENDS)
+def test_requeue_affected_returns_iterations_to_pending(make_manager, storage):
+    manager = make_manager(storage=storage, durability='sync')
+    manager.save_substitutes(1, _subs('SHOP02', 'SHOP03'))
+    manager.save_substitutes(2, _subs('SHOP03'))
+    manager.save_substitutes(3, _subs('CT101'))
+
+    manager.requeue_affected(['SHOP03'], keep_others=True)
+    assert [sub['cod_produto'] for sub in manager.get_saved_substitutes(1)] == ['SHOP02']
+    assert manager.get_saved_substitutes(2) == []
+    assert [item['n_iteracao'] for item in manager.get_pending_items()] == [2, 4, 5]
+
+    manager.requeue_affected(['SHOP02'])
+    assert manager.get_progress_counts()['completed'] == 1
+    assert manager.get_iterations_using('SHOP02') == []
@@ -0,0 +1,77 @@
+"""
+Testes da thread de gravação em segundo plano
+"""
+
+import threading
+
+import pytest
+
+from save_writer import SaveWriter
+
+
+class Sink:
+    """Coleta os lotes gravados; pode falhar nas primeiras chamadas"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise OSError('disco cheio')
+            self.batches.append(batch)
+
+
+def test_debounced_mode_coalesces_saves_of_the_same_iteration():
+    sink = Sink()
+    writer = SaveWriter(sink, mode='debounced', debounce=0.2)
+    writer.submit(1, ['a'])
+    writer.submit(2, ['b'])
+    writer.submit(1, ['c'])
+
+    assert writer.flush(5)
+    assert sink.batches == [[(2, ['b']), (1, ['c'])]]
+    assert writer.coalesced == 1
+    assert writer.close(5)
+
+
+def test_failed_batch_is_retried_without_overwriting_newer_saves():
+    sink = Sink(failures=1)
+    gate = threading.Event()
+    writer = SaveWriter(sink, mode='journal', retry_delay=0.05)
+
+    original = writer.write_batch
+
+    def slow_first(batch):
+        gate.wait(5)
+        original(batch)
+
+    writer.write_batch = slow_first
+    writer.submit(1, ['velho'])
+    writer.submit(2, ['b'])
+    # Enquanto o primeiro lote (que vai falhar) está em gravação, chega um mais novo
+    writer.submit(1, ['novo'])
+    gate.set()
+
+    assert writer.flush(5)
+    written = dict(item for batch in sink.batches for item in batch)
+    assert written[1] == ['novo'] and written[2] == ['b']
+    assert writer.close(5)
+
+
+def test_close_writes_pending_and_rejects_new_saves():
+    sink = Sink()
+    writer = SaveWriter(sink, mode='debounced', debounce=10)
+    writer.submit(1, ['a'])
+    assert writer.close(5)
+    assert sink.batches == [[(1, ['a'])]]
+    with pytest.raises(RuntimeError):
+        writer.submit(2, ['b'])
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        SaveWriter(Sink(), mode='sync')
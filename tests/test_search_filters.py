@@ -0,0 +1,77 @@
+"""
+Testes dos pré-filtros da busca (search_filters + DataProcessor.search_products)
+"""
+
+import numpy as np
+import pytest
+
+from search_filters import parse_filter_expression
+
+pytest.importorskip('fuzzywuzzy')
+from data_processor import DataProcessor  # noqa: E402
+
+
+@pytest.fixture(params=['memoria', 'mmap'])
+def processor(request, catalog_csv, tmp_path):
+    catalog_file = str(tmp_path / 'catalogo.bin') if request.param == 'mmap' else ''
+    return DataProcessor(str(catalog_csv), catalog_file=catalog_file)
+
+
+def test_parse_keeps_hyphenated_words_in_term():
+    assert parse_filter_expression('coca-cola 2l') == ('coca-cola 2l', {})
+    assert parse_filter_expression('leite semi-desnatado 1l') == ('leite semi-desnatado 1l', {})
+
+
+def test_parse_collects_filters():
+    term, filters = parse_filter_expression('queijo preco:5-20 tamanho:40-100g prefixo:SHOP,kdb -tirolez sem:vigor')
+    assert term == 'queijo'
+    assert filters == {
+        'price': (5.0, 20.0),
+        'size': (40.0, 100.0, 'g'),
+        'prefix': ['SHOP', 'KDB'],
+        'exclude': ['tirolez', 'vigor'],
+    }
+    assert parse_filter_expression('-nestle leite')[1] == {'exclude': ['nestle']}
+
+
+def test_parse_ignores_invalid_values():
+    assert parse_filter_expression('queijo preco:abc tamanho:xg') == ('queijo', {})
+
+
+def test_filtered_search_equals_post_filtered(processor):
+    full = processor.search_products(['queijo', 'leite', 'cafe', 'biscoito'], max_results=100, min_similarity=101)
+    cases = {
+        'prefix': ({'prefix': ['KDB']}, lambda r: r['cod_produto'].str.startswith('KDB')),
+        'price': ({'price': (5, 10)}, lambda r: r['cod_produto'].isin(['SHOP01', 'SHOP02', 'KDB10', 'KDB11'])),
+        'size': ({'size': (100, 500, 'g')}, lambda r: r['cod_produto'].isin(['SHOP02', 'CT101', 'SHOP04'])),
+        'exclude': ({'exclude': ['Nestlé', 'santa clara']}, lambda r: ~r['cod_produto'].isin(['KDB11', 'SHOP04', 'CT101'])),
+    }
+    for name, (filters, keep) in cases.items():
+        got = processor.search_products(['queijo', 'leite', 'cafe', 'biscoito'], max_results=100,
+                                        min_similarity=101, filters=filters)
+        expected = full[keep(full).to_numpy()]
+        assert sorted(got['cod_produto']) == sorted(expected['cod_produto']), name
+
+
+def test_filtered_search_mixes_exact_and_fuzzy_matches(processor):
+    results = processor.search_products(['queijo ralado parmesao', 'queijo ralado tirolez'],
+                                        filters={'prefix': ['SHOP'], 'price': (5, 20)})
+    assert dict(zip(results['cod_produto'], results['tipo_match'])) == {'SHOP01': 'exato', 'SHOP02': 'fuzzy'}
+
+
+def test_filter_only_search_returns_candidates(processor):
+    results = processor.search_products([], filters={'prefix': ['CT']})
+    assert sorted(results['cod_produto']) == ['CT100', 'CT101']
+    assert set(results['tipo_match']) == {'filtro'}
+    assert len(processor.search_products([], original_product_code='CT100', filters={'prefix': ['CT']})) == 1
+
+
+def test_price_filter_uses_store_prices(processor):
+    mask = processor.snapshot.filters.mask({'price': (None, 4.0)}, 'loja_fresh')
+    codes = processor.snapshot.codes[np.flatnonzero(mask)]
+    assert sorted(codes) == ['SHOP03', 'SHOP04']
+
+
+def test_unknown_filter_key_raises(processor):
+    with pytest.raises(ValueError):
+        processor.search_products(['queijo'], filters={'marca': ['x']})
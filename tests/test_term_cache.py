@@ -0,0 +1,69 @@
+"""
+Testes do cache de termos (limite, versão, gravação agrupada)
+"""
+
+import json
+import threading
+
+from term_cache import TermCache
+
+
+def _cache(path, **kwargs):
+    kwargs.setdefault('save_delay', 0)
+    return TermCache(str(path), model='gpt-4o', prompt_hash='abc', **kwargs)
+
+
+def test_entries_of_another_version_are_dropped(tmp_path):
+    path = tmp_path / 'cache.json'
+    cache = _cache(path)
+    cache.put('queijo', ['queijo ralado', 'queijo'])
+    cache.save()
+
+    assert _cache(path).get('queijo') == ['queijo ralado', 'queijo']
+    assert TermCache(str(path), model='gpt-4o-mini', prompt_hash='abc').get('queijo') is None
+
+
+def test_lru_eviction_keeps_recent_entries(tmp_path):
+    cache = _cache(tmp_path / 'cache.json', max_entries=10)
+    for i in range(10):
+        cache.put(f'p{i}', [str(i)])
+    cache.get('p0')
+    cache.put('p10', ['10'])
+    assert 'p0' in cache and 'p10' in cache and 'p1' not in cache
+
+
+def test_concurrent_saves_never_lose_entries(tmp_path):
+    path = tmp_path / 'cache.json'
+    cache = _cache(path)
+
+    def writer(start):
+        for i in range(start, start + 50):
+            cache.put(f'p{i}', [str(i)])
+            cache.save()
+
+    threads = [threading.Thread(target=writer, args=(n * 50,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache.save()
+
+    with open(path, encoding='utf-8') as f:
+        assert len(json.load(f)['entries']) == 200
+
+
+def test_scheduled_save_batches_puts(tmp_path, monkeypatch):
+    path = tmp_path / 'cache.json'
+    cache = _cache(path, save_delay=60)
+    writes = []
+    original = TermCache.save
+    monkeypatch.setattr(TermCache, 'save', lambda self: (writes.append(1), original(self)))
+
+    for i in range(20):
+        cache.put(f'p{i}', [str(i)])
+        cache.schedule_save()
+    assert writes == [] and not path.exists()
+
+    cache.close()
+    assert len(writes) == 1
+    assert len(_cache(path)) == 20
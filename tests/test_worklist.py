@@ -0,0 +1,61 @@
+"""
+Testes da Base_Fazer sob demanda (índice de offsets e janelas)
+"""
+
+import os
+
+import pytest
+
+from conftest import substitute
+from worklist import WorklistIndex
+
+
+@pytest.fixture
+def quoted_base_fazer(tmp_path):
+    """Base_Fazer fora de ordem, com campo entre aspas contendo quebra de linha"""
+    path = tmp_path / 'Base_Fazer.csv'
+    path.write_text(
+        ',,,4,,,,\n'
+        'n_iteracao,id_modelo,cod_produto,nome,Fornecedor,Comprador,Responsável,Subcategoria\n'
+        '3,1,A3,"PAO\nDE FORMA",X,Ana,Pietro,Padaria\n'
+        '1,1,A1,LEITE 1L,Y,Ana,Pietro,Laticínios\n'
+        ',,,,,,,\n'
+        '2,1,A2,CAFE 500G,Z,Bruno,Carla,Mercearia\n'
+        '10,1,A10,ARROZ 5KG,W,Bruno,Carla,Mercearia\n',
+        encoding='utf-8'
+    )
+    return path
+
+
+def test_index_finds_rows_across_windows(quoted_base_fazer):
+    index = WorklistIndex(str(quoted_base_fazer), window=2, max_windows=1)
+    assert len(index) == 4 and index.max_iteration() == 10
+    assert index.get_item(3)['nome'] == 'PAO\nDE FORMA'
+    assert index.get_item(10)['cod_produto'] == 'A10'
+    assert index.get_item(1)['cod_produto'] == 'A1'
+    assert index.get_item(4) is None
+    assert len(index._windows) == 1
+
+
+def test_index_is_reused_until_the_file_changes(quoted_base_fazer):
+    WorklistIndex(str(quoted_base_fazer))
+    assert os.path.exists(f'{quoted_base_fazer}.idx.npz')
+
+    with open(quoted_base_fazer, 'a', encoding='utf-8') as f:
+        f.write('11,1,A11,FEIJAO 1KG,V,Ana,Pietro,Mercearia\n')
+    os.utime(quoted_base_fazer, ns=(1, 1))
+    assert WorklistIndex(str(quoted_base_fazer)).max_iteration() == 11
+
+
+def test_lazy_manager_matches_eager(make_manager, tmp_path):
+    eager = make_manager(durability='sync', output_path=str(tmp_path / 'eager.csv'))
+    lazy = make_manager(durability='sync', lazy=True, output_path=str(tmp_path / 'lazy.csv'))
+    assert lazy.lazy and lazy.df_base_fazer is None
+
+    for manager in (eager, lazy):
+        manager.save_substitutes(2, [substitute('KDB11')])
+
+    assert lazy.get_total_items() == eager.get_total_items() == 5
+    assert lazy.get_item_by_iteration(4)['nome'] == eager.get_item_by_iteration(4)['nome']
+    assert [i['n_iteracao'] for i in lazy.get_pending_items()] == [i['n_iteracao'] for i in eager.get_pending_items()]
+    assert lazy.get_stats_breakdown('Responsável').to_dict() == eager.get_stats_breakdown('Responsável').to_dict()